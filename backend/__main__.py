@@ -0,0 +1,223 @@
+"""Production entry point: pre-forked uvicorn workers serving server:app on one port.
+
+    python -m backend [--workers N] [--host 0.0.0.0] [--port 8000] [--reuse-port] [--no-preload]
+
+The master imports the app once (``--no-preload`` leaves that to each worker)
+and forks ``--workers`` processes, so workers start from its memory instead
+of re-importing FastAPI, the models and the scoring model. Workers share the
+master's listening socket, or with ``--reuse-port`` each binds its own
+SO_REUSEPORT socket and the kernel spreads connections evenly. uvloop and
+httptools are used when installed.
+
+SIGTERM or SIGINT drains: workers stop accepting, finish open requests (LLM
+pipelines included) for up to ``--graceful-timeout`` seconds, then run the
+app's shutdown, which waits for background assessments and running jobs
+(SHUTDOWN_GRACE_SECONDS) and flushes write-behind assessments to MongoDB.
+Workers still alive after ``--kill-timeout`` are killed. A worker that exits
+on its own is replaced.
+
+Each worker is a separate process with its own in-memory state: the LLM
+concurrency limiter and queue, the circuit breaker, the hedge budget, the
+predictor micro-batcher, the in-process LLM cache tier, the job workers
+(ASSESSMENT_JOB_WORKERS each) and the counters behind /metrics. The launcher
+exports SERVER_WORKERS, and each worker takes 1/N of LLM_MAX_CONCURRENCY and
+LLM_MAX_QUEUE (rounded up), so the totals hold for the whole server. The
+other limits apply per worker. /metrics shows the worker that answered the
+scrape; run one worker per container where per-process series matter.
+"""
+import argparse
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from pathlib import Path
+
+# Backend modules import each other by bare name
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import uvicorn  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("launcher")
+
+
+def event_loop() -> str:
+    try:
+        import uvloop  # noqa: F401
+        return "uvloop"
+    except ImportError:
+        return "asyncio"
+
+
+def http_protocol() -> str:
+    try:
+        import httptools  # noqa: F401
+        return "httptools"
+    except ImportError:
+        return "h11"
+
+
+def bind(host: str, port: int, reuse_port: bool, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class WorkerServer(uvicorn.Server):
+    """uvicorn server that tells the master once its startup (the app lifespan included) is done"""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None) -> None:
+        await super().startup(sockets=sockets)
+        if self.started:
+            os.write(self.ready_fd, b"r")
+
+
+class Launcher:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.app = "server:app"
+        self.socket = None
+        self.workers = {}  # pid -> worker number
+        self.stopping = False
+        self.ready_read, self.ready_write = os.pipe()
+
+    def config(self) -> uvicorn.Config:
+        return uvicorn.Config(
+            self.app,
+            loop=event_loop(),
+            http=http_protocol(),
+            backlog=self.args.backlog,
+            timeout_keep_alive=self.args.keep_alive,
+            timeout_graceful_shutdown=self.args.graceful_timeout,
+            access_log=self.args.access_log,
+            proxy_headers=True,
+            forwarded_allow_ips=self.args.forwarded_allow_ips,
+        )
+
+    def spawn(self, number: int) -> None:
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = number
+            return
+        # Worker: uvicorn installs its own SIGTERM/SIGINT handling
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            os.close(self.ready_read)
+            sock = self.socket or bind(self.args.host, self.args.port, True, self.args.backlog)
+            WorkerServer(self.config(), self.ready_write).run(sockets=[sock])
+        except BaseException:
+            logger.exception(f"Worker {os.getpid()} failed")
+            code = 1
+        finally:
+            os._exit(code)
+
+    def handle_stop(self, signum, frame) -> None:
+        if not self.stopping:
+            logger.info(f"Received {signal.Signals(signum).name}, draining {len(self.workers)} workers")
+        self.stopping = True
+
+    def wait_ready(self, timeout: float) -> int:
+        """Readiness notifications from workers within ``timeout`` seconds"""
+        readable, _, _ = select.select([self.ready_read], [], [], timeout)
+        return len(os.read(self.ready_read, 64)) if readable else 0
+
+    def reap(self, restart: bool = True) -> bool:
+        """Collect exited workers, replacing them if ``restart``; True if any exited"""
+        exited = False
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                break
+            exited = True
+            number = self.workers.pop(pid)
+            if restart:
+                logger.warning(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+                self.spawn(number)
+        return exited
+
+    def drain(self) -> None:
+        for pid in self.workers:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.args.kill_timeout
+        while self.workers and time.monotonic() < deadline:
+            self.reap(restart=False)
+            time.sleep(0.1)
+        for pid in self.workers:
+            logger.warning(f"Worker {pid} still running after {self.args.kill_timeout}s, killing it")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.workers.clear()
+
+    def run(self) -> int:
+        args = self.args
+        started = time.perf_counter()
+        # Read by server.py at import, so set before the preload import and inherited by every worker
+        os.environ["SERVER_WORKERS"] = str(args.workers)
+        if args.preload:
+            from server import app
+            self.app = app
+            logger.info(f"App preloaded in {time.perf_counter() - started:.2f}s")
+        if not args.reuse_port:
+            self.socket = bind(args.host, args.port, False, args.backlog)
+        logger.info(
+            f"Serving on {args.host}:{args.port} with {args.workers} workers "
+            f"({event_loop()}, {http_protocol()}{', SO_REUSEPORT' if args.reuse_port else ''})"
+        )
+
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        for number in range(args.workers):
+            self.spawn(number)
+        ready = 0
+        while ready < args.workers and not self.stopping:
+            ready += self.wait_ready(0.5)
+            if self.reap(restart=False):
+                # A worker that can't start would only crash again
+                logger.error("A worker exited during startup, stopping")
+                self.stopping = True
+        if ready == args.workers:
+            logger.info(f"{ready} workers ready in {time.perf_counter() - started:.2f}s")
+        while not self.stopping:
+            self.wait_ready(0.5)  # also consumes the notifications of replaced workers
+            self.reap(restart=not self.stopping)
+        self.drain()
+        logger.info("All workers stopped")
+        return 0 if ready == args.workers else 1
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m backend", description="Serve the API with pre-forked uvicorn workers")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1,
+                        help="worker processes (default: WEB_CONCURRENCY, else the CPU count); the LLM concurrency "
+                             "and queue limits are split between them, other in-memory state is per worker")
+    parser.add_argument("--reuse-port", action="store_true", help="one SO_REUSEPORT socket per worker instead of a shared one")
+    parser.add_argument("--no-preload", dest="preload", action="store_false", help="import the app in each worker instead of once before forking")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.environ.get("GRACEFUL_TIMEOUT", "60")),
+                        help="seconds a draining worker waits for open requests")
+    parser.add_argument("--kill-timeout", type=float, default=float(os.environ.get("KILL_TIMEOUT", "120")),
+                        help="seconds after SIGTERM before remaining workers are killed")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5, help="idle keep-alive timeout in seconds")
+    parser.add_argument("--forwarded-allow-ips", default=os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1"))
+    parser.add_argument("--access-log", action="store_true")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(Launcher(parse_args()).run())
@@ -0,0 +1,263 @@
+"""Streaming bulk export of stored assessments as NDJSON, CSV or Parquet.
+
+``AssessmentExport.chunks`` reads a Motor cursor ``batch_size`` documents at
+a time and yields each batch encoded as bytes, so memory holds one batch
+whatever the collection size. The next batch is read only after the
+consumer has taken the previous chunk. Behind a StreamingResponse that means
+after the client accepted it, so a slow client slows the cursor down instead
+of filling a buffer.
+
+Columns are chosen with ``fields``: top-level fields from ``FIELDS``, and
+``questionnaire`` (every answer) or ``questionnaire.<field>``. The defaults
+leave out the questionnaire answers and the LLM-written text; both have to
+be asked for. NDJSON rows keep the stored structure. CSV
+and Parquet rows are flat: each answer is a ``questionnaire_<field>`` column
+and lists are joined with ";". Key stressors are written as the stable keys
+the cohort rollups use, e.g. ``long_work_hours``. Parquet gets one row group
+per batch with a schema fixed up front, so a consumer can read it row group
+by row group as well.
+
+Rows are in (timestamp, id) order. Filters are the history listing's (time
+range, city, role, bands) plus the cohort dimensions age_group and
+years_in_it (a band label such as ``3-5``). Like the cohort analytics,
+``check_min_rows`` refuses an export that selects fewer than the
+suppression threshold, so filters can't narrow it down to individuals.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from pymongo import ASCENDING
+
+from assessment_history import build_list_query
+from cohort_rollups import stressor_keys, years_in_it_range
+from compact_storage import COMPRESSED_FIELDS, ENUMS
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Exportable top-level fields and their column types; plans, tips and resources stay out
+FIELDS = {
+    "id": str,
+    "timestamp": datetime,
+    "model_version": str,
+    "stress_level": str,
+    "stress_score": int,
+    "burnout_risk": str,
+    "burnout_score": int,
+    "safety_risk": str,
+    "key_stressors": list,
+    "quick_summary": str,
+    "warnings": list,
+    "explanation": str,
+    "flex_suggestions": list,
+    "email_to_manager": str,
+    "email_to_hr": str,
+    "questionnaire": dict,
+}
+DEFAULT_FIELDS = (
+    "id", "timestamp", "model_version", "stress_level", "stress_score", "burnout_risk",
+    "burnout_score", "safety_risk", "key_stressors",
+)
+SORT = [("timestamp", ASCENDING), ("id", ASCENDING)]
+
+QUESTIONNAIRE_PREFIX = "questionnaire."
+
+
+class InvalidExport(ValueError):
+    """An unknown format, field or cohort filter value"""
+
+
+class ExportTooSmall(InvalidExport):
+    """The filters select fewer assessments than the cohort suppression threshold"""
+
+
+def export_query(age_group: Optional[str] = None, years_in_it: Optional[str] = None, **filters) -> Dict[str, Any]:
+    """The history listing's query plus the age_group and years_in_it cohort filters"""
+    query = build_list_query(**filters)
+    if age_group:
+        # Compact documents store the answer as its position in the value table
+        values = [age_group] + ([ENUMS["age_group"].index(age_group)] if age_group in ENUMS["age_group"] else [])
+        query["questionnaire.age_group"] = {"$in": values}
+    if years_in_it:
+        try:
+            query["questionnaire.years_in_it"] = years_in_it_range(years_in_it)
+        except ValueError as e:
+            raise InvalidExport(str(e))
+    return query
+
+
+async def check_min_rows(collection, query: Dict[str, Any], min_rows: int) -> None:
+    """Raise ExportTooSmall unless at least ``min_rows`` assessments match ``query``"""
+    if min_rows > 0 and await collection.count_documents(query, limit=min_rows) < min_rows:
+        raise ExportTooSmall(f"Fewer than {min_rows} assessments match these filters")
+
+
+def column_name(field: str) -> str:
+    return field.replace(".", "_")
+
+
+def _flat_value(field: str, value: Any) -> Any:
+    if isinstance(value, list):
+        return ";".join(str(item) for item in value)
+    return value
+
+
+class _ChunkSink:
+    """Write-only file that collects what the Parquet writer wrote since the last ``take``"""
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+class AssessmentExport:
+    def __init__(self, format: str, questionnaire_types: Dict[str, type], fields: Optional[Sequence[str]] = None,
+                 batch_size: int = 1000,
+                 decode: Optional[Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]] = None):
+        """``questionnaire_types`` maps each answer to its column type; ``decode`` turns a batch of stored documents plain"""
+        if format not in FORMATS:
+            raise InvalidExport(f"Unknown export format: {format}")
+        self.format = format
+        self.media_type = FORMATS[format]
+        self.batch_size = batch_size
+        self.decode = decode
+        self.types = {}
+        for field in fields or DEFAULT_FIELDS:
+            name = field[len(QUESTIONNAIRE_PREFIX):] if field.startswith(QUESTIONNAIRE_PREFIX) else None
+            if field == "questionnaire":
+                self.types.update((QUESTIONNAIRE_PREFIX + answer, kind) for answer, kind in questionnaire_types.items())
+            elif field in FIELDS:
+                self.types[field] = FIELDS[field]
+            elif name in questionnaire_types:
+                self.types[field] = questionnaire_types[name]
+            else:
+                raise InvalidExport(f"Unknown export field: {field}")
+        self.fields = list(self.types)
+        self.columns = [column_name(field) for field in self.fields]
+
+        self.projection = {"_id": 0, "storage_format": 1, **dict.fromkeys(self.fields, 1)}
+        if "key_stressors" in self.fields:
+            self.projection["stressor_keys"] = 1
+        if any(field in COMPRESSED_FIELDS for field in self.fields):
+            self.projection["compressed"] = 1  # compact documents keep the long text there
+
+        if format == "parquet":
+            self._open_parquet()
+        elif format == "csv":
+            self._csv_buffer = io.StringIO()
+            self._csv = csv.writer(self._csv_buffer)
+
+    def _open_parquet(self) -> None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise InvalidExport("pyarrow is required for Parquet exports") from e
+        arrow_types = {
+            str: pyarrow.string(), list: pyarrow.string(), int: pyarrow.int64(), float: pyarrow.float64(),
+            bool: pyarrow.bool_(), datetime: pyarrow.timestamp("us", tz="UTC"),
+        }
+        self._arrow = pyarrow
+        self._schema = pyarrow.schema([(column, arrow_types[self.types[field]]) for field, column in zip(self.fields, self.columns)])
+        self._sink = _ChunkSink()
+        self._parquet = pyarrow.parquet.ParquetWriter(self._sink, self._schema, compression="zstd")
+
+    def _value(self, doc: Dict[str, Any], field: str) -> Any:
+        if field == "key_stressors" and self.format != "ndjson":
+            return stressor_keys(doc)
+        if field.startswith(QUESTIONNAIRE_PREFIX):
+            return (doc.get("questionnaire") or {}).get(field[len(QUESTIONNAIRE_PREFIX):])
+        return doc.get(field)
+
+    def nested_row(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        row: Dict[str, Any] = {}
+        for field in self.fields:
+            if field.startswith(QUESTIONNAIRE_PREFIX):
+                row.setdefault("questionnaire", {})[field[len(QUESTIONNAIRE_PREFIX):]] = self._value(doc, field)
+            else:
+                row[field] = doc.get(field)
+        return row
+
+    def flat_row(self, doc: Dict[str, Any]) -> List[Any]:
+        return [_flat_value(field, self._value(doc, field)) for field in self.fields]
+
+    def begin(self) -> bytes:
+        if self.format == "csv":
+            self._csv.writerow(self.columns)
+            return self._take_csv()
+        return b""
+
+    def encode(self, docs: List[Dict[str, Any]]) -> bytes:
+        if self.format == "ndjson":
+            return "".join(json.dumps(self.nested_row(doc), ensure_ascii=False) + "\n" for doc in docs).encode("utf-8")
+        rows = [self.flat_row(doc) for doc in docs]
+        if self.format == "csv":
+            self._csv.writerows(rows)
+            return self._take_csv()
+        arrays = []
+        for field, values, column in zip(self.fields, zip(*rows), self._schema):
+            if self.types[field] is datetime:
+                values = [datetime.fromisoformat(v) if isinstance(v, str) else v for v in values]
+            arrays.append(self._arrow.array(values, type=column.type))
+        self._parquet.write_table(self._arrow.Table.from_arrays(arrays, schema=self._schema))
+        return self._sink.take()
+
+    def end(self) -> bytes:
+        if self.format == "parquet":
+            self._parquet.close()  # writes the footer
+            return self._sink.take()
+        return b""
+
+    def _take_csv(self) -> bytes:
+        data = self._csv_buffer.getvalue().encode("utf-8")
+        self._csv_buffer.seek(0)
+        self._csv_buffer.truncate()
+        return data
+
+    async def chunks(self, collection, query: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """The export as byte chunks: a header, one chunk per batch, then a footer"""
+        header = self.begin()
+        if header:
+            yield header
+        batch = []
+        async for doc in collection.find(query, self.projection, batch_size=self.batch_size).sort(SORT):
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                yield await self._encode_batch(batch)
+                batch = []
+        if batch:
+            yield await self._encode_batch(batch)
+        footer = self.end()
+        if footer:
+            yield footer
+
+    async def _encode_batch(self, docs: List[Dict[str, Any]]) -> bytes:
+        if self.decode:
+            docs = await self.decode(docs)
+        return self.encode(docs)
@@ -0,0 +1,143 @@
+"""Index-backed reads of stored assessments with keyset pagination.
+
+Listings are sorted newest first on ``(timestamp, id)`` and paged with an
+opaque cursor holding the last row's sort key, so page N costs the same as
+page 1 (no skip). Every supported filter has an index whose equality fields
+come before the sort fields. Band filters are always sent as ``$in`` over all
+three band fields, so the compound band index can serve any combination with
+a merge sort instead of an in-memory sort.
+
+``plan_stages`` pulls the stage names out of an ``explain()`` result;
+benchmarks/check_history_indexes.py uses it to assert that no supported
+query falls back to COLLSCAN or a blocking SORT.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+BANDS = ["low", "medium", "high"]
+BAND_FIELDS = ["stress_level", "burnout_risk", "safety_risk"]
+
+SORT = [("timestamp", DESCENDING), ("id", DESCENDING)]
+
+INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    IndexModel(SORT, name="timestamp_id"),
+    IndexModel([("questionnaire.city", ASCENDING)] + SORT, name="city_timestamp_id"),
+    IndexModel([("questionnaire.current_role", ASCENDING)] + SORT, name="role_timestamp_id"),
+    IndexModel([(field, ASCENDING) for field in BAND_FIELDS] + SORT, name="bands_timestamp_id"),
+]
+
+# API views never include the questionnaire: its answers (city, role, age, ...)
+# would let anyone re-identify people that the cohort analytics suppress.
+# List views also leave out the LLM text, plan, emails, tips and resources;
+# timestamp and id are the cursor key
+SUMMARY_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "timestamp": 1,
+    "stress_level": 1,
+    "stress_score": 1,
+    "burnout_risk": 1,
+    "burnout_score": 1,
+    "safety_risk": 1,
+    "key_stressors": 1,
+    "quick_summary": 1,
+    "warnings": 1,
+}
+FULL_PROJECTION = {"_id": 0, "idempotency_key": 0, "request_hash": 0, "questionnaire": 0, "stressor_keys": 0}
+# Server-side reads that need the answers (re-assessment); never returned as they are
+STORED_PROJECTION = {"_id": 0, "idempotency_key": 0, "request_hash": 0}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+async def ensure_indexes(collection) -> None:
+    await collection.create_indexes(INDEXES)
+
+
+def to_stored_timestamp(value: datetime) -> str:
+    """Timestamps are stored as UTC isoformat strings, so range bounds must match"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).isoformat()
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    raw = json.dumps([doc["timestamp"], doc["id"]], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        timestamp, assessment_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(cursor)
+    if not isinstance(timestamp, str) or not isinstance(assessment_id, str):
+        raise InvalidCursor(cursor)
+    return timestamp, assessment_id
+
+
+def build_list_query(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     city: Optional[str] = None, role: Optional[str] = None,
+                     bands: Optional[Dict[str, List[str]]] = None,
+                     cursor: Optional[str] = None) -> Dict[str, Any]:
+    query: Dict[str, Any] = {}
+    if city:
+        query["questionnaire.city"] = city
+    if role:
+        query["questionnaire.current_role"] = role
+    if bands and any(bands.values()):
+        for field in BAND_FIELDS:
+            query[field] = {"$in": bands.get(field) or BANDS}
+
+    timestamp_range = {}
+    if start:
+        timestamp_range["$gte"] = to_stored_timestamp(start)
+    if end:
+        timestamp_range["$lt"] = to_stored_timestamp(end)
+
+    if cursor:
+        # Rows after the cursor in (timestamp desc, id desc) order. Written as one
+        # timestamp bound plus a tie filter (not an $or) so it stays a single index range.
+        last_timestamp, last_id = decode_cursor(cursor)
+        timestamp_range["$lte"] = last_timestamp
+        query["$nor"] = [{"timestamp": last_timestamp, "id": {"$gte": last_id}}]
+
+    if timestamp_range:
+        query["timestamp"] = timestamp_range
+    return query
+
+
+async def list_assessments(collection, limit: int, full: bool = False, **filters) -> Dict[str, Any]:
+    """One page of assessments, newest first, and the cursor for the next page"""
+    query = build_list_query(**filters)
+    projection = FULL_PROJECTION if full else SUMMARY_PROJECTION
+    items = await collection.find(query, projection).sort(SORT).limit(limit + 1).to_list(limit + 1)
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return {"items": items[:limit], "next_cursor": next_cursor}
+
+
+def plan_stages(explain: Dict[str, Any]) -> Set[str]:
+    """All stage names in the winning plan of an explain() result"""
+    stages: Set[str] = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            if "stage" in node:
+                stages.add(node["stage"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    planner = explain.get("queryPlanner", {})
+    walk(planner.get("winningPlan", {}))
+    return stages
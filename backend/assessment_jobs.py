@@ -0,0 +1,239 @@
+"""MongoDB-backed job queue and worker pool for asynchronous assessments.
+
+Jobs live in one collection. A worker claims a job atomically with
+``find_one_and_update``, which sets a lease that the worker keeps extending
+while it runs. A job whose lease runs out (its worker crashed or hung) becomes
+claimable again, until ``max_attempts`` is used up and it is marked failed.
+All writes by a worker are conditioned on still holding the lease, so a worker
+that lost its job can't overwrite the new owner's progress. Completed and
+failed jobs get a ``finished_at`` time, and a TTL index removes them
+``retention_seconds`` later.
+
+The queue only needs the Motor collection API, so tests can pass any local
+stand-in (e.g. mongomock-motor) instead of a real MongoDB.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class LeaseLost(Exception):
+    """The job was reclaimed by another worker after this worker's lease expired"""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class JobQueue:
+    def __init__(self, collection, lease_seconds: float = 120, max_attempts: int = 3,
+                 retry_backoff_seconds: float = 5, retention_seconds: float = 7 * 86400):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.retention_seconds = retention_seconds
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index([("status", ASCENDING), ("available_at", ASCENDING)])
+        await self.collection.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)])
+        # Unfinished jobs have finished_at None, which the TTL monitor skips
+        await self.collection.create_index("finished_at", expireAfterSeconds=int(self.retention_seconds))
+
+    async def enqueue(self, payload: Dict[str, Any], result: Dict[str, Any], job_id: Optional[str] = None,
+                      client: str = "", prediction: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Queue a job; ``prediction`` is kept with it so the worker reuses the scores ``result`` was built from"""
+        now = _now()
+        job = {
+            "_id": job_id or str(uuid.uuid4()),
+            "status": QUEUED,
+            "payload": payload,
+            "client": client,
+            "prediction": prediction,
+            "result": result,
+            "attempts": 0,
+            "attempts_left": self.max_attempts,
+            "available_at": now,
+            "lease_expires_at": None,
+            "worker_id": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "finished_at": None,
+        }
+        await self.collection.insert_one(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"_id": job_id})
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Lease the oldest runnable job: queued and due, or running with an expired lease"""
+        now = _now()
+        return await self.collection.find_one_and_update(
+            {
+                "$or": [
+                    {"status": QUEUED, "available_at": {"$lte": now}},
+                    {"status": RUNNING, "lease_expires_at": {"$lt": now}},
+                ],
+                "attempts_left": {"$gt": 0},
+            },
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker_id": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1, "attempts_left": -1},
+            },
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _update_owned(self, job: Dict[str, Any], update: Dict[str, Any]) -> None:
+        update.setdefault("$set", {})["updated_at"] = _now()
+        outcome = await self.collection.update_one(
+            {"_id": job["_id"], "worker_id": job["worker_id"], "attempts": job["attempts"], "status": RUNNING},
+            update,
+        )
+        if outcome.matched_count == 0:
+            raise LeaseLost(job["_id"])
+
+    async def extend_lease(self, job: Dict[str, Any]) -> None:
+        await self._update_owned(job, {"$set": {"lease_expires_at": _now() + timedelta(seconds=self.lease_seconds)}})
+
+    async def save_progress(self, job: Dict[str, Any], fields: Dict[str, Any]) -> None:
+        """Merge finished sections into the job's partial result"""
+        await self._update_owned(job, {"$set": {f"result.{key}": value for key, value in fields.items()}})
+
+    async def complete(self, job: Dict[str, Any], result: Dict[str, Any]) -> None:
+        await self._update_owned(job, {"$set": {"status": COMPLETED, "result": result, "lease_expires_at": None, "error": None, "finished_at": _now()}})
+
+    async def fail(self, job: Dict[str, Any], error: str) -> None:
+        """Requeue with backoff, or mark failed once the job is out of attempts"""
+        if job["attempts_left"] <= 0:
+            update = {"status": FAILED, "error": error, "lease_expires_at": None, "finished_at": _now()}
+        else:
+            update = {
+                "status": QUEUED,
+                "error": error,
+                "lease_expires_at": None,
+                "available_at": _now() + timedelta(seconds=self.retry_backoff_seconds * job["attempts"]),
+            }
+        await self._update_owned(job, {"$set": update})
+
+    async def fail_abandoned(self) -> int:
+        """Mark jobs whose last attempt's lease expired (worker crashed) as failed"""
+        outcome = await self.collection.update_many(
+            {
+                "status": RUNNING,
+                "lease_expires_at": {"$lt": _now()},
+                "attempts_left": {"$lte": 0},
+            },
+            {"$set": {"status": FAILED, "error": "Worker lease expired", "lease_expires_at": None, "updated_at": _now(), "finished_at": _now()}},
+        )
+        return outcome.modified_count
+
+    async def counts(self) -> Dict[str, int]:
+        counts = {QUEUED: 0, RUNNING: 0, COMPLETED: 0, FAILED: 0}
+        async for row in self.collection.aggregate([{"$group": {"_id": "$status", "n": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["n"]
+        return counts
+
+
+JobHandler = Callable[[Dict[str, Any], "JobQueue"], Awaitable[Dict[str, Any]]]
+
+
+class JobWorkerPool:
+    """``concurrency`` asyncio workers polling the queue in this process"""
+
+    def __init__(self, queue: JobQueue, handler: JobHandler, concurrency: int = 2,
+                 poll_interval: float = 1.0, name: Optional[str] = None):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = name or f"worker-{uuid.uuid4().hex[:8]}"
+        self._tasks = []
+        self._stopping = asyncio.Event()
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._run(f"{self.name}-{i}"))
+            for i in range(self.concurrency)
+        ]
+
+    async def stop(self, grace_seconds: float = 30) -> None:
+        """Stop claiming, let running jobs finish for up to ``grace_seconds``, then cancel them"""
+        self._stopping.set()
+        if not self._tasks:
+            return
+        _, pending = await asyncio.wait(self._tasks, timeout=grace_seconds)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    async def run_forever(self) -> None:
+        self.start()
+        await asyncio.gather(*self._tasks)
+
+    async def _run(self, worker_id: str) -> None:
+        while not self._stopping.is_set():
+            try:
+                await self.queue.fail_abandoned()
+                job = await self.queue.claim(worker_id)
+            except Exception as e:
+                logger.warning(f"Job queue unavailable for {worker_id}: {str(e)}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(job)
+
+    async def _process(self, job: Dict[str, Any]) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            result = await self.handler(job, self.queue)
+            await self.queue.complete(job, result)
+        except LeaseLost:
+            logger.warning(f"Lost lease on job {job['_id']}, abandoning it")
+        except asyncio.CancelledError:
+            # Shutting down: the lease expires and another worker picks the job up
+            raise
+        except Exception as e:
+            logger.error(f"Job {job['_id']} attempt {job['attempts']} failed: {str(e)}")
+            try:
+                await self.queue.fail(job, str(e))
+            except Exception as fail_error:
+                logger.error(f"Could not record failure of job {job['_id']}: {str(fail_error)}")
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job: Dict[str, Any]) -> None:
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            try:
+                await self.queue.extend_lease(job)
+            except LeaseLost:
+                return
+            except Exception as e:
+                logger.warning(f"Could not extend lease on job {job['_id']}: {str(e)}")
@@ -0,0 +1,260 @@
+"""Incrementally maintained cohort analytics.
+
+Each stored assessment ``$inc``s one pre-aggregated document per cohort and
+UTC day in the ``assessment_rollups`` collection: overall, and per city,
+role, age group and years-in-IT band. A document holds the cohort count,
+score sums, 10-point histograms of stress_score and burnout_score, band
+counts and stressor frequencies. Reads merge the documents for a date range,
+so their cost depends on the number of cohorts and days, not assessments.
+
+Cohorts smaller than ``min_cohort_size`` are left out of read results so
+individuals can't be singled out.
+"""
+import re
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+
+from compact_storage import decode_questionnaire
+
+DIMENSIONS = {
+    "all": None,
+    "city": "city",
+    "role": "current_role",
+    "age_group": "age_group",
+    "years_in_it": "years_in_it",
+}
+YEARS_IN_IT_BANDS = [(2, "0-2"), (5, "3-5"), (10, "6-10"), (15, "11-15")]
+HISTOGRAM_WIDTH = 10
+SCORES = ["stress_score", "burnout_score"]
+BANDED = ["stress_level", "burnout_risk", "safety_risk"]
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_PARENTHETICAL = re.compile(r"\s*\(.*\)\s*$")
+# heuristic-v1 labels whose slug isn't their rule key, for assessments stored with labels only
+LEGACY_KEYS = {"night_shift_work": "night_shifts", "workplace_bias_discrimination": "workplace_bias"}
+
+
+def years_in_it_band(years: int) -> str:
+    for upper, label in YEARS_IN_IT_BANDS:
+        if years <= upper:
+            return label
+    return "16+"
+
+
+def years_in_it_range(band: str) -> Dict[str, int]:
+    """'3-5' -> {"$gte": 3, "$lte": 5}: the years_in_it query for a band label"""
+    lower = 0
+    for upper, label in YEARS_IN_IT_BANDS:
+        if label == band:
+            return {"$gte": lower, "$lte": upper}
+        lower = upper + 1
+    if band == f"{lower}+":
+        return {"$gte": lower}
+    raise ValueError(f"Unknown years_in_it band: {band}")
+
+
+def stressor_key(label: str) -> str:
+    """'Long commute (75 min)' -> 'long_commute': the key of an assessment stored before rule keys were"""
+    return _NON_WORD.sub("_", _PARENTHETICAL.sub("", label).lower()).strip("_")
+
+
+def stressor_keys(doc: Dict[str, Any]) -> List[str]:
+    """The scoring model's rule keys for a stored assessment's key stressors"""
+    if "stressor_keys" in doc:
+        return doc["stressor_keys"]
+    slugs = (stressor_key(label) for label in doc.get("key_stressors") or [])
+    return [LEGACY_KEYS.get(slug, slug) for slug in slugs]
+
+
+def histogram_bucket(score: int) -> str:
+    return str(min(score // HISTOGRAM_WIDTH, 100 // HISTOGRAM_WIDTH - 1) * HISTOGRAM_WIDTH)
+
+
+def cohort_values(questionnaire: Dict[str, Any]) -> Dict[str, str]:
+    values = {}
+    for dimension, field in DIMENSIONS.items():
+        if field is None:
+            values[dimension] = "all"
+        elif dimension == "years_in_it":
+            values[dimension] = years_in_it_band(questionnaire[field])
+        else:
+            values[dimension] = str(questionnaire[field]).strip() or "unknown"
+    return values
+
+
+def assessment_increments(doc: Dict[str, Any]) -> Dict[str, int]:
+    """The $inc document one assessment contributes to each of its cohorts"""
+    inc = {"count": 1}
+    for score in SCORES:
+        inc[f"{score}_sum"] = doc[score]
+        inc[f"{score}_histogram.{histogram_bucket(doc[score])}"] = 1
+    for field in BANDED:
+        inc[f"{field}.{doc[field]}"] = 1
+    for key in stressor_keys(doc):
+        inc[f"stressors.{key}"] = 1
+    return inc
+
+
+def rollup_id(day: str, dimension: str, value: str) -> str:
+    return f"{day}|{dimension}|{value}"
+
+
+def assessment_day(timestamp: Any) -> str:
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.date().isoformat()
+
+
+def rollup_updates(doc: Dict[str, Any]) -> List[UpdateOne]:
+    """Upserting $inc operations for one stored assessment document"""
+    day = assessment_day(doc["timestamp"])
+    inc = assessment_increments(doc)
+    return [
+        UpdateOne(
+            {"_id": rollup_id(day, dimension, value)},
+            {"$inc": inc, "$setOnInsert": {"day": day, "dimension": dimension, "value": value}},
+            upsert=True,
+        )
+        for dimension, value in cohort_values(doc["questionnaire"]).items()
+    ]
+
+
+async def ensure_indexes(rollups) -> None:
+    await rollups.create_index([("dimension", ASCENDING), ("day", ASCENDING)])
+
+
+async def record_assessment(rollups, doc: Dict[str, Any]) -> None:
+    await rollups.bulk_write(rollup_updates(doc), ordered=False)
+
+
+def _merge(target: Dict[str, Any], source: Dict[str, Any]) -> None:
+    for key, value in source.items():
+        if isinstance(value, dict):
+            _merge(target.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)):
+            target[key] = target.get(key, 0) + value
+
+
+def _summarize(value: str, totals: Dict[str, Any]) -> Dict[str, Any]:
+    count = totals["count"]
+    summary = {"value": value, "count": count}
+    for score in SCORES:
+        histogram = totals.get(f"{score}_histogram", {})
+        summary[score] = {
+            "mean": round(totals.get(f"{score}_sum", 0) / count, 2),
+            "histogram": {
+                str(bucket): histogram.get(str(bucket), 0)
+                for bucket in range(0, 100, HISTOGRAM_WIDTH)
+            },
+        }
+    for field in BANDED:
+        bands = totals.get(field, {})
+        summary[field] = {band: bands.get(band, 0) for band in ("low", "medium", "high")}
+    summary["stressors"] = dict(sorted(totals.get("stressors", {}).items(), key=lambda item: -item[1]))
+    return summary
+
+
+async def read_cohorts(rollups, dimension: str, start: Optional[date] = None, end: Optional[date] = None,
+                       min_cohort_size: int = 10) -> Dict[str, Any]:
+    """Merge the daily rollups of one dimension over [start, end], suppressing small cohorts"""
+    query: Dict[str, Any] = {"dimension": dimension}
+    day_range = {}
+    if start:
+        day_range["$gte"] = start.isoformat()
+    if end:
+        day_range["$lte"] = end.isoformat()
+    if day_range:
+        query["day"] = day_range
+
+    totals: Dict[str, Dict[str, Any]] = defaultdict(dict)
+    async for doc in rollups.find(query, {"_id": 0, "day": 0, "dimension": 0}):
+        _merge(totals[doc.pop("value")], doc)
+
+    cohorts = [
+        _summarize(value, cohort)
+        for value, cohort in sorted(totals.items())
+        if cohort.get("count", 0) >= min_cohort_size
+    ]
+    return {
+        "dimension": dimension,
+        "start": start,
+        "end": end,
+        "min_cohort_size": min_cohort_size,
+        "cohorts": cohorts,
+        "suppressed_cohorts": len(totals) - len(cohorts),
+    }
+
+
+ROLLUP_SOURCE_PROJECTION = {
+    "_id": 0,
+    "timestamp": 1,
+    "stress_score": 1,
+    "burnout_score": 1,
+    "stress_level": 1,
+    "burnout_risk": 1,
+    "safety_risk": 1,
+    "key_stressors": 1,
+    "stressor_keys": 1,
+    "questionnaire": 1,
+}
+
+
+def accumulate(docs: Iterable[Dict[str, Any]], rollup_docs: Dict[str, Dict[str, Any]]) -> None:
+    """Fold assessment documents into in-memory rollup documents (used by rebuild)"""
+    for doc in docs:
+        day = assessment_day(doc["timestamp"])
+        inc = assessment_increments(doc)
+        for dimension, value in cohort_values(decode_questionnaire(doc["questionnaire"])).items():
+            target = rollup_docs.setdefault(rollup_id(day, dimension, value), {"day": day, "dimension": dimension, "value": value})
+            for path, amount in inc.items():
+                node = target
+                *parents, leaf = path.split(".")
+                for part in parents:
+                    node = node.setdefault(part, {})
+                node[leaf] = node.get(leaf, 0) + amount
+
+
+async def rebuild(assessments, rollups, start: Optional[date] = None, end: Optional[date] = None,
+                  batch_size: int = 5000) -> int:
+    """Recompute the rollups for [start, end] from the assessments collection.
+
+    Rollup documents for the range are replaced wholesale; assessments stored
+    while a rebuild of the current day runs may be missed, so backfill past
+    days or run it during a quiet period.
+    """
+    query: Dict[str, Any] = {}
+    timestamp_range = {}
+    if start:
+        timestamp_range["$gte"] = start.isoformat()
+    if end:
+        # Timestamps are isoformat strings; every time on the end day sorts before the next day
+        timestamp_range["$lt"] = date.fromordinal(end.toordinal() + 1).isoformat()
+    if timestamp_range:
+        query["timestamp"] = timestamp_range
+
+    rollup_docs: Dict[str, Dict[str, Any]] = {}
+    batch = []
+    processed = 0
+    async for doc in assessments.find(query, ROLLUP_SOURCE_PROJECTION, batch_size=batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            accumulate(batch, rollup_docs)
+            processed += len(batch)
+            batch = []
+    accumulate(batch, rollup_docs)
+    processed += len(batch)
+
+    stale: Dict[str, Any] = {}
+    if start or end:
+        stale["day"] = {k: v for k, v in (("$gte", start and start.isoformat()), ("$lte", end and end.isoformat())) if v}
+    await rollups.delete_many(stale)
+
+    operations = [ReplaceOne({"_id": _id}, doc, upsert=True) for _id, doc in rollup_docs.items()]
+    for offset in range(0, len(operations), batch_size):
+        await rollups.bulk_write(operations[offset:offset + batch_size], ordered=False)
+    return processed
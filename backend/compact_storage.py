@@ -0,0 +1,231 @@
+"""Compact storage format for assessment documents.
+
+Most of a stored assessment repeats across rows: the resource list, the
+safety tips, the fallback texts and the questionnaire's category answers.
+``CompactCodec.encode`` turns a plain document into the compact form and
+``decode`` turns it back; documents without ``storage_format`` are plain and
+decode to themselves, so both forms can live in one collection.
+
+- Shared content: values registered with ``SharedContent`` (the static
+  resources, tips and fallback texts) are stored as ``{"ref": "<kind>:<hash>"}``.
+  The referenced values live in the ``shared_content`` collection, keyed by
+  content hash, so changing a text in code adds a new version and older
+  references keep resolving. Values that aren't registered stay inline.
+- Category answers: questionnaire fields in ``ENUMS`` and the symptom list
+  are stored as indexes into append-only value tables; values outside the
+  tables are stored as the original string. ``city`` and ``current_role``
+  stay strings because the history indexes filter on them.
+- Large generated text: the ``COMPRESSED_FIELDS`` not stored by reference
+  are packed into one zlib-compressed JSON object under ``compressed`` (one
+  stream compresses better and costs one call), once that JSON is at least
+  ``compress_min_bytes`` long.
+
+Scores, bands, key stressors, the quick summary, warnings, ids and the
+timestamp are never encoded: indexes, filters, the summary listing and the
+cohort rollups read them directly.
+"""
+import copy
+import hashlib
+import json
+import logging
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+STORAGE_FORMAT = 1
+
+# Append-only: the stored integer is the position in the list
+ENUMS = {
+    "anxiety_frequency": ["rarely", "sometimes", "often", "always"],
+    "burnout_feeling": ["none", "mild", "moderate", "severe"],
+    "family_responsibilities": ["low", "medium", "high"],
+    "social_support": ["poor", "fair", "good", "excellent"],
+    "hobbies_time": ["none", "rare", "occasional", "regular"],
+    "exercise_frequency": ["none", "1-2/week", "3-4/week", "daily"],
+    "safety_concerns": ["none", "minor", "moderate", "major"],
+    "age_group": ["20-25", "25-30", "30-35", "35-40", "40+"],
+}
+SYMPTOMS = ["headache", "fatigue", "insomnia", "back_pain", "anxiety", "digestive_issues"]
+
+SHARED_FIELDS = ("resources", "safety_tips", "flex_suggestions", "email_to_manager", "email_to_hr", "explanation")
+COMPRESSED_FIELDS = ("explanation", "daily_plan", "email_to_manager", "email_to_hr", "flex_suggestions")
+
+_ENUM_CODES = {field: {value: i for i, value in enumerate(values)} for field, values in ENUMS.items()}
+_SYMPTOM_CODES = {value: i for i, value in enumerate(SYMPTOMS)}
+
+
+def canonical_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def content_ref(kind: str, value: Any) -> str:
+    return f"{kind}:{hashlib.sha256(canonical_json(value).encode('utf-8')).hexdigest()[:16]}"
+
+
+class UnknownSharedContent(LookupError):
+    """A reference whose content is in neither the cache nor the shared_content collection"""
+
+
+class SharedContent:
+    """Registered static values by reference, backed by the shared_content collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._values: Dict[str, Any] = {}
+        # (kind, value) for strings, else (kind, len) -> [(value, ref)]: compared with ==, which is
+        # far cheaper than hashing or serializing a list of resource dicts per stored document
+        self._refs: Dict[Any, Any] = {}
+        self._registered: Dict[str, str] = {}  # ref -> kind, for publish
+        self.published = False
+        self.fetched = 0
+
+    def register(self, kind: str, value: Any) -> str:
+        """Make a string or list storable by reference (after ``publish``)"""
+        ref = content_ref(kind, value)
+        self._values[ref] = value
+        if isinstance(value, str):
+            self._refs[(kind, value)] = ref
+        else:
+            self._refs.setdefault((kind, len(value)), []).append((value, ref))
+        self._registered[ref] = kind
+        return ref
+
+    async def publish(self) -> None:
+        """Store every registered value (insert-only; existing versions are never changed)"""
+        if self._registered:
+            now = datetime.now(timezone.utc).isoformat()
+            await self.collection.bulk_write([
+                UpdateOne({"_id": ref}, {"$setOnInsert": {"kind": kind, "value": self._values[ref], "created_at": now}}, upsert=True)
+                for ref, kind in self._registered.items()
+            ], ordered=False)
+        self.published = True
+
+    def ref_for(self, kind: str, value: Any) -> Optional[str]:
+        if not self.published:
+            return None  # a reference is only safe once its content is stored
+        if isinstance(value, str):
+            return self._refs.get((kind, value))
+        for candidate, ref in self._refs.get((kind, len(value)), ()):
+            if candidate == value:
+                return ref
+        return None
+
+    async def load(self, refs: Iterable[str]) -> None:
+        """Fetch content for references not cached yet (one query)"""
+        missing = [ref for ref in set(refs) if ref not in self._values]
+        if not missing:
+            return
+        async for doc in self.collection.find({"_id": {"$in": missing}}):
+            self._values[doc["_id"]] = doc["value"]
+            self.fetched += 1
+
+    def get(self, ref: str) -> Any:
+        """A copy of the referenced value: cached values are shared by every decoded document"""
+        try:
+            value = self._values[ref]
+        except KeyError:
+            raise UnknownSharedContent(ref)
+        return value if isinstance(value, str) else copy.deepcopy(value)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"registered": len(self._registered), "cached": len(self._values), "fetched": self.fetched, "published": self.published}
+
+
+def encode_questionnaire(questionnaire: Dict[str, Any]) -> Dict[str, Any]:
+    encoded = dict(questionnaire)
+    for field, codes in _ENUM_CODES.items():
+        value = encoded.get(field)
+        if value in codes:
+            encoded[field] = codes[value]
+    symptoms = encoded.get("physical_symptoms")
+    if symptoms:
+        encoded["physical_symptoms"] = [_SYMPTOM_CODES.get(s, s) for s in symptoms]
+    return encoded
+
+
+def _decode_value(value: Any, values: List[str]) -> Any:
+    # A code outside the table (written by a newer version, or corrupted) is kept as it is
+    if isinstance(value, int) and not isinstance(value, bool) and 0 <= value < len(values):
+        return values[value]
+    return value
+
+
+def decode_questionnaire(questionnaire: Dict[str, Any]) -> Dict[str, Any]:
+    """Plain questionnaire from either storage form (needs no shared content)"""
+    decoded = dict(questionnaire)
+    for field, values in ENUMS.items():
+        if field in decoded:
+            decoded[field] = _decode_value(decoded[field], values)
+    symptoms = decoded.get("physical_symptoms")
+    if symptoms:
+        decoded["physical_symptoms"] = [_decode_value(s, SYMPTOMS) for s in symptoms]
+    return decoded
+
+
+class CompactCodec:
+    def __init__(self, shared: SharedContent, compress_min_bytes: int = 256, compress_level: int = 1):
+        self.shared = shared
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+
+    def encode(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Compact form of a plain document (a new dict; ``doc`` is not modified)"""
+        if "storage_format" in doc:
+            return doc
+        encoded = dict(doc)
+        encoded["storage_format"] = STORAGE_FORMAT
+        for field in SHARED_FIELDS:
+            if field in encoded:
+                ref = self.shared.ref_for(field, encoded[field])
+                if ref:
+                    encoded[field] = {"ref": ref}
+        packed = {key: value for key, value in encoded.items() if key in COMPRESSED_FIELDS and not isinstance(value, dict)}
+        if packed:
+            raw = json.dumps(packed, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+            if len(raw) >= self.compress_min_bytes:
+                # Stored where the first packed field was, so decoding restores the field order
+                first = next(iter(packed))
+                compact = {}
+                for key, value in encoded.items():
+                    if key == first:
+                        compact["compressed"] = zlib.compress(raw, self.compress_level)
+                    elif key not in packed:
+                        compact[key] = value
+                encoded = compact
+        if isinstance(encoded.get("questionnaire"), dict):
+            encoded["questionnaire"] = encode_questionnaire(encoded["questionnaire"])
+        return encoded
+
+    def _decode_loaded(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        decoded = {}
+        for key, value in doc.items():
+            if key == "compressed":
+                decoded.update(json.loads(zlib.decompress(value)))
+            elif key in SHARED_FIELDS and isinstance(value, dict):
+                decoded[key] = self.shared.get(value["ref"])
+            elif key == "questionnaire" and isinstance(value, dict):
+                decoded[key] = decode_questionnaire(value)
+            elif key != "storage_format":
+                decoded[key] = value
+        return decoded
+
+    async def decode(self, doc: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Plain form of a stored document (plain documents are returned as they are)"""
+        if not doc or "storage_format" not in doc:
+            return doc
+        return (await self.decode_many([doc]))[0]
+
+    async def decode_many(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Decode a page of documents, fetching unknown shared content in one query"""
+        compact = [doc for doc in docs if "storage_format" in doc]
+        if not compact:
+            return docs
+        await self.shared.load(
+            value["ref"] for doc in compact for field, value in doc.items()
+            if field in SHARED_FIELDS and isinstance(value, dict)
+        )
+        return [self._decode_loaded(doc) if "storage_format" in doc else doc for doc in docs]
@@ -0,0 +1,79 @@
+"""Export stored assessments as NDJSON, CSV or Parquet for offline analysis.
+
+Streams from MongoDB in batches (memory stays flat however many assessments
+match) and leaves the questionnaire answers and LLM-written text out unless
+--fields asks for them. Filters that select fewer than COHORT_MIN_SIZE
+assessments are refused, as in the cohort analytics:
+
+    cd backend && python export_assessments.py --format parquet --output assessments.parquet \\
+        --start 2025-01-01 --end 2025-07-01 --city Bangalore --years-in-it 3-5
+
+--output - (the default) writes to stdout.
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+
+from assessment_export import FORMATS, AssessmentExport, InvalidExport, check_min_rows, export_query
+from server import COHORT_MIN_SIZE, EXPORT_BATCH_SIZE, QUESTIONNAIRE_COLUMN_TYPES, assessment_codec, db, logger, mongo
+
+
+async def main(args) -> int:
+    try:
+        export = AssessmentExport(
+            args.format, QUESTIONNAIRE_COLUMN_TYPES, fields=args.fields,
+            batch_size=args.batch_size, decode=assessment_codec.decode_many
+        )
+        query = export_query(
+            start=args.start, end=args.end, city=args.city, role=args.role,
+            age_group=args.age_group, years_in_it=args.years_in_it,
+            bands={"stress_level": args.stress_level, "burnout_risk": args.burnout_risk, "safety_risk": args.safety_risk}
+        )
+    except InvalidExport as e:
+        logger.error(str(e))
+        return 2
+
+    mongo.connect()
+    try:
+        try:
+            await check_min_rows(db.assessments, query, COHORT_MIN_SIZE)
+        except InvalidExport as e:
+            logger.error(str(e))
+            return 2
+        out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        written = 0
+        try:
+            async for chunk in export.chunks(db.assessments, query):
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+    finally:
+        mongo.close()
+    logger.info(f"Exported {written:,} bytes of {args.format} to {args.output}")
+    return 0
+
+
+def band_list(value: str):
+    return [band.strip() for band in value.split(",") if band.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export stored assessments")
+    parser.add_argument("--format", choices=list(FORMATS), default="ndjson")
+    parser.add_argument("--output", default="-", help="file to write (default: stdout)")
+    parser.add_argument("--fields", type=lambda s: [f.strip() for f in s.split(",") if f.strip()],
+                        help="comma-separated columns, e.g. id,timestamp,stress_score,questionnaire.sleep_hours")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--start", type=datetime.fromisoformat, help="first timestamp (inclusive, UTC unless given)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="last timestamp (exclusive)")
+    parser.add_argument("--city")
+    parser.add_argument("--role")
+    parser.add_argument("--age-group")
+    parser.add_argument("--years-in-it", help="years-in-IT band, e.g. 3-5 or 16+")
+    parser.add_argument("--stress-level", type=band_list, help="e.g. medium,high")
+    parser.add_argument("--burnout-risk", type=band_list)
+    parser.add_argument("--safety-risk", type=band_list)
+    sys.exit(asyncio.run(main(parser.parse_args())))
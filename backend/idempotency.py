@@ -0,0 +1,186 @@
+"""Idempotent assessment submissions.
+
+A submission is identified by its ``Idempotency-Key`` header or, without
+one, by a canonical hash of the questionnaire within a time window:
+
+- header keys are stored as ``key:<value>`` together with the request hash,
+  so reusing a key for a different questionnaire can be rejected;
+- derived keys are ``hash:<sha256>:<window number>``. Lookups check the
+  current and the previous window and then compare timestamps, so any two
+  identical submissions less than ``window`` seconds apart match, even
+  across a window boundary.
+
+Once its assessment is generated, a submission ``claim``s its key by
+inserting ``{_id: key, assessment_id, ...}`` into the claims collection,
+and only then saves the assessment, which may go through write-behind.
+A retry that arrives later finds the claim and gets the claimed
+assessment, or ``SubmissionPending`` while that isn't readable yet. Two
+concurrent requests in one process share a single pipeline run through
+``SingleFlight``. Across processes the claim's ``_id`` lets only one
+insert succeed, and the other request returns the claimed assessment.
+
+A claim whose assessment is still missing ``pending_seconds`` after it
+was made was abandoned (its process died before saving it) and is taken
+over by the next submission. Claims of derived keys expire through a TTL
+index once their window has passed; header keys don't expire.
+"""
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError
+
+INDEXES = [
+    # Only derived-key claims have expires_at
+    IndexModel([("expires_at", ASCENDING)], name="claim_expiry", expireAfterSeconds=0),
+]
+
+MAX_HEADER_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(ValueError):
+    """An Idempotency-Key already used for a different questionnaire"""
+
+
+class SubmissionPending(Exception):
+    """The key is claimed, but the claiming submission's assessment isn't stored yet"""
+
+
+class IdempotencyKeys(NamedTuple):
+    key: str  # stored on the new assessment
+    lookup: List[str]  # keys under which an earlier submission may be stored
+    request_hash: str
+    window: Optional[float]  # seconds; None for header keys, which don't expire
+
+
+def canonical_hash(payload: Dict[str, Any]) -> str:
+    """sha256 of the payload as sorted, whitespace-free JSON"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def request_keys(header: Optional[str], payload: Dict[str, Any], window: float, now: Optional[float] = None) -> IdempotencyKeys:
+    request_hash = canonical_hash(payload)
+    if header:
+        header = header.strip()
+        if not header or len(header) > MAX_HEADER_KEY_LENGTH:
+            raise ValueError(f"Idempotency-Key must be 1-{MAX_HEADER_KEY_LENGTH} characters")
+        key = f"key:{header}"
+        return IdempotencyKeys(key, [key], request_hash, None)
+
+    current = int((now if now is not None else datetime.now(timezone.utc).timestamp()) // window)
+    key = f"hash:{request_hash}:{current}"
+    return IdempotencyKeys(key, [key, f"hash:{request_hash}:{current - 1}"], request_hash, window)
+
+
+def _timestamp(value: Any) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _claim_age(claim: Dict[str, Any]) -> float:
+    return (datetime.now(timezone.utc) - _timestamp(claim["timestamp"])).total_seconds()
+
+
+async def find_stored(claims, assessments, keys: IdempotencyKeys, projection: Dict[str, Any],
+                      pending_seconds: float) -> Optional[Dict[str, Any]]:
+    """The assessment stored for these keys, if any is still inside the window
+
+    Raises ``IdempotencyKeyReused`` when a header key was claimed for a different questionnaire,
+    and ``SubmissionPending`` when the claimed assessment isn't readable yet.
+    """
+    found = await claims.find({"_id": {"$in": keys.lookup}}).to_list(len(keys.lookup))
+    if keys.window is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=keys.window)
+        found = [claim for claim in found if _timestamp(claim["timestamp"]) >= cutoff]
+    if not found:
+        return None
+    claim = max(found, key=lambda c: _timestamp(c["timestamp"]))
+    if claim["request_hash"] != keys.request_hash:
+        raise IdempotencyKeyReused("Idempotency-Key was already used with a different questionnaire")
+    doc = await assessments.find_one({"id": claim["assessment_id"]}, projection)
+    if doc is None and _claim_age(claim) < pending_seconds:
+        raise SubmissionPending(f"Assessment {claim['assessment_id']} is still being saved")
+    return doc
+
+
+async def claim(claims, assessments, keys: IdempotencyKeys, assessment_id: str, timestamp: datetime,
+                pending_seconds: float) -> None:
+    """Claim ``keys.key`` for a new assessment; raises DuplicateKeyError while another submission holds it"""
+    doc = {"_id": keys.key, "request_hash": keys.request_hash, "assessment_id": assessment_id, "timestamp": timestamp}
+    if keys.window is not None:
+        # Lookups reach back into the previous window
+        doc["expires_at"] = timestamp + timedelta(seconds=2 * keys.window)
+    try:
+        await claims.insert_one(doc)
+        return
+    except DuplicateKeyError:
+        held = await claims.find_one({"_id": keys.key})
+        if (held is None or _claim_age(held) < pending_seconds
+                or await assessments.find_one({"id": held["assessment_id"]}, {"_id": 1})):
+            raise
+    # Abandoned: take it over, unless another submission just did
+    outcome = await claims.replace_one({"_id": keys.key, "assessment_id": held["assessment_id"]}, doc)
+    if outcome.matched_count == 0:
+        raise DuplicateKeyError(f"Idempotency key {keys.key} was taken over by another submission")
+
+
+async def release(claims, keys: IdempotencyKeys, assessment_id: str) -> None:
+    """Give up a claim whose assessment could not be saved, so a retry can run again right away"""
+    await claims.delete_one({"_id": keys.key, "assessment_id": assessment_id})
+
+
+async def ensure_indexes(claims) -> None:
+    await claims.create_indexes(INDEXES)
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution of ``fn``
+
+    The shared task is shielded, so a caller that disconnects doesn't cancel
+    the work the other callers are waiting on.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._inflight
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+            self.executions += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    async def drain(self, timeout: float) -> int:
+        """Wait up to ``timeout`` seconds for in-flight executions; returns how many are still running"""
+        tasks = list(self._inflight.values())
+        if not tasks:
+            return 0
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        return len(pending)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller went away
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": self.in_flight, "executions": self.executions, "shared": self.shared}
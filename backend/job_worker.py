@@ -0,0 +1,67 @@
+"""Run assessment job workers in a separate process.
+
+Start the API with ASSESSMENT_JOB_WORKERS=0 to keep LLM work out of the web
+processes, then run as many of these as needed:
+
+    cd backend && python job_worker.py --concurrency 8
+"""
+import argparse
+import asyncio
+import signal
+
+from assessment_jobs import JobWorkerPool
+from server import (
+    ASSESSMENT_JOB_POLL_INTERVAL,
+    METRICS_COLLECT_INTERVAL,
+    MONGO_WARM_CONNECTIONS,
+    SCORING_MODEL_RELOAD_INTERVAL,
+    assessment_jobs,
+    logger,
+    metrics_registry,
+    mongo,
+    predictor_batcher,
+    process_assessment_job,
+    publish_shared_content,
+    scoring_models,
+)
+
+
+async def main(concurrency: int) -> None:
+    pool = JobWorkerPool(
+        assessment_jobs,
+        process_assessment_job,
+        concurrency=concurrency,
+        poll_interval=ASSESSMENT_JOB_POLL_INTERVAL
+    )
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    mongo.connect()
+    await mongo.warm_up(min(MONGO_WARM_CONNECTIONS, concurrency))
+    await assessment_jobs.ensure_indexes()
+    await publish_shared_content()
+    if predictor_batcher:
+        predictor_batcher.start()
+    pool.start()
+    metrics_collector = asyncio.create_task(metrics_registry.collect_forever(METRICS_COLLECT_INTERVAL))
+    model_watcher = asyncio.create_task(scoring_models.watch(SCORING_MODEL_RELOAD_INTERVAL)) if SCORING_MODEL_RELOAD_INTERVAL > 0 else None
+    logger.info(f"Assessment job worker {pool.name} started with {concurrency} slots")
+    await stop.wait()
+
+    logger.info("Stopping assessment job worker")
+    metrics_collector.cancel()
+    if model_watcher:
+        model_watcher.cancel()
+    await pool.stop()
+    if predictor_batcher:
+        await predictor_batcher.close()
+    mongo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assessment job worker")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
@@ -0,0 +1,151 @@
+"""Two-tier cache for LLM-generated assessment sections.
+
+Prompts are built from prediction bands, scores, the top stressors and a few
+questionnaire fields, so many users produce near-identical generations. The
+cache key is a hash of a normalised, bucketed view of those inputs. Lookups go
+to an in-process LRU with TTL first and then to a MongoDB collection shared by
+all workers. Each key can hold up to ``variants`` generations; a key only
+starts serving hits once all of them are filled, and hits pick one at random
+so responses don't all look the same.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_PARENTHETICAL = re.compile(r"\s*\(.*\)\s*$")
+
+
+def bucket(value: float, size: float) -> float:
+    """Round a numeric input down to its bucket so nearby values share a key"""
+    if not size:
+        return value
+    bucketed = (value // size) * size
+    return int(bucketed) if float(bucketed).is_integer() else round(bucketed, 6)
+
+
+def normalize_stressors(stressors: List[str]) -> List[str]:
+    """Drop the per-user figures from stressor labels, e.g. 'Long commute (75 min)'"""
+    return sorted(_PARENTHETICAL.sub("", s).strip().lower() for s in stressors)
+
+
+def cache_key(stage: str, inputs: Dict[str, Any]) -> str:
+    canonical = json.dumps({"stage": stage, "inputs": inputs}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LlmSectionCache:
+    """In-process LRU (with TTL) in front of a MongoDB-backed shared tier"""
+
+    def __init__(self, collection, max_entries: int = 2048, ttl_seconds: float = 86400,
+                 variants: int = 1, enabled: bool = True, shared_timeout: float = 0.5):
+        self.collection = collection
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.variants = max(1, variants)
+        self.enabled = enabled
+        # A slow or unreachable shared tier must never add more than this to a request
+        self.shared_timeout = shared_timeout
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, stage: str, counter: str) -> None:
+        stage_stats = self._stats.setdefault(stage, {"memory_hits": 0, "shared_hits": 0, "misses": 0, "stores": 0, "errors": 0})
+        stage_stats[counter] += 1
+
+    def _remember(self, key: str, variants: List[Any], expires_at: float) -> Dict[str, Any]:
+        entry = {"variants": variants[-self.variants:], "expires_at": expires_at}
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def _memory_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    async def get(self, stage: str, key: str) -> Optional[Any]:
+        """Return a cached variant, or None if the caller should generate one"""
+        if not self.enabled:
+            return None
+
+        entry = self._memory_entry(key)
+        if entry is not None and len(entry["variants"]) >= self.variants:
+            self._count(stage, "memory_hits")
+            return random.choice(entry["variants"])
+
+        try:
+            doc = await asyncio.wait_for(self.collection.find_one({"_id": key}), timeout=self.shared_timeout)
+        except Exception as e:
+            logger.warning(f"LLM cache lookup failed for stage '{stage}': {str(e) or type(e).__name__}")
+            self._count(stage, "errors")
+            doc = None
+
+        if doc and _as_utc(doc["expires_at"]) > datetime.now(timezone.utc):
+            remaining = (_as_utc(doc["expires_at"]) - datetime.now(timezone.utc)).total_seconds()
+            entry = self._remember(key, doc["variants"], time.monotonic() + remaining)
+            if len(entry["variants"]) >= self.variants:
+                self._count(stage, "shared_hits")
+                return random.choice(entry["variants"])
+
+        self._count(stage, "misses")
+        return None
+
+    async def put(self, stage: str, key: str, value: Any) -> None:
+        """Store a freshly generated variant in both tiers"""
+        if not self.enabled:
+            return
+
+        entry = self._memory_entry(key)
+        variants = (entry["variants"] if entry else []) + [value]
+        self._remember(key, variants, time.monotonic() + self.ttl_seconds)
+        self._count(stage, "stores")
+
+        try:
+            await asyncio.wait_for(self.collection.update_one(
+                {"_id": key},
+                {
+                    "$push": {"variants": {"$each": [value], "$slice": -self.variants}},
+                    "$set": {"expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)},
+                    "$setOnInsert": {"stage": stage},
+                },
+                upsert=True,
+            ), timeout=self.shared_timeout)
+        except Exception as e:
+            logger.warning(f"LLM cache store failed for stage '{stage}': {str(e) or type(e).__name__}")
+            self._count(stage, "errors")
+
+    async def ensure_indexes(self) -> None:
+        # Expired entries are removed by MongoDB's TTL monitor
+        await self.collection.create_index("expires_at", expireAfterSeconds=0)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "variants": self.variants,
+            "memory_entries": len(self._entries),
+            "stages": {stage: dict(counts) for stage, counts in self._stats.items()},
+        }
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Motor returns naive datetimes unless the client is tz_aware
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
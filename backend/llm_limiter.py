@@ -0,0 +1,191 @@
+"""Shared concurrency limit and priority-aware wait queue for upstream LLM calls.
+
+Every ``LlmChat.send_message`` goes through ``LlmConcurrencyLimiter.slot``.
+At most ``max_concurrency`` calls run at once and at most ``max_queue`` wait
+for a slot; beyond that ``LlmQueueFull`` is raised immediately so the API can
+answer 429 instead of piling up coroutines behind a rate-limited provider.
+
+Waiting calls are served by weighted fair queuing. Each (priority, client)
+pair is a flow; a call's finish tag is its flow's previous tag (or the
+current virtual time, if later) plus ``1 / weights[priority]``, and the
+smallest tag goes next. High-priority calls therefore get ``weights``-many
+slots per low-priority one, and a client with hundreds of queued calls only
+delays other clients of the same priority by one call each. Aging adds
+``queued_at / aging_seconds`` to the tag, so waiting ``aging_seconds``
+longer outweighs one low-priority slot of head start and nothing starves.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Optional
+
+PRIORITIES = ("high", "normal", "low")
+DEFAULT_WEIGHTS = {"high": 8, "normal": 3, "low": 1}
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """'high=8,normal=3,low=1' -> {priority: weight}; unlisted priorities keep their default"""
+    weights = dict(DEFAULT_WEIGHTS)
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        priority, _, weight = part.partition("=")
+        priority = priority.strip()
+        try:
+            value = float(weight)
+        except ValueError:
+            value = 0.0
+        if priority not in PRIORITIES or value <= 0:
+            raise ValueError(f"Invalid LLM priority weight: {part}")
+        weights[priority] = value
+    return weights
+
+
+class LlmQueueFull(Exception):
+    """Raised when the LLM wait queue is full; ``retry_after`` is in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class LlmConcurrencyLimiter:
+    def __init__(self, max_concurrency: int = 16, max_queue: int = 64, sample_size: int = 1000,
+                 weights: Optional[Dict[str, float]] = None, aging_seconds: float = 10.0,
+                 on_admit: Optional[Callable[[str, float], None]] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.aging_seconds = aging_seconds
+        self.on_admit = on_admit
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._free = max_concurrency
+        self._queue = []  # [key, seq, future, finish tag]; cancelled futures are skipped when popped
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._flow_finish: Dict[Any, float] = {}
+        self._waits = deque(maxlen=sample_size)
+        self._durations = deque(maxlen=sample_size)
+        self._priority_waits = {priority: deque(maxlen=sample_size) for priority in self.weights}
+        self._priority_waiting = dict.fromkeys(self.weights, 0)
+        self._priority_admitted = dict.fromkeys(self.weights, 0)
+
+    def retry_after(self) -> int:
+        """Rough time until a queued call would get a slot, from recent call durations"""
+        avg_call = sum(self._durations) / len(self._durations) if self._durations else 10.0
+        return max(1, math.ceil((self.waiting / self.max_concurrency + 1) * avg_call))
+
+    def check_admission(self) -> None:
+        """Reject up front when a new caller would only join a full queue"""
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise LlmQueueFull(self.retry_after())
+
+    async def _wait_turn(self, priority: str, client: str) -> None:
+        flow = (priority, client)
+        if len(self._flow_finish) > 4 * self.max_queue:
+            # Tags at or behind the virtual time make no difference; forget idle clients
+            self._flow_finish = {f: tag for f, tag in self._flow_finish.items() if tag > self._virtual_time}
+        finish = max(self._virtual_time, self._flow_finish.get(flow, 0.0)) + 1 / self.weights[priority]
+        self._flow_finish[flow] = finish
+        key = finish + (time.monotonic() / self.aging_seconds if self.aging_seconds else 0.0)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, [key, next(self._seq), future, finish])
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # handed a slot just as the caller gave up
+            else:
+                future.cancel()
+            raise
+
+    def _release(self) -> None:
+        """Hand the slot to the next queued call, or free it"""
+        while self._queue:
+            _, _, future, finish = heapq.heappop(self._queue)
+            if not future.cancelled():
+                self._virtual_time = max(self._virtual_time, finish)
+                future.set_result(None)
+                return
+        self._free += 1
+        self._flow_finish.clear()  # idle: finish tags restart from the virtual time
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "normal", client: str = ""):
+        """Hold one of the concurrent call slots; ``priority`` is one of ``weights``, ``client`` any caller id"""
+        if priority not in self.weights:
+            priority = "normal"
+        queued_at = time.monotonic()
+        if self._free > 0:
+            self._free -= 1
+        else:
+            self.check_admission()
+            self.waiting += 1
+            self._priority_waiting[priority] += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            try:
+                await self._wait_turn(priority, client)
+            finally:
+                self.waiting -= 1
+                self._priority_waiting[priority] -= 1
+
+        started_at = time.monotonic()
+        wait = started_at - queued_at
+        self._waits.append(wait)
+        self._priority_waits[priority].append(wait)
+        self.admitted += 1
+        self._priority_admitted[priority] += 1
+        if self.on_admit:
+            self.on_admit(priority, wait)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._durations.append(time.monotonic() - started_at)
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_seconds": _wait_summary(self._waits),
+            "weights": self.weights,
+            "aging_seconds": self.aging_seconds,
+            "priorities": {
+                priority: {
+                    "queue_depth": self._priority_waiting[priority],
+                    "admitted": self._priority_admitted[priority],
+                    "wait_seconds": _wait_summary(waits),
+                }
+                for priority, waits in self._priority_waits.items()
+            },
+        }
+
+
+def _wait_summary(waits) -> Dict[str, float]:
+    ordered = sorted(waits)
+    return {
+        "avg": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": _percentile(ordered, 0.50),
+        "p95": _percentile(ordered, 0.95),
+        "max": ordered[-1] if ordered else 0.0,
+    }
+
+
+def _percentile(ordered, q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -0,0 +1,185 @@
+"""Tail-latency protection for upstream LLM calls: hedged requests and a circuit breaker.
+
+``HedgedCalls.run`` sends a call and, if it is still running after the
+stage's recent p95 latency, a second identical call; the first success
+wins and the other is cancelled. Hedging waits for ``min_samples`` latencies
+per stage and is capped at ``max_ratio`` hedges per call, so a slow
+provider doesn't get twice the load.
+
+``CircuitBreaker`` opens after ``failure_threshold`` consecutive failures.
+While open, ``check`` raises ``CircuitOpen`` at once (callers use their
+default content); after ``cooldown`` one probe call is let through, and
+its outcome closes the breaker or opens it again.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATES = (CLOSED, HALF_OPEN, OPEN)
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the LLM while the breaker is open; ``retry_after`` is in seconds"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"LLM circuit breaker is open, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0, enabled: bool = True,
+                 on_transition: Optional[Callable[[str], None]] = None):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.enabled = enabled
+        self.on_transition = on_transition
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+        self.opened = 0
+        self.short_circuited = 0
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        if self.on_transition:
+            self.on_transition(state)
+
+    def check(self) -> None:
+        """Raise CircuitOpen unless a call may go upstream now"""
+        if not self.enabled or self.state == CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self._transition(HALF_OPEN)
+        # A probe whose outcome was never recorded (its caller was cancelled) expires after a cooldown
+        if self.state == HALF_OPEN and (self.probe_started_at is None or now - self.probe_started_at >= self.cooldown):
+            self.probe_started_at = now
+            return
+        self.short_circuited += 1
+        raise CircuitOpen(max(0.0, self.opened_at + self.cooldown - now) if self.state == OPEN else self.cooldown)
+
+    def recheck(self) -> None:
+        """For a call admitted earlier (e.g. before waiting for a limiter slot): raise CircuitOpen if the breaker opened since"""
+        if self.enabled and self.state == OPEN:
+            self.short_circuited += 1
+            raise CircuitOpen(max(0.0, self.opened_at + self.cooldown - time.monotonic()))
+
+    def record_success(self) -> None:
+        if not self.enabled:
+            return
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            logger.info("LLM circuit breaker closed after a successful probe")
+            self.probe_started_at = None
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        if not self.enabled:
+            return
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+            logger.warning(f"LLM circuit breaker opened after {self.consecutive_failures} consecutive failures, "
+                           f"using default content for {self.cooldown}s")
+            self.opened_at = time.monotonic()
+            self.probe_started_at = None
+            self.opened += 1
+            self._transition(OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "cooldown_seconds": self.cooldown,
+            "open_for_seconds": max(0.0, self.opened_at + self.cooldown - time.monotonic()) if self.state == OPEN else 0.0,
+            "opened": self.opened,
+            "short_circuited": self.short_circuited,
+        }
+
+
+class HedgedCalls:
+    def __init__(self, enabled: bool = False, quantile: float = 0.95, min_delay: float = 0.05,
+                 min_samples: int = 20, max_ratio: float = 0.1, sample_size: int = 500,
+                 on_result: Optional[Callable[[str, str], None]] = None):
+        self.enabled = enabled
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self.on_result = on_result
+        self._latencies: Dict[str, deque] = defaultdict(lambda: deque(maxlen=sample_size))
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def delay(self, stage: str) -> Optional[float]:
+        """Seconds to wait before hedging a call of this stage; None = don't hedge"""
+        samples = self._latencies[stage]
+        if not self.enabled or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return max(self.min_delay, ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))])
+
+    async def run(self, stage: str, call: Callable[[], Awaitable[Any]],
+                  can_hedge: Callable[[], bool] = lambda: True) -> Any:
+        """Result of the first of ``call()`` and an optional delayed second ``call()`` to succeed"""
+        self.calls += 1
+        delay = self.delay(stage)
+        started = {}
+
+        def send() -> asyncio.Task:
+            task = asyncio.create_task(call())
+            started[task] = time.monotonic()
+            return task
+
+        primary = send()
+        hedge = None
+        pending = {primary}
+        try:
+            if delay is not None:
+                await asyncio.wait(pending, timeout=delay)
+                if not primary.done() and self.hedged < self.max_ratio * self.calls and can_hedge():
+                    self.hedged += 1
+                    hedge = send()
+                    pending.add(hedge)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._latencies[stage].append(time.monotonic() - started[task])
+                        if hedge:
+                            self._record(stage, "hedge" if task is hedge else "primary")
+                        return task.result()
+                    error = task.exception()
+            if hedge:
+                self._record(stage, "none")
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _record(self, stage: str, winner: str) -> None:
+        if winner == "hedge":
+            self.hedge_wins += 1
+        if self.on_result:
+            self.on_result(stage, winner)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+            "delay_seconds": {stage: self.delay(stage) for stage in self._latencies},
+        }
@@ -0,0 +1,196 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms keyed by a tuple of label values, kept as
+plain dicts and lists. Label values are passed positionally in
+``labelnames`` order; hot paths bind a histogram series once with ``labels``,
+after which recording an observation is a single list append. Samples are
+bucketed when the registry is rendered or collected (``collect_forever``
+bounds the backlog between scrapes). Metrics are updated from the event loop
+thread only, so there is no locking. ``Registry.render`` produces the text
+format scraped from ``/metrics``.
+"""
+import asyncio
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in self.values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """A settable gauge, or one read from ``function`` at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self.function = function
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels: str) -> None:
+        self.values[labels] = value
+
+    def render(self) -> List[str]:
+        values = {(): self.function()} if self.function else self.values
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values.items()
+        ]
+
+
+class _HistogramSeries:
+    """Bucket counts and sum for one label set"""
+
+    __slots__ = ("bounds", "counts", "sum", "pending", "observe")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last one is the +Inf overflow
+        self.sum = 0.0
+        self.pending: List[float] = []
+        # Recording is a bare list append; samples are bucketed later by collect()
+        self.observe = self.pending.append
+
+    def collect(self) -> None:
+        pending = self.pending
+        if not pending:
+            return
+        # Sorting is C-level, so bucketing costs O(buckets) Python steps rather than O(samples)
+        pending.sort()
+        counts = self.counts
+        below = 0
+        for i, bound in enumerate(self.bounds):
+            at_or_below = bisect_right(pending, bound)
+            counts[i] += at_or_below - below
+            below = at_or_below
+        counts[-1] += len(pending) - below
+        self.sum += sum(pending)
+        pending.clear()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Tuple[str, ...], _HistogramSeries] = {}
+
+    def labels(self, *labels: str) -> _HistogramSeries:
+        """The series for one label set; bind it once on hot paths"""
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = _HistogramSeries(self.buckets)
+        return series
+
+    def observe(self, value: float, *labels: str) -> None:
+        self.labels(*labels).observe(value)
+
+    def collect(self) -> None:
+        for series in self.values.values():
+            series.collect()
+
+    def render(self) -> List[str]:
+        self.collect()
+        lines = self.header()
+        bounds = self.buckets + (float("inf"),)
+        for labels, series in self.values.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series.counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def collect(self) -> None:
+        """Bucket the samples histograms recorded since the last collection"""
+        for metric in self.metrics:
+            if isinstance(metric, Histogram):
+                metric.collect()
+
+    async def collect_forever(self, interval: float) -> None:
+        """Keep unscraped samples bounded in processes that may never be scraped"""
+        while True:
+            await asyncio.sleep(interval)
+            self.collect()
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,68 @@
+"""Convert stored assessments between the plain and the compact storage format.
+
+Reads go through the codec either way, so this can run while the API is
+serving. Each document is replaced only if it is still in the source format
+(a concurrent writer or a second run can't double-convert it), and the run
+can be interrupted and restarted.
+
+    cd backend && python migrate_storage.py --dry-run
+    cd backend && python migrate_storage.py --to compact
+    cd backend && python migrate_storage.py --to plain   # roll back
+"""
+import argparse
+import asyncio
+
+import bson
+from pymongo import ReplaceOne
+
+from server import assessment_codec, db, logger, mongo, publish_shared_content, shared_content
+
+
+async def main(to: str, batch_size: int, limit: int, dry_run: bool) -> None:
+    mongo.connect()
+    if to == "compact":
+        await publish_shared_content()
+        if not shared_content.published:
+            raise SystemExit("Shared content could not be published; compact documents would keep it inline")
+    source = {"storage_format": {"$exists": to == "plain"}}
+
+    converted = bytes_before = bytes_after = 0
+    batch = []
+
+    async def write(batch):
+        if not dry_run:
+            await db.assessments.bulk_write(
+                [ReplaceOne({"_id": doc["_id"], **source}, doc) for doc in batch], ordered=False
+            )
+
+    cursor = db.assessments.find(source, batch_size=batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    async for doc in cursor:
+        converted_doc = assessment_codec.encode(doc) if to == "compact" else await assessment_codec.decode(doc)
+        bytes_before += len(bson.encode(doc))
+        bytes_after += len(bson.encode(converted_doc))
+        batch.append(converted_doc)
+        if len(batch) >= batch_size:
+            await write(batch)
+            converted += len(batch)
+            batch = []
+            logger.info(f"{converted} assessments converted")
+    if batch:
+        await write(batch)
+        converted += len(batch)
+
+    ratio = bytes_after / bytes_before if bytes_before else 1
+    action = "Would convert" if dry_run else "Converted"
+    logger.info(f"{action} {converted} assessments to {to}: {bytes_before:,} -> {bytes_after:,} BSON bytes ({ratio:.0%})")
+    mongo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert stored assessments between storage formats")
+    parser.add_argument("--to", choices=["compact", "plain"], default="compact")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=0, help="max documents to convert (0 = all)")
+    parser.add_argument("--dry-run", action="store_true", help="report the size change without writing")
+    args = parser.parse_args()
+    asyncio.run(main(args.to, args.batch_size, args.limit, args.dry_run))
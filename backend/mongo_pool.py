@@ -0,0 +1,200 @@
+"""MongoDB client lifecycle for the API and the worker scripts.
+
+Importing the app must not do any I/O: building a client resolves SRV
+records and starts monitor threads. ``MongoPool`` only records its settings;
+``connect`` builds the Motor client (from the app lifespan or a script's
+``main``) and ``warm_up`` pings the server and opens connections ahead of
+traffic. Code that is wired up at import, like the job queue or the LLM
+cache, gets ``LazyCollection`` handles from ``pool.db`` that resolve to the
+real collection on first use after ``connect``.
+
+A pymongo ``ConnectionPoolListener`` keeps pool counters for ``stats``.
+"""
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+
+class _PoolStats(monitoring.ConnectionPoolListener):
+    """Connection pool counters, summed over all servers (called from pymongo threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = dict.fromkeys(
+            ["created", "closed", "check_out_started", "checked_out", "checked_in", "check_out_failed", "pool_cleared"], 0
+        )
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._bump("pool_cleared")
+
+    def connection_created(self, event):
+        self._bump("created")
+
+    def connection_closed(self, event):
+        self._bump("closed")
+
+    def connection_check_out_started(self, event):
+        self._bump("check_out_started")
+
+    def connection_check_out_failed(self, event):
+        self._bump("check_out_failed")
+
+    def connection_checked_out(self, event):
+        self._bump("checked_out")
+
+    def connection_checked_in(self, event):
+        self._bump("checked_in")
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            c = dict(self.counters)
+        in_use = c["checked_out"] - c["checked_in"]
+        open_connections = c["created"] - c["closed"]
+        return {
+            "open": open_connections,
+            "in_use": in_use,
+            "idle": open_connections - in_use,
+            "waiting": c["check_out_started"] - c["checked_out"] - c["check_out_failed"],
+            "created": c["created"],
+            "closed": c["closed"],
+            "checkouts": c["checked_out"],
+            "checkout_failures": c["check_out_failed"],
+            "pool_cleared": c["pool_cleared"],
+        }
+
+
+class LazyCollection:
+    """Stands in for a Motor collection until the pool is connected"""
+
+    def __init__(self, pool: "MongoPool", name: str, options: Optional[Dict[str, Any]] = None):
+        self._pool = pool
+        self._name = name
+        self._options = options or {}
+        self._client = None
+        self._collection = None
+
+    def with_options(self, **options) -> "LazyCollection":
+        return LazyCollection(self._pool, self._name, {**self._options, **options})
+
+    def _resolve(self):
+        client = self._pool.client
+        if self._client is not client:
+            collection = self._pool.database[self._name]
+            self._collection = collection.with_options(**self._options) if self._options else collection
+            self._client = client
+        return self._collection
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+
+class LazyDatabase:
+    def __init__(self, pool: "MongoPool"):
+        self._pool = pool
+        self._collections: Dict[str, LazyCollection] = {}
+
+    def __getattr__(self, name: str) -> LazyCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name: str) -> LazyCollection:
+        if name not in self._collections:
+            self._collections[name] = LazyCollection(self._pool, name)
+        return self._collections[name]
+
+
+class MongoPool:
+    def __init__(self, url: Optional[str], db_name: Optional[str], max_pool_size: int = 100,
+                 min_pool_size: int = 0, max_idle_time_ms: Optional[int] = None,
+                 connect_timeout_ms: int = 20000, server_selection_timeout_ms: int = 30000,
+                 socket_timeout_ms: Optional[int] = None, compressors: Optional[List[str]] = None):
+        self.url = url
+        self.db_name = db_name
+        self.options = {
+            "maxPoolSize": max_pool_size,
+            "minPoolSize": min_pool_size,
+            "maxIdleTimeMS": max_idle_time_ms,
+            "connectTimeoutMS": connect_timeout_ms,
+            "serverSelectionTimeoutMS": server_selection_timeout_ms,
+            "socketTimeoutMS": socket_timeout_ms,
+            "compressors": ",".join(compressors) if compressors else None,
+        }
+        self.db = LazyDatabase(self)
+        self._client: Optional[AsyncIOMotorClient] = None
+        self._stats = _PoolStats()
+
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        if self._client is None:
+            raise RuntimeError("MongoDB client is not connected")
+        return self._client
+
+    @property
+    def database(self):
+        return self.client[self.db_name]
+
+    @property
+    def connected(self) -> bool:
+        return self._client is not None
+
+    def connect(self, client: Optional[AsyncIOMotorClient] = None) -> AsyncIOMotorClient:
+        """Build the Motor client, or adopt ``client`` (e.g. a mongomock-motor client in a load test)"""
+        if self._client is not None:
+            return self._client
+        if client is not None:
+            self._client = client
+            return client
+        if not self.url or not self.db_name:
+            raise RuntimeError("MONGO_URL or DB_NAME not set")
+
+        url = self.url
+        # Ensure MONGO_URL has the correct scheme
+        if not url.startswith(('mongodb://', 'mongodb+srv://')):
+            url = f"mongodb+srv://{url}"
+
+        options = {key: value for key, value in self.options.items() if value is not None}
+        self._client = AsyncIOMotorClient(url, event_listeners=[self._stats], **options)
+        return self._client
+
+    async def ping(self) -> None:
+        await self.client.admin.command("ping")
+
+    async def warm_up(self, connections: int) -> None:
+        """Ping, then hold ``connections`` concurrent commands so that many sockets are opened and pooled"""
+        await self.ping()
+        if connections > 1:
+            await asyncio.gather(*(self.database.command("ping") for _ in range(connections)))
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "max_pool_size": self.options["maxPoolSize"],
+            "min_pool_size": self.options["minPoolSize"],
+            "compressors": self.options["compressors"],
+            **self._stats.snapshot(),
+        }
@@ -0,0 +1,237 @@
+"""Trained-model inference for the risk scores, with request micro-batching.
+
+A predictor artifact holds a regressor trained by ``train_predictor.py`` on
+labelled assessments, together with the feature definitions it was trained
+on (same format as a scoring model's ``features``) and the score names it
+predicts. Two formats are read:
+
+- ``.joblib``: a dict with ``version``, ``features``, ``targets`` and a
+  scikit-learn ``estimator`` (needs scikit-learn and joblib);
+- ``.onnx``: an exported model whose ``predictor`` metadata entry holds the
+  same fields as JSON (needs onnxruntime; CPU execution provider).
+
+Predicted values are truncated and clamped to 0-100 like the heuristic
+scores. Bands and key stressors still come from the scoring model.
+
+``MicroBatcher`` coalesces concurrent single-questionnaire requests into
+one vectorized inference call in a worker thread, one batch at a time:
+requests arriving while a batch runs form the next one (up to
+``max_batch``). With ``max_wait`` > 0 the first request of a batch also
+waits up to that long for others; under load the in-flight batch already
+provides the window, so the wait mostly adds latency at low traffic.
+"""
+import abc
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from scoring import feature_matrix
+
+logger = logging.getLogger(__name__)
+
+
+class PredictorError(ValueError):
+    """A predictor artifact that cannot be loaded"""
+
+
+class TrainedPredictor(abc.ABC):
+    """Common part of the artifact formats: feature encoding and output clamping"""
+
+    backend = "trained"
+
+    def __init__(self, version: str, features: List[Dict[str, Any]], targets: List[str], path: Optional[Path] = None):
+        if not isinstance(version, str) or not version:
+            raise PredictorError("Predictor needs a version string")
+        if not targets:
+            raise PredictorError("Predictor has no targets")
+        self.version = version
+        self.features = features
+        self.targets = list(targets)
+        self.path = path
+
+    @property
+    def fields(self) -> List[str]:
+        """Questionnaire fields the predictor reads"""
+        return list(dict.fromkeys(f["field"] for f in self.features))
+
+    @abc.abstractmethod
+    def _infer(self, matrix: np.ndarray) -> np.ndarray:
+        """Raw (rows x targets) predictions for a feature matrix"""
+
+    def predict_batch(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """(rows x targets) integer scores from ``columns_from_questionnaires`` output"""
+        raw = np.asarray(self._infer(feature_matrix(self.features, columns)), dtype=np.float64)
+        raw = raw.reshape(len(raw), len(self.targets))
+        return np.clip(np.trunc(np.nan_to_num(raw)), 0, 100).astype(np.int64)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend,
+            "version": self.version,
+            "path": str(self.path) if self.path else None,
+            "features": len(self.features),
+            "targets": self.targets
+        }
+
+
+class SklearnPredictor(TrainedPredictor):
+    backend = "sklearn"
+
+    def __init__(self, estimator: Any, **kwargs):
+        super().__init__(**kwargs)
+        self.estimator = estimator
+
+    def _infer(self, matrix: np.ndarray) -> np.ndarray:
+        return self.estimator.predict(matrix)
+
+
+class OnnxPredictor(TrainedPredictor):
+    backend = "onnx"
+
+    def __init__(self, session: Any, **kwargs):
+        super().__init__(**kwargs)
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+
+    def _infer(self, matrix: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: matrix.astype(np.float32)})[0]
+
+
+def load_predictor(path: Path) -> TrainedPredictor:
+    """Load a ``.joblib`` or ``.onnx`` predictor artifact"""
+    path = Path(path)
+    try:
+        if path.suffix == ".onnx":
+            try:
+                import onnxruntime
+            except ImportError as e:
+                raise PredictorError("onnxruntime is required for .onnx predictors") from e
+            session = onnxruntime.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+            metadata = session.get_modelmeta().custom_metadata_map.get("predictor")
+            if not metadata:
+                raise PredictorError(f"{path} has no predictor metadata")
+            return OnnxPredictor(session, path=path, **json.loads(metadata))
+
+        try:
+            import joblib
+        except ImportError as e:
+            raise PredictorError("joblib and scikit-learn are required for .joblib predictors") from e
+        artifact = joblib.load(path)
+        return SklearnPredictor(
+            artifact["estimator"], version=artifact["version"], features=artifact["features"],
+            targets=artifact["targets"], path=path
+        )
+    except PredictorError:
+        raise
+    except Exception as e:
+        raise PredictorError(f"Could not load predictor {path}: {e!r}") from e
+
+
+class MicroBatcher:
+    """Runs ``predict_many(items) -> results`` on batches of concurrently submitted items"""
+
+    def __init__(self, predict_many: Callable[[List[Any]], List[Any]], max_batch: int = 64, max_wait: float = 0.0):
+        self.predict_many = predict_many
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.rows = 0
+        self.failed_batches = 0
+        self._batch_sizes = deque(maxlen=1000)
+        self._batch_seconds = deque(maxlen=1000)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for _, future in self._pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Micro-batcher closed"))
+        self._pending = []
+
+    async def submit(self, item: Any) -> Any:
+        """Result for one item, computed together with whatever else is pending"""
+        if not self.running:
+            raise RuntimeError("Micro-batcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        self._arrived.set()
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrived.wait()
+            if len(self._pending) < self.max_batch and self.max_wait > 0:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            if not self._pending:
+                self._arrived.clear()
+            if len(self._pending) < self.max_batch:
+                self._full.clear()
+            # Callers that timed out have cancelled their futures; don't spend inference on them
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(None, self.predict_many, [item for item, _ in batch])
+            except Exception as e:
+                self.failed_batches += 1
+                logger.warning(f"Batched inference of {len(batch)} rows failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.rows += len(batch)
+            self._batch_sizes.append(len(batch))
+            self._batch_seconds.append(time.perf_counter() - started)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        sizes, seconds = list(self._batch_sizes), list(self._batch_seconds)
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "rows": self.rows,
+            "failed_batches": self.failed_batches,
+            "avg_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else 0,
+            "max_batch_size": max(sizes) if sizes else 0,
+            "avg_batch_ms": round(sum(seconds) / len(seconds) * 1000, 3) if seconds else 0
+        }
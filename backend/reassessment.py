@@ -0,0 +1,49 @@
+"""Incremental re-assessment: which sections of a previous assessment a retake can reuse.
+
+A retake usually changes a few answers, and most generated sections don't
+depend on them. ``server.py`` declares, per section, the derived values its
+prompt is built from as a ``SectionInputs``: prediction keys (bands,
+scores), how many of the key stressors, and questionnaire fields. The
+previous assessment's values are compared with the retake's, and a stored
+section is reused when none of its inputs changed; only the others are
+generated again.
+
+Inputs are compared exactly (not bucketed like the LLM cache keys), so a
+reused section is the one its prompt would have asked for. A section that
+is generated again may still come from the LLM cache.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+class SectionInputs(NamedTuple):
+    prediction: Tuple[str, ...] = ()
+    stressors: Optional[int] = None  # the first N key stressors; None = all, 0 = none
+    questionnaire: Tuple[str, ...] = ()
+
+
+class AssessmentInputs(NamedTuple):
+    """What sections are generated from: the prediction, key stressors and questionnaire answers (a plain dict)"""
+    prediction: Dict[str, Any]
+    stressors: Sequence[str]
+    questionnaire: Dict[str, Any]
+
+
+def changed_fields(previous: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Questionnaire fields whose answer differs, in the order of ``current``"""
+    return [field for field, value in current.items() if previous.get(field) != value]
+
+
+def input_values(inputs: SectionInputs, assessment: AssessmentInputs) -> Dict[str, Any]:
+    """A section's inputs as 'prediction.<key>', 'stressors' and 'questionnaire.<field>' values"""
+    values = {f"prediction.{key}": assessment.prediction.get(key) for key in inputs.prediction}
+    if inputs.stressors != 0:
+        values["stressors"] = list(assessment.stressors[:inputs.stressors])
+    values.update((f"questionnaire.{field}", assessment.questionnaire.get(field)) for field in inputs.questionnaire)
+    return values
+
+
+def changed_inputs(inputs: SectionInputs, previous: AssessmentInputs, current: AssessmentInputs) -> List[str]:
+    """Names of the section's inputs that differ between the two assessments; empty = reusable"""
+    before = input_values(inputs, previous)
+    after = input_values(inputs, current)
+    return [name for name, value in after.items() if before[name] != value]
@@ -0,0 +1,30 @@
+"""Rebuild the cohort analytics rollups from stored assessments.
+
+Backfills days stored before rollups existed, or repairs drift after failed
+rollup updates. Run it for past days, or during a quiet period when it
+includes today:
+
+    cd backend && python rebuild_rollups.py --start 2025-01-01 --end 2025-06-30
+"""
+import argparse
+import asyncio
+from datetime import date
+
+import cohort_rollups
+from server import db, logger, mongo
+
+
+async def main(start, end) -> None:
+    mongo.connect()
+    await cohort_rollups.ensure_indexes(db.assessment_rollups)
+    processed = await cohort_rollups.rebuild(db.assessments, db.assessment_rollups, start=start, end=end)
+    logger.info(f"Rebuilt cohort rollups from {processed} assessments")
+    mongo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild cohort analytics rollups")
+    parser.add_argument("--start", type=date.fromisoformat, help="first UTC day (default: earliest)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last UTC day (default: latest)")
+    args = parser.parse_args()
+    asyncio.run(main(args.start, args.end))
@@ -0,0 +1,402 @@
+"""Declarative, versioned scoring model: risk scores, bands and key stressors.
+
+A model is a JSON document (``scoring_models/*.json``) with a ``version``:
+
+- ``features``: a questionnaire field as is (numbers, booleans as 0/1), a
+  ``lookup`` table over a category field (missing keys score 0), a ``count``
+  of a list field, or a field times ``scale`` capped at ``max``.
+- ``scores``, evaluated in order: ``bias`` plus weighted features (or scores
+  computed earlier), truncated to an int and clamped, then banded by the
+  first ``[band, threshold]`` the score is above, else ``default_band``.
+- ``stressors``: rules comparing a field (or its ``count``) to a value, each
+  with a stable ``key`` and a label template over questionnaire fields (list
+  fields are joined, up to ``list_items``); the first ``max`` matches are
+  kept. ``predict`` returns the matched keys as ``stressor_keys``, for code
+  that must not depend on the wording (template fragments, cohort rollups).
+
+``compile_model`` validates the document and builds the weight matrix
+(scores x features, plus a matrix of dependencies on earlier scores). The
+single-questionnaire path is generated from it as straight-line Python with
+the weights folded in as constants, so scoring one request costs no more
+than the hand-written formulas did; the batch path multiplies a NumPy
+feature matrix by the same weights. ``ScoringModelStore`` holds the active
+model and reloads it when its file changes, keeping the previous model if
+the new one does not compile.
+"""
+import asyncio
+import json
+import logging
+import operator
+import os
+import string
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "==": operator.eq, "!=": operator.ne}
+
+
+class ScoringModelError(ValueError):
+    """The scoring model document is invalid"""
+
+
+def _identifier(value: Any, what: str) -> str:
+    if not isinstance(value, str) or not value.isidentifier():
+        raise ScoringModelError(f"Invalid {what}: {value!r}")
+    return value
+
+
+def _number(value: Any, what: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ScoringModelError(f"{what} must be a number, got {value!r}")
+    return value
+
+
+def _label_fields(label: str) -> List[str]:
+    fields = []
+    for _, name, spec, conversion in string.Formatter().parse(label):
+        if name is not None:
+            if spec or conversion:
+                raise ScoringModelError(f"Label fields take no format spec or conversion: {label!r}")
+            fields.append(_identifier(name, "label field"))
+    return fields
+
+
+class ScoringModel:
+    """A compiled scoring model; build with ``compile_model``"""
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.version = spec["version"]
+        self.features = spec["features"]
+        self.scores = spec["scores"]
+        self.rules = spec["stressors"]["rules"]
+        self.max_stressors = spec["stressors"]["max"]
+        self.feature_names = [f["name"] for f in self.features]
+        self.score_names = [s["name"] for s in self.scores]
+
+        self.weights = np.zeros((len(self.scores), len(self.features)))
+        self.score_weights = np.zeros((len(self.scores), len(self.scores)))
+        self.biases = np.array([s["bias"] for s in self.scores], dtype=np.float64)
+        for i, score in enumerate(self.scores):
+            for name, weight in score["weights"].items():
+                if name in self.feature_names:
+                    self.weights[i, self.feature_names.index(name)] = weight
+                else:
+                    self.score_weights[i, self.score_names.index(name)] = weight
+
+        self.predict, self.stressors = self._generate()
+
+    @property
+    def fields(self) -> List[str]:
+        """Questionnaire fields the model reads"""
+        names = [f["field"] for f in self.features] + [r["field"] for r in self.rules]
+        names += [name for r in self.rules for name in _label_fields(r["label"])]
+        return list(dict.fromkeys(names))
+
+    def _generate(self) -> Tuple[Callable, Callable]:
+        """Source for predict(q) and stressors(q) with the weights folded in"""
+        namespace: Dict[str, Any] = {}
+        features = []
+        for j, feature in enumerate(self.features):
+            value = f"q.{feature['field']}"
+            if "lookup" in feature:
+                namespace[f"lookup_{j}"] = feature["lookup"]
+                value = f"lookup_{j}.get({value}, 0)"
+            elif feature.get("count"):
+                value = f"len({value})"
+            elif "scale" in feature or "max" in feature:
+                value = f"{value} * {feature.get('scale', 1)!r}"
+                if "max" in feature:
+                    value = f"min({feature['max']!r}, {value})"
+            features.append(value)
+
+        # Feature expressions are inlined into the weighted sums, which are summed in weight order
+        lines = ["def predict(q):"]
+        result = []
+        for i, score in enumerate(self.scores):
+            terms = [repr(score["bias"])]
+            for name, weight in score["weights"].items():
+                source = features[self.feature_names.index(name)] if name in self.feature_names else f"s{self.score_names.index(name)}"
+                if weight:
+                    terms.append(source if weight == 1 else f"{weight!r} * {source}")
+            low, high = score["clamp"]
+            lines += [
+                f"    s{i} = int({' + '.join(terms)})",
+                f"    if s{i} < {low!r}:",
+                f"        s{i} = {low!r}",
+                f"    elif s{i} > {high!r}:",
+                f"        s{i} = {high!r}",
+            ]
+            band = repr(score["default_band"])
+            for name, threshold in reversed(score["bands"]):
+                band = f"{name!r} if s{i} > {threshold!r} else {band}"
+            result += [f"{score['name']!r}: s{i}", f"{score['band']!r}: {band}"]
+        result += [f"'model_version': {self.version!r}", "'stressor_keys': stressor_keys(q)"]
+        lines.append(f"    return {{{', '.join(result)}}}")
+
+        def condition(rule):
+            value = f"len(q.{rule['field']})" if rule.get("count") else f"q.{rule['field']}"
+            if rule["op"] == "==" and rule["value"] is True:
+                return f"    if {value}:"
+            return f"    if {value} {rule['op']} {rule['value']!r}:"
+
+        lines.append("def stressor_keys(q):")
+        lines.append("    found = []")
+        for rule in self.rules:
+            lines += [condition(rule), f"        found.append({rule['key']!r})"]
+        lines.append(f"    return found[:{int(self.max_stressors)}]")
+
+        lines.append("def stressors(q):")
+        lines.append("    found = []")
+        for rule in self.rules:
+            lines.append(condition(rule))
+            # The label becomes an f-string; joined list fields are bound to locals first
+            template = ""
+            for literal, name, _, _ in string.Formatter().parse(rule["label"]):
+                template += literal.replace("{", "{{").replace("}", "}}")
+                if name and rule.get("list_items"):
+                    lines.append(f"        joined_{name} = ', '.join(q.{name}[:{int(rule['list_items'])}])")
+                    template += f"{{joined_{name}}}"
+                elif name:
+                    template += f"{{q.{name}}}"
+            lines.append(f"        found.append(f{template!r})")
+        lines.append(f"    return found[:{int(self.max_stressors)}]")
+
+        exec(compile("\n".join(lines), f"<scoring model {self.version}>", "exec"), namespace)
+        return namespace["predict"], namespace["stressors"]
+
+    def feature_matrix(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """(rows x features) float64 matrix from ``columns_from_questionnaires`` output"""
+        return feature_matrix(self.features, columns)
+
+    def band(self, score_name: str, value: float) -> str:
+        """Band of a single score value, by the model's thresholds"""
+        score = self.scores[self.score_names.index(score_name)]
+        for name, threshold in score["bands"]:
+            if value > threshold:
+                return name
+        return score["default_band"]
+
+    def score_batch(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Integer scores, band indexes and stressor flags for every row: one matrix product plus score dependencies"""
+        totals = self.feature_matrix(columns) @ self.weights.T + self.biases
+        result: Dict[str, np.ndarray] = {}
+        computed = []
+        for i, score in enumerate(self.scores):
+            total = totals[:, i]
+            for k in np.nonzero(self.score_weights[i])[0]:
+                total = total + self.score_weights[i, k] * computed[k]
+            low, high = score["clamp"]
+            values = np.clip(np.trunc(total), low, high).astype(np.int64)
+            computed.append(values)
+            band = np.zeros(len(values), dtype=np.int8)
+            for b, (_, threshold) in enumerate(reversed(score["bands"]), start=1):
+                band[values > threshold] = b
+            result[score["name"]] = values
+            result[score["band"]] = band
+
+        flags = []
+        for rule in self.rules:
+            column = columns[f"{rule['field']}_count"] if rule.get("count") else columns[rule["field"]]
+            flags.append(OPERATORS[rule["op"]](column, rule["value"]))
+        result["stressor_flags"] = np.column_stack(flags) if flags else np.zeros((len(totals), 0), dtype=bool)
+        return result
+
+    def score_rows(self, columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """Per-row dicts in the shape ``predict`` returns, plus key_stressors"""
+        scores = self.score_batch(columns)
+        names, values = [], []
+        for score in self.scores:
+            bands = np.array([score["default_band"], *(name for name, _ in reversed(score["bands"]))])
+            names += [score["name"], score["band"]]
+            values += [scores[score["name"]].tolist(), bands[scores[score["band"]]].tolist()]
+        stressors = self._stressor_labels(columns, scores["stressor_flags"])
+        keys = self._stressor_keys(scores["stressor_flags"])
+
+        rows = []
+        for row_values, row_stressors, row_keys in zip(zip(*values), stressors, keys):
+            row = dict(zip(names, row_values))
+            row["model_version"] = self.version
+            row["stressor_keys"] = row_keys
+            row["key_stressors"] = row_stressors
+            rows.append(row)
+        return rows
+
+    def _stressor_keys(self, flags: np.ndarray) -> List[List[str]]:
+        keys: List[List[str]] = [[] for _ in range(len(flags))]
+        for k, rule in enumerate(self.rules):
+            for i in np.flatnonzero(flags[:, k]).tolist():
+                keys[i].append(rule["key"])
+        return [row[:self.max_stressors] for row in keys]
+
+    def _stressor_labels(self, columns: Dict[str, np.ndarray], flags: np.ndarray) -> List[List[str]]:
+        """Labels per row, rendered rule by rule for the flagged rows only"""
+        labels: List[List[str]] = [[] for _ in range(len(flags))]
+        for k, rule in enumerate(self.rules):
+            flagged = np.flatnonzero(flags[:, k])
+            fields = _label_fields(rule["label"])
+            if not fields:
+                for i in flagged.tolist():
+                    labels[i].append(rule["label"])
+                continue
+            label, list_items = rule["label"].format, rule.get("list_items")
+            field_values = [columns[name][flagged].tolist() for name in fields]
+            for i, row_values in zip(flagged.tolist(), zip(*field_values)):
+                if list_items:
+                    row_values = [", ".join(value[:list_items]) for value in row_values]
+                labels[i].append(label(**dict(zip(fields, row_values))))
+        return [row[:self.max_stressors] if len(row) > self.max_stressors else row for row in labels]
+
+
+def feature_matrix(features: List[Dict[str, Any]], columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """(rows x features) float64 matrix for a list of feature definitions"""
+    n = len(next(iter(columns.values()))) if columns else 0
+    matrix = np.empty((n, len(features)), dtype=np.float64)
+    for j, feature in enumerate(features):
+        column = columns[feature["field"]]
+        if "lookup" in feature:
+            values = np.zeros(n, dtype=np.float64)
+            for key, points in feature["lookup"].items():
+                values[column == key] = points
+        elif feature.get("count"):
+            values = columns[f"{feature['field']}_count"]
+        else:
+            values = column * feature.get("scale", 1)
+            if "max" in feature:
+                values = np.minimum(feature["max"], values)
+        matrix[:, j] = values
+    return matrix
+
+
+def compile_model(spec: Dict[str, Any]) -> ScoringModel:
+    """Validate a model document and compile it"""
+    try:
+        if not isinstance(spec.get("version"), str) or not spec["version"]:
+            raise ScoringModelError("Model needs a version string")
+
+        feature_names = []
+        for feature in spec["features"]:
+            feature_names.append(_identifier(feature["name"], "feature name"))
+            _identifier(feature["field"], "field")
+            if "lookup" in feature:
+                for points in feature["lookup"].values():
+                    _number(points, f"lookup points of {feature['name']}")
+            for key in ("scale", "max"):
+                if key in feature:
+                    _number(feature[key], f"{key} of {feature['name']}")
+        if len(set(feature_names)) != len(feature_names):
+            raise ScoringModelError("Duplicate feature names")
+
+        score_names: List[str] = []
+        for score in spec["scores"]:
+            _identifier(score["name"], "score name")
+            _identifier(score["band"], "band field")
+            _number(score["bias"], f"bias of {score['name']}")
+            for name, weight in score["weights"].items():
+                if name not in feature_names and name not in score_names:
+                    raise ScoringModelError(f"{score['name']} weights unknown feature or later score {name!r}")
+                _number(weight, f"weight {score['name']}.{name}")
+            low, high = (_number(v, f"clamp of {score['name']}") for v in score["clamp"])
+            thresholds = [_number(threshold, f"band threshold of {score['name']}") for _, threshold in score["bands"]]
+            if thresholds != sorted(thresholds, reverse=True):
+                raise ScoringModelError(f"Bands of {score['name']} must be listed from the highest threshold down")
+            for name, _ in score["bands"]:
+                if not isinstance(name, str):
+                    raise ScoringModelError(f"Invalid band name {name!r}")
+            if not isinstance(score["default_band"], str):
+                raise ScoringModelError(f"Invalid default band of {score['name']}")
+            score_names.append(score["name"])
+
+        if int(spec["stressors"]["max"]) < 0:
+            raise ScoringModelError("stressors.max must not be negative")
+        # Keys end up in MongoDB field names (rollups) and fragment lookups, so they must be identifiers
+        stressor_keys = [_identifier(rule["key"], "stressor key") for rule in spec["stressors"]["rules"]]
+        if len(set(stressor_keys)) != len(stressor_keys):
+            raise ScoringModelError("Duplicate stressor keys")
+        for rule in spec["stressors"]["rules"]:
+            _identifier(rule["field"], "stressor field")
+            if rule["op"] not in OPERATORS:
+                raise ScoringModelError(f"Unknown operator {rule['op']!r}")
+            if not isinstance(rule["value"], (int, float, str, bool)):
+                raise ScoringModelError(f"Stressor value must be a scalar, got {rule['value']!r}")
+            if not isinstance(rule["label"], str):
+                raise ScoringModelError("Stressor label must be a string")
+            _label_fields(rule["label"])
+        return ScoringModel(spec)
+    except (KeyError, TypeError, ValueError) as e:
+        if isinstance(e, ScoringModelError):
+            raise
+        raise ScoringModelError(f"Invalid scoring model: {e!r}") from e
+
+
+def load_model(path: Path) -> ScoringModel:
+    with open(path) as f:
+        try:
+            spec = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ScoringModelError(f"{path} is not valid JSON: {e}") from e
+    return compile_model(spec)
+
+
+class ScoringModelStore:
+    """The active scoring model, reloaded when its file changes"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.model = load_model(self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+        self.reload_errors = 0
+        self.last_error: Optional[str] = None
+
+    def reload_if_changed(self) -> bool:
+        """Swap in the model if the file changed and compiles; returns True when it was swapped"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            model = load_model(self.path)
+        except (OSError, ScoringModelError) as e:
+            self.reload_errors += 1
+            self.last_error = str(e)
+            logger.error(f"Scoring model reload failed, keeping {self.model.version}: {str(e)}")
+            return False
+        previous, self.model = self.model, model
+        self.last_error = None
+        logger.info(f"Scoring model reloaded: {previous.version} -> {model.version}")
+        return True
+
+    async def watch(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            self.reload_if_changed()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.model.version,
+            "path": str(self.path),
+            "features": len(self.model.features),
+            "scores": self.model.score_names,
+            "stressor_rules": len(self.model.rules),
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error,
+        }
+
+
+def columns_from_questionnaires(questionnaires: Iterable[Any], fields: Iterable[str]) -> Dict[str, np.ndarray]:
+    """Columnar input for ``ScoringModel.score_batch``: one array per field, plus ``<field>_count`` for list fields"""
+    rows = list(questionnaires)
+    columns: Dict[str, np.ndarray] = {}
+    for name in fields:
+        values = [getattr(q, name) for q in rows]
+        if values and isinstance(values[0], list):
+            column = np.empty(len(values), dtype=object)
+            column[:] = values
+            columns[name] = column
+            columns[f"{name}_count"] = np.fromiter((len(v) for v in values), dtype=np.int64, count=len(values))
+        else:
+            columns[name] = np.array(values)
+    return columns
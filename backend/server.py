@@ -1,15 +1,49 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Header, Request, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.concurrency import run_in_threadpool
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Dict, Optional, Any
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter, ValidationError
+import pydantic_core
+from typing import List, Dict, Optional, Any, Literal, Set, Tuple, get_origin
 import uuid
-from datetime import datetime, timezone
+import secrets
+from datetime import date, datetime, timezone
 import random
+import asyncio
+from contextvars import ContextVar
+import time
+import json
+import math
+from contextlib import asynccontextmanager
+
+from scoring import ScoringModelStore, columns_from_questionnaires
+from predictor import MicroBatcher, PredictorError, load_predictor
+from llm_cache import LlmSectionCache, bucket, cache_key, normalize_stressors
+from structured_output import parse_structured_response
+from llm_limiter import LlmConcurrencyLimiter, LlmQueueFull, parse_weights
+from llm_resilience import STATES as CIRCUIT_STATES, CircuitBreaker, CircuitOpen, HedgedCalls
+from assessment_jobs import JobQueue, JobWorkerPool
+from write_behind import WriteBehindFull, WriteBehindWriter
+from compact_storage import CompactCodec, SharedContent
+from reassessment import AssessmentInputs, SectionInputs, changed_fields, changed_inputs
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from pymongo.write_concern import WriteConcern
+import assessment_history
+from assessment_export import AssessmentExport, InvalidExport, check_min_rows, export_query
+from assessment_history import InvalidCursor
+import cohort_rollups
+import idempotency
+from idempotency import IdempotencyKeyReused, SingleFlight, SubmissionPending
+from mongo_pool import MongoPool
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from static_payloads import StaticPayload
+import template_engine
 
 
 ##
@@ -29,25 +63,298 @@ load_dotenv(ROOT_DIR / '.env')
 # client = AsyncIOMotorClient(mongo_url)
 # db = client[os.environ['DB_NAME']]
 ##
-mongo_url = os.environ.get("MONGO_URL")
-db_name = os.environ.get("DB_NAME")
-
-if not mongo_url or not db_name:
-    raise RuntimeError("MONGO_URL or DB_NAME not set")
-
-# Ensure MONGO_URL has the correct scheme
-if not mongo_url.startswith(('mongodb://', 'mongodb+srv://')):
-    mongo_url = f"mongodb+srv://{mongo_url}"
+# MongoDB connection pool. Nothing connects at import: the lifespan below connects,
+# pings and opens MONGO_WARM_CONNECTIONS connections before traffic is accepted.
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '10'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_SOCKET_TIMEOUT_MS = int(os.environ.get('MONGO_SOCKET_TIMEOUT_MS', '0')) or None
+MONGO_COMPRESSORS = [c.strip() for c in os.environ.get('MONGO_COMPRESSORS', '').split(',') if c.strip()]  # e.g. zstd,snappy,zlib
+MONGO_WARM_CONNECTIONS = int(os.environ.get('MONGO_WARM_CONNECTIONS', str(MONGO_MIN_POOL_SIZE)))
+HEALTH_PING_TIMEOUT = float(os.environ.get('HEALTH_PING_TIMEOUT', '2'))
+INDEX_RETRY_INTERVAL = float(os.environ.get('INDEX_RETRY_INTERVAL', '30'))  # retry connecting, index creation and publishing that failed at startup
 
-client = AsyncIOMotorClient(mongo_url)
-db = client[db_name]
+mongo = MongoPool(
+    os.environ.get("MONGO_URL"),
+    os.environ.get("DB_NAME"),
+    max_pool_size=MONGO_MAX_POOL_SIZE,
+    min_pool_size=MONGO_MIN_POOL_SIZE,
+    max_idle_time_ms=MONGO_MAX_IDLE_TIME_MS,
+    connect_timeout_ms=MONGO_CONNECT_TIMEOUT_MS,
+    server_selection_timeout_ms=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    socket_timeout_ms=MONGO_SOCKET_TIMEOUT_MS,
+    compressors=MONGO_COMPRESSORS
+)
+db = mongo.db
 ##
 
-app = FastAPI()
 api_router = APIRouter(prefix="/api")
 
 EMERGENT_KEY = os.environ.get('EMERGENT_LLM_KEY')
 
+# Per-stage timeouts (seconds) for the LLM generation steps.
+# LLM_STAGE_TIMEOUT sets the default, LLM_TIMEOUT_<STAGE> overrides a single stage.
+LLM_STAGE_TIMEOUT = float(os.environ.get('LLM_STAGE_TIMEOUT', '45'))
+LLM_STAGE_TIMEOUTS = {
+    stage: float(os.environ.get(f'LLM_TIMEOUT_{stage.upper()}', LLM_STAGE_TIMEOUT))
+    for stage in ('empathy', 'daily_plan', 'workplace')
+}
+
+# 'sections': one LLM call per section; 'structured': a single call returning one JSON document
+LLM_GENERATION_MODE = os.environ.get('LLM_GENERATION_MODE', 'sections')
+LLM_STRUCTURED_TIMEOUT = float(os.environ.get('LLM_TIMEOUT_STRUCTURED', LLM_STAGE_TIMEOUT))
+
+# How sections are generated for each highest risk band: template (no LLM call), hybrid (LLM explanation only) or llm
+GENERATION_ROUTES = template_engine.parse_routes(os.environ.get('GENERATION_ROUTES', 'low=template,medium=hybrid,high=llm'))
+
+# Scoring model (weights, bands and stressor rules); edits to the file are picked up without a restart
+SCORING_MODEL_PATH = os.environ.get('SCORING_MODEL_PATH', str(ROOT_DIR / 'scoring_models' / 'heuristic-v1.json'))
+SCORING_MODEL_RELOAD_INTERVAL = float(os.environ.get('SCORING_MODEL_RELOAD_INTERVAL', '5'))  # 0 = no hot reload
+scoring_models = ScoringModelStore(SCORING_MODEL_PATH)
+
+# Optional trained predictor (.joblib or .onnx from train_predictor.py) for the risk scores.
+# Requests are micro-batched into one inference call; the scoring model above is the fallback.
+PREDICTOR_PATH = os.environ.get('PREDICTOR_PATH', '')
+PREDICTOR_MAX_BATCH = int(os.environ.get('PREDICTOR_MAX_BATCH', '64'))
+PREDICTOR_MAX_WAIT_MS = float(os.environ.get('PREDICTOR_MAX_WAIT_MS', '0'))  # 0 = batch whatever queued during the previous inference
+PREDICTOR_TIMEOUT = float(os.environ.get('PREDICTOR_TIMEOUT', '0.5'))  # seconds before falling back to the heuristic
+
+predictor = None
+predictor_load_error = None
+if PREDICTOR_PATH:
+    try:
+        predictor = load_predictor(Path(PREDICTOR_PATH))
+    except PredictorError as e:
+        predictor_load_error = str(e)
+        logger.error(f"Trained predictor unavailable, using the scoring model: {str(e)}")
+
+# Duplicate submissions (same Idempotency-Key, or the same questionnaire within the window) return the first result
+IDEMPOTENCY_ENABLED = os.environ.get('IDEMPOTENCY_ENABLED', 'true').lower() == 'true'
+IDEMPOTENCY_WINDOW_SECONDS = float(os.environ.get('IDEMPOTENCY_WINDOW_SECONDS', '600'))
+# A claimed submission whose assessment is still not stored after this long was abandoned and is run again
+IDEMPOTENCY_PENDING_SECONDS = float(os.environ.get('IDEMPOTENCY_PENDING_SECONDS', '300'))
+
+# Upper bound on questionnaires accepted by /assessment/score-batch in one upload
+SCORE_BATCH_MAX_ROWS = int(os.environ.get('SCORE_BATCH_MAX_ROWS', '200000'))
+
+# Cache for generated LLM sections, keyed on bucketed prompt inputs
+LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_TTL_SECONDS = float(os.environ.get('LLM_CACHE_TTL_SECONDS', '86400'))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '2048'))
+LLM_CACHE_VARIANTS = int(os.environ.get('LLM_CACHE_VARIANTS', '3'))
+LLM_CACHE_NAMESPACE = os.environ.get('LLM_CACHE_NAMESPACE', 'v1')  # bump when prompts change
+LLM_CACHE_SCORE_BUCKET = float(os.environ.get('LLM_CACHE_SCORE_BUCKET', '10'))
+LLM_CACHE_SLEEP_BUCKET = float(os.environ.get('LLM_CACHE_SLEEP_BUCKET', '0.5'))
+LLM_CACHE_HOURS_BUCKET = float(os.environ.get('LLM_CACHE_HOURS_BUCKET', '1'))
+LLM_CACHE_SUPPORT_BUCKET = float(os.environ.get('LLM_CACHE_SUPPORT_BUCKET', '2'))
+LLM_CACHE_SHARED_TIMEOUT = float(os.environ.get('LLM_CACHE_SHARED_TIMEOUT', '0.5'))
+
+# Shared limit on concurrent upstream LLM calls; callers beyond the queue get 429.
+# Both are totals for the server: `python -m backend` sets SERVER_WORKERS and each worker takes its share
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '16'))
+LLM_MAX_QUEUE = int(os.environ.get('LLM_MAX_QUEUE', '64'))
+SERVER_WORKERS = max(1, int(os.environ.get('SERVER_WORKERS', '1')))
+
+# Queued LLM calls are served by risk priority (weighted fair queuing with aging), and fairly across
+# clients within a priority; the client is the LLM_CLIENT_HEADER value, else the caller's address
+LLM_PRIORITY_WEIGHTS = parse_weights(os.environ.get('LLM_PRIORITY_WEIGHTS', 'high=8,normal=3,low=1'))
+LLM_PRIORITY_AGING_SECONDS = float(os.environ.get('LLM_PRIORITY_AGING_SECONDS', '10'))
+LLM_CLIENT_HEADER = os.environ.get('LLM_CLIENT_HEADER', 'X-Client-Id')
+
+llm_limiter = LlmConcurrencyLimiter(
+    max_concurrency=max(1, -(-LLM_MAX_CONCURRENCY // SERVER_WORKERS)),
+    max_queue=-(-LLM_MAX_QUEUE // SERVER_WORKERS),
+    weights=LLM_PRIORITY_WEIGHTS,
+    aging_seconds=LLM_PRIORITY_AGING_SECONDS,
+    on_admit=lambda priority, wait: LLM_QUEUE_WAIT_SECONDS.observe(wait, priority)
+)
+
+# (priority, client) of the assessment whose LLM calls run in the current task
+llm_call_class: ContextVar = ContextVar('llm_call_class', default=('normal', ''))
+
+# Circuit breaker: after LLM_BREAKER_FAILURES consecutive failed or timed-out calls, stages use their
+# default content without calling the LLM for LLM_BREAKER_COOLDOWN seconds, then one probe call is let through
+LLM_BREAKER_ENABLED = os.environ.get('LLM_BREAKER_ENABLED', 'true').lower() == 'true'
+LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', '5'))
+LLM_BREAKER_COOLDOWN = float(os.environ.get('LLM_BREAKER_COOLDOWN', '30'))
+
+# Hedged LLM calls: a second identical call after the stage's recent LLM_HEDGE_QUANTILE latency; the first answer wins.
+# Only sent while the limiter has a free slot, and for at most LLM_HEDGE_MAX_RATIO of calls.
+LLM_HEDGE_ENABLED = os.environ.get('LLM_HEDGE_ENABLED', 'false').lower() == 'true'
+LLM_HEDGE_QUANTILE = float(os.environ.get('LLM_HEDGE_QUANTILE', '0.95'))
+LLM_HEDGE_MIN_DELAY = float(os.environ.get('LLM_HEDGE_MIN_DELAY', '0.05'))
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get('LLM_HEDGE_MIN_SAMPLES', '20'))
+LLM_HEDGE_MAX_RATIO = float(os.environ.get('LLM_HEDGE_MAX_RATIO', '0.1'))
+
+llm_breaker = CircuitBreaker(
+    failure_threshold=LLM_BREAKER_FAILURES,
+    cooldown=LLM_BREAKER_COOLDOWN,
+    enabled=LLM_BREAKER_ENABLED,
+    on_transition=lambda state: LLM_BREAKER_TRANSITIONS.inc(state)
+)
+llm_hedging = HedgedCalls(
+    enabled=LLM_HEDGE_ENABLED,
+    quantile=LLM_HEDGE_QUANTILE,
+    min_delay=LLM_HEDGE_MIN_DELAY,
+    min_samples=LLM_HEDGE_MIN_SAMPLES,
+    max_ratio=LLM_HEDGE_MAX_RATIO,
+    on_result=lambda stage, winner: LLM_HEDGES.inc(stage, winner)
+)
+
+# Identical analyze submissions running at the same time share one pipeline run
+assessment_flights = SingleFlight()
+
+# Pipeline metrics, served in Prometheus text format at /metrics
+metrics_registry = Registry()
+STAGE_SECONDS = metrics_registry.histogram(
+    "assessment_stage_seconds",
+    "Duration of each assessment pipeline step",
+    ["stage", "outcome", "fallback"]
+)
+LLM_REQUEST_SECONDS = metrics_registry.histogram(
+    "llm_request_seconds",
+    "Duration of upstream LLM calls, excluding the wait for a limiter slot",
+    ["stage", "outcome"]
+)
+LLM_ERRORS = metrics_registry.counter(
+    "llm_errors_total",
+    "LLM stages that failed, timed out or were skipped by the open circuit breaker, and used default content",
+    ["stage", "reason"]
+)
+PARSE_FALLBACKS = metrics_registry.counter(
+    "llm_parse_fallbacks_total",
+    "Parts of LLM responses that could not be parsed and used default content",
+    ["stage", "field"]
+)
+GENERATION_ROUTE_TOTAL = metrics_registry.counter(
+    "assessment_generation_route_total",
+    "Assessments by how their sections were generated (template, hybrid or llm)",
+    ["route"]
+)
+IDEMPOTENT_SUBMISSIONS = metrics_registry.counter(
+    "assessment_idempotent_submissions_total",
+    "Analyze submissions by outcome: executed, shared (joined an in-flight run), replayed (stored result), pending (still being saved) or conflict",
+    ["outcome"]
+)
+PREDICTOR_FALLBACKS = metrics_registry.counter(
+    "predictor_fallbacks_total",
+    "Predictions that fell back from the trained predictor to the scoring model",
+    ["reason"]
+)
+ASSESSMENTS_IN_FLIGHT = metrics_registry.gauge(
+    "assessments_in_flight",
+    "Assessments currently being processed",
+    ["endpoint"]
+)
+LLM_QUEUE_WAIT_SECONDS = metrics_registry.histogram(
+    "llm_queue_wait_seconds",
+    "Time LLM calls waited for a limiter slot, by assessment priority",
+    ["priority"]
+)
+LLM_HEDGES = metrics_registry.counter(
+    "llm_hedged_requests_total",
+    "Hedged LLM calls by which call answered first (primary, hedge or none)",
+    ["stage", "winner"]
+)
+LLM_BREAKER_TRANSITIONS = metrics_registry.counter(
+    "llm_circuit_breaker_transitions_total",
+    "LLM circuit breaker state changes, by new state",
+    ["state"]
+)
+REASSESSMENT_SECTIONS = metrics_registry.counter(
+    "reassessment_sections_total",
+    "Sections of re-assessments by outcome: reused, inputs_changed, fallback, template or no_previous_answers",
+    ["stage", "outcome"]
+)
+metrics_registry.gauge("llm_in_flight", "LLM calls holding a limiter slot", function=lambda: llm_limiter.in_flight)
+metrics_registry.gauge("llm_queue_depth", "LLM calls waiting for a limiter slot", function=lambda: llm_limiter.waiting)
+metrics_registry.gauge(
+    "llm_circuit_breaker_state",
+    "LLM circuit breaker state: 0 closed, 1 half-open, 2 open",
+    function=lambda: CIRCUIT_STATES.index(llm_breaker.state)
+)
+
+METRICS_COLLECT_INTERVAL = float(os.environ.get('METRICS_COLLECT_INTERVAL', '10'))
+
+# Series on the deterministic path are bound once to keep each observation cheap
+PREDICTION_SECONDS = STAGE_SECONDS.labels("prediction", "ok", "false")
+STRESSORS_SECONDS = STAGE_SECONDS.labels("stressors", "ok", "false")
+PERSIST_SECONDS = STAGE_SECONDS.labels("persist", "ok", "false")
+
+def observe_stage(stage: str, started: float, outcome: str = "ok", fallback: bool = False) -> None:
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage, outcome, "true" if fallback else "false")
+
+# Asynchronous job mode: queue collection and in-process workers (0 = run job_worker.py separately)
+ASSESSMENT_JOB_WORKERS = int(os.environ.get('ASSESSMENT_JOB_WORKERS', '2'))
+ASSESSMENT_JOB_LEASE_SECONDS = float(os.environ.get('ASSESSMENT_JOB_LEASE_SECONDS', '120'))
+ASSESSMENT_JOB_MAX_ATTEMPTS = int(os.environ.get('ASSESSMENT_JOB_MAX_ATTEMPTS', '3'))
+ASSESSMENT_JOB_POLL_INTERVAL = float(os.environ.get('ASSESSMENT_JOB_POLL_INTERVAL', '1.0'))
+ASSESSMENT_JOB_RETENTION_SECONDS = float(os.environ.get('ASSESSMENT_JOB_RETENTION_SECONDS', str(7 * 86400)))  # finished jobs, then TTL-deleted
+
+# At shutdown, background assessment runs and running jobs get this long to finish before they are cancelled
+SHUTDOWN_GRACE_SECONDS = float(os.environ.get('SHUTDOWN_GRACE_SECONDS', '30'))
+
+assessment_jobs = JobQueue(
+    db.assessment_jobs,
+    lease_seconds=ASSESSMENT_JOB_LEASE_SECONDS,
+    max_attempts=ASSESSMENT_JOB_MAX_ATTEMPTS,
+    retention_seconds=ASSESSMENT_JOB_RETENTION_SECONDS
+)
+
+# Compact assessment documents: static content by reference, category answers as ints, large text zlib-compressed.
+# Reads decode both forms; migrate_storage.py converts existing documents.
+COMPACT_STORAGE = os.environ.get('COMPACT_STORAGE', 'true').lower() == 'true'
+COMPACT_COMPRESS_MIN_BYTES = int(os.environ.get('COMPACT_COMPRESS_MIN_BYTES', '256'))
+
+# Optional write-behind persistence for assessments (buffered insert_many with a disk journal).
+# /analyze, reassessments and streamed assessments are buffered; keyed /analyze submissions claim
+# their key directly first. Job results are inserted directly.
+ASSESSMENT_WRITE_BEHIND = os.environ.get('ASSESSMENT_WRITE_BEHIND', 'false').lower() == 'true'
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '100'))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL', '1.0'))
+WRITE_BEHIND_MAX_BUFFER = int(os.environ.get('WRITE_BEHIND_MAX_BUFFER', '10000'))
+WRITE_BEHIND_JOURNAL_DIR = os.environ.get('WRITE_BEHIND_JOURNAL_DIR', str(ROOT_DIR / 'write_behind_journal'))
+WRITE_BEHIND_FSYNC = os.environ.get('WRITE_BEHIND_FSYNC', 'false').lower() == 'true'
+WRITE_BEHIND_W = os.environ.get('WRITE_BEHIND_W', '1')
+WRITE_BEHIND_J = os.environ.get('WRITE_BEHIND_J', 'false').lower() == 'true'
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get('WRITE_BEHIND_MAX_ATTEMPTS', '5'))  # for documents Mongo rejects, then dead-lettered
+
+assessment_writer = WriteBehindWriter(
+    db.assessments,
+    batch_size=WRITE_BEHIND_BATCH_SIZE,
+    flush_interval=WRITE_BEHIND_FLUSH_INTERVAL,
+    max_buffer=WRITE_BEHIND_MAX_BUFFER,
+    journal_dir=WRITE_BEHIND_JOURNAL_DIR or None,
+    write_concern=WriteConcern(w=int(WRITE_BEHIND_W) if WRITE_BEHIND_W.isdigit() else WRITE_BEHIND_W, j=WRITE_BEHIND_J),
+    fsync=WRITE_BEHIND_FSYNC,
+    max_attempts=WRITE_BEHIND_MAX_ATTEMPTS
+)
+
+# Pre-aggregated cohort analytics, $inc'ed on every stored assessment
+COHORT_ROLLUPS_ENABLED = os.environ.get('COHORT_ROLLUPS_ENABLED', 'true').lower() == 'true'
+COHORT_MIN_SIZE = int(os.environ.get('COHORT_MIN_SIZE', '10'))  # smaller cohorts are suppressed
+rollup_tasks: Set[asyncio.Task] = set()  # rollup updates of write-behind assessments, awaited at shutdown
+
+# Bulk export: documents read and encoded per streamed chunk
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+# Admin-only routes (bulk export) require this key in X-Admin-Key; unset = those routes are disabled
+ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY', '')
+
+# Browser/CDN cache lifetime for /api/resources (revalidated with its ETag afterwards)
+RESOURCES_CACHE_MAX_AGE = int(os.environ.get('RESOURCES_CACHE_MAX_AGE', '3600'))
+
+llm_cache = LlmSectionCache(
+    db.llm_cache,
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+    variants=LLM_CACHE_VARIANTS,
+    enabled=LLM_CACHE_ENABLED,
+    shared_timeout=LLM_CACHE_SHARED_TIMEOUT
+)
+
 class QuestionnaireInput(BaseModel):
     work_hours_per_day: int
     sleep_hours: float
@@ -77,6 +384,9 @@ class QuestionnaireInput(BaseModel):
     current_role: str
     city: str
 
+QUESTIONNAIRE_LIST_ADAPTER = TypeAdapter(List[QuestionnaireInput])
+QUESTIONNAIRE_COLUMN_TYPES = {name: get_origin(field.annotation) or field.annotation for name, field in QuestionnaireInput.model_fields.items()}
+
 class DayPlan(BaseModel):
     day: int
     sleep_goal: str
@@ -101,6 +411,7 @@ class AssessmentResult(BaseModel):
     burnout_risk: str
     burnout_score: int
     safety_risk: str
+    model_version: Optional[str] = None
     key_stressors: List[str]
     quick_summary: str
     explanation: str
@@ -113,101 +424,171 @@ class AssessmentResult(BaseModel):
     warnings: List[str]
 
 def simulate_prediction(questionnaire: QuestionnaireInput) -> Dict[str, Any]:
-    """Simulate ML prediction based on questionnaire inputs"""
-    
-    # Calculate stress score (0-100)
-    stress_factors = [
-        (questionnaire.work_hours_per_day - 8) * 5,  # Extra hours
-        (8 - questionnaire.sleep_hours) * 8,  # Sleep deficit
-        questionnaire.commute_time_minutes / 3,
-        questionnaire.workload_level * 5,
-        questionnaire.deadline_pressure * 4,
-        (10 - questionnaire.manager_support) * 3,
-        (10 - questionnaire.work_life_balance) * 4,
-        questionnaire.stress_level * 4
-    ]
-    
-    stress_score = min(100, max(0, int(sum(stress_factors))))
-    
-    # Calculate burnout score
-    burnout_factors = [
-        stress_score * 0.3,
-        (10 - questionnaire.career_growth) * 3,
-        (10 - questionnaire.team_support) * 2,
-        {"always": 25, "often": 15, "sometimes": 8, "rarely": 2}.get(questionnaire.anxiety_frequency, 0),
-        {"severe": 30, "moderate": 20, "mild": 10, "none": 0}.get(questionnaire.burnout_feeling, 0),
-        len(questionnaire.physical_symptoms) * 5,
-        {"high": 15, "medium": 8, "low": 3}.get(questionnaire.family_responsibilities, 0)
-    ]
+    """Risk scores and bands from the active scoring model, stamped with its model_version"""
+    return scoring_models.model.predict(questionnaire)
+
+def extract_key_stressors(questionnaire: QuestionnaireInput, prediction: Dict) -> List[str]:
+    """Key stressors from the active scoring model's rules"""
+    return scoring_models.model.stressors(questionnaire)
+
+def score_questionnaire(questionnaire: QuestionnaireInput):
+    """Prediction and key stressors, timed with one shared clock reading between them"""
+    model = scoring_models.model  # one model for both, even if a reload lands in between
+    started = time.perf_counter()
+    prediction = model.predict(questionnaire)
+    scored = time.perf_counter()
+    stressors = model.stressors(questionnaire)
+    PREDICTION_SECONDS.observe(scored - started)
+    STRESSORS_SECONDS.observe(time.perf_counter() - scored)
+    return prediction, stressors
+
+def predict_scores_many(questionnaires: List[QuestionnaireInput]) -> List[Dict[str, int]]:
+    """Trained-predictor scores for a micro-batch of questionnaires (runs in a worker thread)"""
+    scores = predictor.predict_batch(columns_from_questionnaires(questionnaires, predictor.fields))
+    return [dict(zip(predictor.targets, row)) for row in scores.tolist()]
+
+predictor_batcher = MicroBatcher(
+    predict_scores_many,
+    max_batch=PREDICTOR_MAX_BATCH,
+    max_wait=PREDICTOR_MAX_WAIT_MS / 1000
+) if predictor else None
+
+def apply_trained_scores(model, prediction: Dict[str, Any], scores: Dict[str, int], version: str) -> Dict[str, Any]:
+    """The prediction with trained scores in place of the heuristic ones, banded by the scoring model"""
+    prediction = dict(prediction)
+    for score in model.scores:
+        if score["name"] in scores:
+            prediction[score["name"]] = scores[score["name"]]
+            prediction[score["band"]] = model.band(score["name"], scores[score["name"]])
+    prediction["model_version"] = version
+    return prediction
+
+async def predict_questionnaire(questionnaire: QuestionnaireInput):
+    """Like score_questionnaire, with the risk scores from the trained predictor when one is configured"""
+    if not predictor_batcher or not predictor_batcher.running:
+        return score_questionnaire(questionnaire)
     
-    burnout_score = min(100, max(0, int(sum(burnout_factors))))
+    model = scoring_models.model
+    started = time.perf_counter()
+    try:
+        scores = await asyncio.wait_for(predictor_batcher.submit(questionnaire), timeout=PREDICTOR_TIMEOUT)
+    except asyncio.TimeoutError:
+        PREDICTOR_FALLBACKS.inc("timeout")
+        observe_stage("prediction", started, "timeout", fallback=True)
+        return score_questionnaire(questionnaire)
+    except Exception as e:
+        PREDICTOR_FALLBACKS.inc("error")
+        logger.warning(f"Trained predictor failed, using the scoring model: {str(e)}")
+        observe_stage("prediction", started, "error", fallback=True)
+        return score_questionnaire(questionnaire)
     
-    # Safety risk
-    safety_factors = [
-        20 if questionnaire.night_shifts else 0,
-        min(15, questionnaire.commute_time_minutes / 4),
-        {"major": 25, "moderate": 15, "minor": 8, "none": 0}.get(questionnaire.safety_concerns, 0),
-        10 if questionnaire.workplace_bias_experienced else 0
+    prediction = apply_trained_scores(model, model.predict(questionnaire), scores, predictor.version)
+    scored = time.perf_counter()
+    stressors = model.stressors(questionnaire)
+    PREDICTION_SECONDS.observe(scored - started)
+    STRESSORS_SECONDS.observe(time.perf_counter() - scored)
+    return prediction, stressors
+
+DEFAULT_FLEX_SUGGESTIONS = [
+    "Request 2-3 WFH days per week",
+    "Propose flexible start/end times",
+    "Request workload prioritization meeting",
+    "Ask for deadline extensions when needed"
+]
+
+DEFAULT_EMAIL_TO_MANAGER = "Dear [Manager Name],\n\nI hope this message finds you well. I wanted to discuss my current workload and explore opportunities to optimize my productivity and well-being. Over the past few weeks, I've been managing multiple high-priority projects, and I believe a brief conversation about prioritization would be beneficial.\n\nWould you be available for a short meeting this week? I'm confident we can find a sustainable approach that supports both team goals and individual effectiveness.\n\nThank you for your continued support.\n\nBest regards"
+
+DEFAULT_EMAIL_TO_HR = "Dear HR Team,\n\nI am writing to inquire about flexible work arrangement options available at our organization. Given the nature of my role and personal circumstances, I believe a hybrid work model or flexible hours would significantly enhance my productivity and work-life balance.\n\nI would appreciate the opportunity to discuss available policies and how I might apply for such arrangements. Please let me know the appropriate process and documentation required.\n\nThank you for your time and consideration.\n\nSincerely"
+
+DEFAULT_EXPLANATION = "Your results suggest that some parts of your work and personal life may be putting pressure on your well-being right now. This could be linked to the stressors listed above, which many women in IT experience. Small, consistent changes can make a real difference, and the plan below is a gentle place to start."
+
+def build_quick_summary(prediction: Dict, stressors: List[str]) -> str:
+    return f"Your stress level is {prediction['stress_level']} and burnout risk is {prediction['burnout_risk']}. The main contributors are {', '.join(stressors[:3])}."
+
+def default_empathy_response(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Dict[str, str]:
+    """Fallback explanation when the empathy generation is unavailable"""
+    return {
+        "explanation": DEFAULT_EXPLANATION,
+        "quick_summary": build_quick_summary(prediction, stressors)
+    }
+
+def default_daily_plan(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> List[DayPlan]:
+    """Fallback 7-day plan when the plan generation is unavailable"""
+    return [
+        DayPlan(
+            day=i,
+            sleep_goal=f"{int(questionnaire.sleep_hours) + 1} hours",
+            breaks="Take a 5-min break every hour",
+            habit="Deep breathing for 2 minutes",
+            boundary="No emails after 7 PM",
+            message="You've got this!"
+        )
+        for i in range(1, 8)
     ]
-    
-    safety_score = min(100, max(0, int(sum(safety_factors))))
-    
+
+def default_workplace_suggestions(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Dict[str, Any]:
+    """Fallback suggestions and emails when the workplace generation is unavailable"""
     return {
-        "stress_score": stress_score,
-        "stress_level": "high" if stress_score > 65 else "medium" if stress_score > 35 else "low",
-        "burnout_score": burnout_score,
-        "burnout_risk": "high" if burnout_score > 65 else "medium" if burnout_score > 35 else "low",
-        "safety_score": safety_score,
-        "safety_risk": "high" if safety_score > 50 else "medium" if safety_score > 25 else "low"
+        "flex_suggestions": list(DEFAULT_FLEX_SUGGESTIONS),
+        "email_to_manager": DEFAULT_EMAIL_TO_MANAGER,
+        "email_to_hr": DEFAULT_EMAIL_TO_HR
     }
 
-def extract_key_stressors(questionnaire: QuestionnaireInput, prediction: Dict) -> List[str]:
-    """Extract key stressors from questionnaire"""
-    stressors = []
-    
-    if questionnaire.work_hours_per_day > 9:
-        stressors.append(f"Long work hours ({questionnaire.work_hours_per_day}h/day)")
-    
-    if questionnaire.sleep_hours < 6:
-        stressors.append(f"Insufficient sleep ({questionnaire.sleep_hours}h)")
-    
-    if questionnaire.workload_level >= 7:
-        stressors.append("High workload")
-    
-    if questionnaire.deadline_pressure >= 7:
-        stressors.append("High deadline pressure")
-    
-    if questionnaire.manager_support <= 4:
-        stressors.append("Low manager support")
-    
-    if questionnaire.work_life_balance <= 4:
-        stressors.append("Poor work-life balance")
-    
-    if questionnaire.commute_time_minutes > 60:
-        stressors.append(f"Long commute ({questionnaire.commute_time_minutes} min)")
-    
-    if questionnaire.night_shifts:
-        stressors.append("Night shift work")
-    
-    if questionnaire.workplace_bias_experienced:
-        stressors.append("Workplace bias/discrimination")
+def template_empathy_response(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Dict[str, str]:
+    return {
+        "explanation": template_engine.explanation(prediction, prediction['stressor_keys']),
+        "quick_summary": build_quick_summary(prediction, stressors)
+    }
+
+def template_daily_plan(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> List[DayPlan]:
+    return [DayPlan(**day) for day in template_engine.daily_plan(prediction['stressor_keys'], questionnaire.sleep_hours)]
+
+def template_workplace_suggestions(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Dict[str, Any]:
+    return template_engine.workplace(prediction['stressor_keys'])
+
+TEMPLATE_SECTIONS = {
+    'empathy': template_empathy_response,
+    'daily_plan': template_daily_plan,
+    'workplace': template_workplace_suggestions
+}
+
+def generation_route(prediction: Dict) -> str:
+    return template_engine.route(prediction, GENERATION_ROUTES)
+
+async def send_llm_message(new_chat, message, stage: str) -> str:
+    """Send a message through the circuit breaker and the shared concurrency limiter, hedged when enabled.
     
-    if questionnaire.family_responsibilities == "high":
-        stressors.append("High family responsibilities")
+    ``new_chat`` returns a fresh chat session; a hedged call sends the message again on a second one.
+    """
+    llm_breaker.check()
     
-    if len(questionnaire.physical_symptoms) > 2:
-        stressors.append(f"Multiple physical symptoms ({', '.join(questionnaire.physical_symptoms[:3])})")
+    async def send_once():
+        async with llm_limiter.slot(*llm_call_class.get()):
+            llm_breaker.recheck()  # it may have opened while this call waited for a slot
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                response = await new_chat().send_message(message)
+                outcome = "ok"
+                return response
+            except asyncio.CancelledError:
+                outcome = "cancelled"  # stage timeout or the losing side of a hedge
+                raise
+            finally:
+                LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, stage, outcome)
     
-    return stressors[:7]  # Top 7 stressors
+    # Hedge only into spare capacity, never ahead of queued callers
+    return await llm_hedging.run(stage, send_once, can_hedge=lambda: llm_limiter.in_flight < llm_limiter.max_concurrency)
 
-async def generate_empathy_response(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Dict[str, str]:
-    """Generate empathetic explanation using AI"""
+async def generate_empathy_response(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Tuple[Dict[str, str], bool]:
+    """Generate empathetic explanation using AI; (section, whether the response was usable)"""
     
-    chat = LlmChat(
-        api_key=EMERGENT_KEY,
-        session_id=f"empathy_{uuid.uuid4()}",
-        system_message="You are an empathetic mental health support assistant for women in IT. Provide supportive, non-judgmental responses. Never diagnose. Use words like 'may', 'could', 'might'."
-    ).with_model("openai", "gpt-5.2")
+    def new_chat():
+        return LlmChat(
+            api_key=EMERGENT_KEY,
+            session_id=f"empathy_{uuid.uuid4()}",
+            system_message="You are an empathetic mental health support assistant for women in IT. Provide supportive, non-judgmental responses. Never diagnose. Use words like 'may', 'could', 'might'."
+        ).with_model("openai", "gpt-5.2")
     
     prompt = f"""A woman working in IT has these results:
 - Stress level: {prediction['stress_level']} ({prediction['stress_score']}/100)
@@ -223,21 +604,22 @@ Provide a warm, supportive explanation in 3 parts:
 Keep it conversational, supportive, and empowering. Address challenges women in IT face."""
     
     message = UserMessage(text=prompt)
-    response = await chat.send_message(message)
+    response = await send_llm_message(new_chat, message, 'empathy')
     
     return {
         "explanation": response,
-        "quick_summary": f"Your stress level is {prediction['stress_level']} and burnout risk is {prediction['burnout_risk']}. The main contributors are {', '.join(stressors[:3])}."
-    }
+        "quick_summary": build_quick_summary(prediction, stressors)
+    }, bool(response and response.strip())
 
-async def generate_daily_plan(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> List[DayPlan]:
-    """Generate 7-day personalized plan"""
+async def generate_daily_plan(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Tuple[List[DayPlan], bool]:
+    """Generate 7-day personalized plan; (plan, parsed_ok)"""
     
-    chat = LlmChat(
-        api_key=EMERGENT_KEY,
-        session_id=f"plan_{uuid.uuid4()}",
-        system_message="You are a work-life balance coach for women in IT. Create practical, achievable daily plans."
-    ).with_model("openai", "gpt-5.2")
+    def new_chat():
+        return LlmChat(
+            api_key=EMERGENT_KEY,
+            session_id=f"plan_{uuid.uuid4()}",
+            system_message="You are a work-life balance coach for women in IT. Create practical, achievable daily plans."
+        ).with_model("openai", "gpt-5.2")
     
     prompt = f"""Create a 7-day work-life balance plan for a woman in IT with:
 - Stress: {prediction['stress_level']}
@@ -257,13 +639,22 @@ Message: [encouraging message]
 Make it progressive - start small on day 1, build up."""
     
     message = UserMessage(text=prompt)
-    response = await chat.send_message(message)
+    response = await send_llm_message(new_chat, message, 'daily_plan')
+    
+    return parse_daily_plan(response, questionnaire)
+
+def parse_daily_plan(response: str, questionnaire: QuestionnaireInput) -> Tuple[List[DayPlan], bool]:
+    """Parse the 'Day X:' text format; missing lines get default content, and parsed_ok is False"""
+    started = time.perf_counter()
+    incomplete_days = 0
     
     # Parse response into structured format
     plan = []
     days_text = response.split('Day ')
     for i, day_text in enumerate(days_text[1:8], 1):
         lines = day_text.strip().split('\n')
+        if len(lines) < 6:
+            incomplete_days += 1
         plan.append(DayPlan(
             day=i,
             sleep_goal=lines[1].replace('Sleep Goal:', '').strip() if len(lines) > 1 else f"{int(questionnaire.sleep_hours) + 1} hours",
@@ -273,16 +664,23 @@ Make it progressive - start small on day 1, build up."""
             message=lines[5].replace('Message:', '').strip() if len(lines) > 5 else "You've got this!"
         ))
     
-    return plan
+    if incomplete_days:
+        PARSE_FALLBACKS.inc('daily_plan', 'day_fields', amount=incomplete_days)
+    if len(plan) < 7:
+        PARSE_FALLBACKS.inc('daily_plan', 'days')
+    parsed_ok = not incomplete_days and len(plan) == 7
+    observe_stage('parse_daily_plan', started, fallback=not parsed_ok)
+    return plan, parsed_ok
 
-async def generate_workplace_suggestions(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Dict[str, Any]:
-    """Generate workplace flexibility suggestions and emails"""
+async def generate_workplace_suggestions(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Tuple[Dict[str, Any], bool]:
+    """Generate workplace flexibility suggestions and emails; (section, parsed_ok)"""
     
-    chat = LlmChat(
-        api_key=EMERGENT_KEY,
-        session_id=f"workplace_{uuid.uuid4()}",
-        system_message="You are a professional career advisor helping women in IT negotiate better work conditions."
-    ).with_model("openai", "gpt-5.2")
+    def new_chat():
+        return LlmChat(
+            api_key=EMERGENT_KEY,
+            session_id=f"workplace_{uuid.uuid4()}",
+            system_message="You are a professional career advisor helping women in IT negotiate better work conditions."
+        ).with_model("openai", "gpt-5.2")
     
     prompt = f"""A woman in IT needs workplace flexibility. Context:
 - Work hours: {questionnaire.work_hours_per_day}h/day
@@ -308,7 +706,13 @@ EMAIL TO HR:
 [email text]"""
     
     message = UserMessage(text=prompt)
-    response = await chat.send_message(message)
+    response = await send_llm_message(new_chat, message, 'workplace')
+    
+    return parse_workplace_suggestions(response)
+
+def parse_workplace_suggestions(response: str) -> Tuple[Dict[str, Any], bool]:
+    """Parse the FLEXIBILITY SUGGESTIONS / EMAIL TO MANAGER / EMAIL TO HR text format; parsed_ok is False if a part fell back to defaults"""
+    started = time.perf_counter()
     
     # Parse response
     parts = response.split('EMAIL TO MANAGER:')
@@ -319,107 +723,666 @@ EMAIL TO HR:
     email_manager = email_parts[0].strip()
     email_hr = email_parts[1].strip() if len(email_parts) > 1 else ''
     
+    missing = [field for field, value in (('flex_suggestions', suggestions), ('email_to_manager', email_manager), ('email_to_hr', email_hr)) if not value]
+    for field in missing:
+        PARSE_FALLBACKS.inc('workplace', field)
+    observe_stage('parse_workplace', started, fallback=bool(missing))
+    
     return {
-        "flex_suggestions": suggestions if suggestions else [
-            "Request 2-3 WFH days per week",
-            "Propose flexible start/end times",
-            "Request workload prioritization meeting",
-            "Ask for deadline extensions when needed"
-        ],
-        "email_to_manager": email_manager if email_manager else "Dear [Manager Name],\n\nI hope this message finds you well. I wanted to discuss my current workload and explore opportunities to optimize my productivity and well-being. Over the past few weeks, I've been managing multiple high-priority projects, and I believe a brief conversation about prioritization would be beneficial.\n\nWould you be available for a short meeting this week? I'm confident we can find a sustainable approach that supports both team goals and individual effectiveness.\n\nThank you for your continued support.\n\nBest regards",
-        "email_to_hr": email_hr if email_hr else "Dear HR Team,\n\nI am writing to inquire about flexible work arrangement options available at our organization. Given the nature of my role and personal circumstances, I believe a hybrid work model or flexible hours would significantly enhance my productivity and work-life balance.\n\nI would appreciate the opportunity to discuss available policies and how I might apply for such arrangements. Please let me know the appropriate process and documentation required.\n\nThank you for your time and consideration.\n\nSincerely"
+        "flex_suggestions": suggestions if suggestions else list(DEFAULT_FLEX_SUGGESTIONS),
+        "email_to_manager": email_manager if email_manager else DEFAULT_EMAIL_TO_MANAGER,
+        "email_to_hr": email_hr if email_hr else DEFAULT_EMAIL_TO_HR
+    }, not missing
+
+def llm_cache_inputs(stage: str, prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Dict[str, Any]:
+    """Normalised, bucketed view of the inputs each stage's prompt is built from"""
+    if stage == 'empathy':
+        return {
+            "stress_level": prediction['stress_level'],
+            "stress_score": bucket(prediction['stress_score'], LLM_CACHE_SCORE_BUCKET),
+            "burnout_risk": prediction['burnout_risk'],
+            "burnout_score": bucket(prediction['burnout_score'], LLM_CACHE_SCORE_BUCKET),
+            "stressors": normalize_stressors(stressors)
+        }
+    if stage == 'daily_plan':
+        return {
+            "stress_level": prediction['stress_level'],
+            "burnout_risk": prediction['burnout_risk'],
+            "sleep_hours": bucket(questionnaire.sleep_hours, LLM_CACHE_SLEEP_BUCKET),
+            "work_hours": bucket(questionnaire.work_hours_per_day, LLM_CACHE_HOURS_BUCKET),
+            "stressors": normalize_stressors(stressors[:3])
+        }
+    return {
+        "work_hours": bucket(questionnaire.work_hours_per_day, LLM_CACHE_HOURS_BUCKET),
+        "work_from_home": questionnaire.work_from_home,
+        "flexible_hours": questionnaire.flexible_hours,
+        "manager_support": bucket(questionnaire.manager_support, LLM_CACHE_SUPPORT_BUCKET),
+        "stressors": normalize_stressors(stressors)
     }
 
+def section_to_cache(stage: str, section: Any) -> Any:
+    if stage == 'empathy':
+        # quick_summary is deterministic, only the generated text is shared
+        return {"explanation": section['explanation']}
+    return jsonable_encoder(section)
+
+def section_from_cache(stage: str, cached: Any, prediction: Dict, stressors: List[str]) -> Any:
+    if stage == 'empathy':
+        return {"explanation": cached['explanation'], "quick_summary": build_quick_summary(prediction, stressors)}
+    if stage == 'daily_plan':
+        return [DayPlan(**day) for day in cached]
+    return {**cached, "flex_suggestions": list(cached['flex_suggestions'])}
+
+def llm_section_key(stage: str, prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> str:
+    return cache_key(f"{LLM_CACHE_NAMESPACE}:{stage}", llm_cache_inputs(stage, prediction, stressors, questionnaire))
+
+async def run_llm_stage(stage: str, generate, fallback, prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput):
+    """Run one LLM generation step with its timeout, falling back to default content on failure"""
+    started = time.perf_counter()
+    key = llm_section_key(stage, prediction, stressors, questionnaire)
+    cached = await llm_cache.get(stage, key)
+    if cached is not None:
+        observe_stage(stage, started, "cache_hit")
+        return section_from_cache(stage, cached, prediction, stressors)
+    
+    try:
+        section, parsed_ok = await asyncio.wait_for(
+            generate(prediction, stressors, questionnaire),
+            timeout=LLM_STAGE_TIMEOUTS[stage]
+        )
+    except CircuitOpen:
+        LLM_ERRORS.inc(stage, "circuit_open")
+        observe_stage(stage, started, "circuit_open", fallback=True)
+        return fallback(prediction, stressors, questionnaire)
+    except asyncio.TimeoutError:
+        logger.warning(f"LLM stage '{stage}' timed out after {LLM_STAGE_TIMEOUTS[stage]}s, using defaults")
+        llm_breaker.record_failure()
+        LLM_ERRORS.inc(stage, "timeout")
+        observe_stage(stage, started, "timeout", fallback=True)
+        return fallback(prediction, stressors, questionnaire)
+    except Exception as e:
+        logger.warning(f"LLM stage '{stage}' failed, using defaults: {str(e)}")
+        if not isinstance(e, LlmQueueFull):
+            llm_breaker.record_failure()
+        LLM_ERRORS.inc(stage, "queue_full" if isinstance(e, LlmQueueFull) else "error")
+        observe_stage(stage, started, "error", fallback=True)
+        return fallback(prediction, stressors, questionnaire)
+    
+    llm_breaker.record_success()
+    if parsed_ok:
+        # A section padded with defaults would be served from the cache long after a better answer was possible
+        await llm_cache.put(stage, key, section_to_cache(stage, section))
+    observe_stage(stage, started)
+    return section
+
+LLM_STAGES = [
+    ('empathy', generate_empathy_response, default_empathy_response),
+    ('daily_plan', generate_daily_plan, default_daily_plan),
+    ('workplace', generate_workplace_suggestions, default_workplace_suggestions)
+]
+
+# What each stage's prompt is built from; a re-assessment reuses the stored section while these are unchanged
+SECTION_INPUTS = {
+    'empathy': SectionInputs(prediction=('stress_level', 'stress_score', 'burnout_risk', 'burnout_score')),
+    'daily_plan': SectionInputs(prediction=('stress_level', 'burnout_risk'), stressors=3, questionnaire=('sleep_hours', 'work_hours_per_day')),
+    'workplace': SectionInputs(questionnaire=('work_hours_per_day', 'work_from_home', 'flexible_hours', 'manager_support'))
+}
+
+DAY_PLAN_ADAPTER = TypeAdapter(DayPlan)
+STRING_LIST_ADAPTER = TypeAdapter(List[str])
+
+async def generate_structured_sections(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Tuple[Dict[str, Any], Set[str]]:
+    """Generate explanation, daily plan, suggestions and emails with a single JSON-mode AI call; (sections, stages parsed in full)"""
+    
+    def new_chat():
+        return LlmChat(
+            api_key=EMERGENT_KEY,
+            session_id=f"structured_{uuid.uuid4()}",
+            system_message="You are an empathetic work-life balance coach and career advisor for women in IT. Provide supportive, non-judgmental, practical guidance. Never diagnose. Use words like 'may', 'could', 'might'. Reply with a single JSON document and nothing else."
+        ).with_model("openai", "gpt-5.2")
+    
+    prompt = f"""A woman working in IT has these results:
+- Stress level: {prediction['stress_level']} ({prediction['stress_score']}/100)
+- Burnout risk: {prediction['burnout_risk']} ({prediction['burnout_score']}/100)
+- Current sleep: {questionnaire.sleep_hours}h
+- Work hours: {questionnaire.work_hours_per_day}h/day
+- WFH: {questionnaire.work_from_home}
+- Flexible hours: {questionnaire.flexible_hours}
+- Manager support: {questionnaire.manager_support}/10
+- Key stressors: {', '.join(stressors)}
+
+Return JSON with exactly these keys:
+{{
+  "explanation": "warm, supportive explanation in 3 short paragraphs: what this means, why this may be happening (based on the stressors), reassurance and hope",
+  "daily_plan": [
+    {{"day": 1, "sleep_goal": "specific hours and time", "breaks": "specific break schedule", "habit": "one 2-minute micro-habit", "boundary": "one work boundary to set", "message": "encouraging message"}}
+  ],
+  "flex_suggestions": ["3-4 flexibility suggestions (WFH, flexible hours, workload adjustment, etc.)"],
+  "email_to_manager": "professional email to manager requesting workload adjustment (150 words, polite, confident)",
+  "email_to_hr": "professional email to HR for flexible schedule (150 words, formal)"
+}}
+
+daily_plan must have 7 entries (days 1-7) and be progressive - start small on day 1, build up."""
+    
+    message = UserMessage(text=prompt)
+    response = await send_llm_message(new_chat, message, 'structured')
+    
+    return parse_structured_sections(response, prediction, stressors, questionnaire)
+
+def parse_structured_sections(response: str, prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput) -> Tuple[Dict[str, Any], Set[str]]:
+    """Validate a structured response section by section; missing or invalid sections are left out.
+    
+    Also returns the stages that parsed in full, i.e. were not padded with default content.
+    """
+    started = time.perf_counter()
+    data = parse_structured_response(response)
+    sections = {}
+    
+    explanation = data.get('explanation')
+    if isinstance(explanation, str) and explanation.strip():
+        sections['empathy'] = {
+            "explanation": explanation.strip(),
+            "quick_summary": build_quick_summary(prediction, stressors)
+        }
+    
+    days = []
+    for day in data.get('daily_plan') or []:
+        try:
+            days.append(DAY_PLAN_ADAPTER.validate_python(day))
+        except ValidationError:
+            continue
+    if days:
+        # Pad a short plan with the default days so it always covers the week
+        plan = days[:7] + default_daily_plan(prediction, stressors, questionnaire)[len(days):]
+        sections['daily_plan'] = [day.model_copy(update={"day": i}) for i, day in enumerate(plan, 1)]
+    
+    workplace = {}
+    try:
+        suggestions = STRING_LIST_ADAPTER.validate_python(data.get('flex_suggestions'))
+        if suggestions:
+            workplace['flex_suggestions'] = suggestions
+    except ValidationError:
+        pass
+    for field in ('email_to_manager', 'email_to_hr'):
+        if isinstance(data.get(field), str) and data[field].strip():
+            workplace[field] = data[field].strip()
+    if workplace:
+        sections['workplace'] = {**default_workplace_suggestions(prediction, stressors, questionnaire), **workplace}
+    
+    missing = [stage for stage, _, _ in LLM_STAGES if stage not in sections]
+    for stage in missing:
+        PARSE_FALLBACKS.inc('structured', stage)
+    if 0 < len(days) < 7:
+        PARSE_FALLBACKS.inc('structured', 'daily_plan_days')
+    observe_stage('parse_structured', started, fallback=bool(missing) or 0 < len(days) < 7)
+    
+    parsed_ok = set(sections)
+    if len(days) < 7:
+        parsed_ok.discard('daily_plan')
+    if len(workplace) < 3:
+        parsed_ok.discard('workplace')
+    return sections, parsed_ok
+
+async def run_structured_generation(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput, reused: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Fill every section not in ``reused`` from the cache or one structured AI call, falling back to defaults per section"""
+    started = time.perf_counter()
+    outcome = "cache_hit"
+    keys = {stage: llm_section_key(stage, prediction, stressors, questionnaire) for stage, _, _ in LLM_STAGES}
+    sections = dict(reused or {})
+    for stage, key in keys.items():
+        if stage in sections:
+            continue
+        cached = await llm_cache.get(stage, key)
+        if cached is not None:
+            sections[stage] = section_from_cache(stage, cached, prediction, stressors)
+    
+    if len(sections) < len(keys):
+        generated, parsed_ok = {}, set()
+        outcome = "ok"
+        try:
+            generated, parsed_ok = await asyncio.wait_for(
+                generate_structured_sections(prediction, stressors, questionnaire),
+                timeout=LLM_STRUCTURED_TIMEOUT
+            )
+            llm_breaker.record_success()
+        except CircuitOpen:
+            outcome = "circuit_open"
+            LLM_ERRORS.inc("structured", outcome)
+        except asyncio.TimeoutError:
+            logger.warning(f"Structured LLM generation timed out after {LLM_STRUCTURED_TIMEOUT}s, using defaults")
+            llm_breaker.record_failure()
+            outcome = "timeout"
+            LLM_ERRORS.inc("structured", outcome)
+        except Exception as e:
+            logger.warning(f"Structured LLM generation failed, using defaults: {str(e)}")
+            if not isinstance(e, LlmQueueFull):
+                llm_breaker.record_failure()
+            outcome = "error"
+            LLM_ERRORS.inc("structured", "queue_full" if isinstance(e, LlmQueueFull) else outcome)
+        
+        for stage, section in generated.items():
+            if stage not in sections:
+                sections[stage] = section
+                if stage in parsed_ok:
+                    await llm_cache.put(stage, keys[stage], section_to_cache(stage, section))
+    
+    used_fallback = False
+    for stage, _, fallback in LLM_STAGES:
+        if stage not in sections:
+            logger.warning(f"No '{stage}' section generated, using defaults")
+            sections[stage] = fallback(prediction, stressors, questionnaire)
+            used_fallback = True
+    observe_stage("structured", started, outcome, fallback=used_fallback)
+    return sections
+
+async def iter_llm_sections(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput, reused: Optional[Dict[str, Any]] = None):
+    """Yield (stage, section) pairs as each section becomes available, routed by risk band.
+    
+    Sections in ``reused`` (from a previous assessment) come first and are not generated.
+    """
+    reused = reused or {}
+    for stage, section in reused.items():
+        yield stage, section
+    route = generation_route(prediction)
+    GENERATION_ROUTE_TOTAL.inc(route)
+    if route != 'llm':
+        # Template sections first: they are ready immediately
+        for stage, _, _ in LLM_STAGES:
+            if stage not in reused and (route == 'template' or stage != 'empathy'):
+                started = time.perf_counter()
+                section = TEMPLATE_SECTIONS[stage](prediction, stressors, questionnaire)
+                observe_stage(stage, started, "template")
+                yield stage, section
+        if route == 'hybrid' and 'empathy' not in reused:
+            stage, generate, fallback = LLM_STAGES[0]
+            yield stage, await run_llm_stage(stage, generate, fallback, prediction, stressors, questionnaire)
+        return
+    
+    if len(reused) == len(LLM_STAGES):
+        return
+    
+    if LLM_GENERATION_MODE == 'structured':
+        for stage, section in (await run_structured_generation(prediction, stressors, questionnaire, reused)).items():
+            if stage not in reused:
+                yield stage, section
+        return
+    
+    async def tagged(stage, generate, fallback):
+        return stage, await run_llm_stage(stage, generate, fallback, prediction, stressors, questionnaire)
+    
+    tasks = [asyncio.create_task(tagged(*spec)) for spec in LLM_STAGES if spec[0] not in reused]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Consumer went away before every section finished
+        for task in tasks:
+            task.cancel()
+
+async def generate_llm_sections(prediction: Dict, stressors: List[str], questionnaire: QuestionnaireInput, reused: Optional[Dict[str, Any]] = None):
+    """Generate the empathy, daily plan and workplace sections (concurrently, or in one structured call)"""
+    sections = {stage: section async for stage, section in iter_llm_sections(prediction, stressors, questionnaire, reused)}
+    return sections['empathy'], sections['daily_plan'], sections['workplace']
+
+TRAVEL_SAFETY_TIPS = (
+    "Share your commute route and timing with a trusted contact",
+    "Use tracked cab services or company transport when available",
+    "Keep emergency contacts on speed dial (Women Helpline 181, Emergency 112)"
+)
+
+WORKPLACE_SAFETY_TIPS = (
+    "Document any incidents of bias or harassment with dates and details",
+    "Know your rights under POSH Act (Prevention of Sexual Harassment)",
+    "SHe-Box portal available for POSH complaints: https://shebox.nic.in"
+)
+
+GENERAL_SAFETY_TIPS = (
+    "Keep NCW (National Commission for Women) helpline saved: 7827-170-170",
+    "For cyber harassment: Cyber Crime Helpline 1930",
+    "Install personal safety apps with SOS features"
+)
+
+# Tips only depend on two flags, so every combination is built once: (travel exposure, bias experienced) -> tips
+SAFETY_TIPS = {
+    (travel, bias): (TRAVEL_SAFETY_TIPS if travel else ()) + (WORKPLACE_SAFETY_TIPS if bias else ()) + GENERAL_SAFETY_TIPS
+    for travel in (False, True)
+    for bias in (False, True)
+}
+
 def generate_safety_tips(questionnaire: QuestionnaireInput, safety_risk: str) -> List[str]:
     """Generate safety tips based on work context"""
-    tips = []
-    
-    if questionnaire.night_shifts or questionnaire.commute_time_minutes > 30:
-        tips.extend([
-            "Share your commute route and timing with a trusted contact",
-            "Use tracked cab services or company transport when available",
-            "Keep emergency contacts on speed dial (Women Helpline 181, Emergency 112)"
-        ])
-    
-    if questionnaire.workplace_bias_experienced:
-        tips.extend([
-            "Document any incidents of bias or harassment with dates and details",
-            "Know your rights under POSH Act (Prevention of Sexual Harassment)",
-            "SHe-Box portal available for POSH complaints: https://shebox.nic.in"
-        ])
-    
-    tips.extend([
-        "Keep NCW (National Commission for Women) helpline saved: 7827-170-170",
-        "For cyber harassment: Cyber Crime Helpline 1930",
-        "Install personal safety apps with SOS features"
-    ])
-    
-    return tips
+    travel = questionnaire.night_shifts or questionnaire.commute_time_minutes > 30
+    return list(SAFETY_TIPS[(travel, questionnaire.workplace_bias_experienced)])
+
+BASE_RESOURCES = (
+    Resource(
+        title="Women Helpline (24/7)",
+        type="emergency",
+        contact="181 or 1091",
+        why="24/7 support for women in distress"
+    ),
+    Resource(
+        title="National Emergency Number",
+        type="emergency",
+        contact="112",
+        why="Immediate emergency response"
+    ),
+    Resource(
+        title="National Commission for Women (NCW)",
+        type="support",
+        contact="7827-170-170 or ncw@nic.in",
+        why="Support for women's rights and complaints"
+    ),
+    Resource(
+        title="SHe-Box (POSH Complaints)",
+        type="workplace",
+        contact="https://shebox.nic.in",
+        why="Online complaint portal for workplace sexual harassment under POSH Act"
+    ),
+    Resource(
+        title="Cyber Crime Helpline",
+        type="cyber_safety",
+        contact="1930 or https://cybercrime.gov.in",
+        why="Report cyber harassment or online abuse"
+    )
+)
+
+MENTAL_HEALTH_RESOURCE = Resource(
+    title="NIMHANS Mental Health Helpline",
+    type="mental_health",
+    contact="080-46110007",
+    why="Professional mental health support and counseling"
+)
+
+# Built once and shared by every assessment (they are only ever read): elevated stress or burnout -> resources
+RESOURCES = {
+    False: BASE_RESOURCES,
+    True: BASE_RESOURCES + (MENTAL_HEALTH_RESOURCE,)
+}
+
+# Static content that compact documents store by reference
+shared_content = SharedContent(db.shared_content)
+for resources in RESOURCES.values():
+    shared_content.register("resources", [resource.model_dump() for resource in resources])
+for tips in SAFETY_TIPS.values():
+    shared_content.register("safety_tips", list(tips))
+shared_content.register("flex_suggestions", DEFAULT_FLEX_SUGGESTIONS)
+shared_content.register("email_to_manager", DEFAULT_EMAIL_TO_MANAGER)
+shared_content.register("email_to_hr", DEFAULT_EMAIL_TO_HR)
+shared_content.register("explanation", DEFAULT_EXPLANATION)
+
+assessment_codec = CompactCodec(shared_content, compress_min_bytes=COMPACT_COMPRESS_MIN_BYTES)
 
 def get_resources(prediction: Dict, questionnaire: QuestionnaireInput) -> List[Resource]:
     """Get relevant resources including India-specific helplines"""
-    resources = [
-        Resource(
-            title="Women Helpline (24/7)",
-            type="emergency",
-            contact="181 or 1091",
-            why="24/7 support for women in distress"
-        ),
-        Resource(
-            title="National Emergency Number",
-            type="emergency",
-            contact="112",
-            why="Immediate emergency response"
-        ),
-        Resource(
-            title="National Commission for Women (NCW)",
-            type="support",
-            contact="7827-170-170 or ncw@nic.in",
-            why="Support for women's rights and complaints"
-        ),
-        Resource(
-            title="SHe-Box (POSH Complaints)",
-            type="workplace",
-            contact="https://shebox.nic.in",
-            why="Online complaint portal for workplace sexual harassment under POSH Act"
-        ),
-        Resource(
-            title="Cyber Crime Helpline",
-            type="cyber_safety",
-            contact="1930 or https://cybercrime.gov.in",
-            why="Report cyber harassment or online abuse"
-        )
-    ]
+    elevated = prediction['stress_level'] in ['medium', 'high'] or prediction['burnout_risk'] in ['medium', 'high']
+    return list(RESOURCES[elevated])
+
+def build_warnings(prediction: Dict) -> List[str]:
+    """Warnings shown for high stress/burnout or safety risk"""
+    warnings = []
+    if prediction['stress_score'] > 75 or prediction['burnout_score'] > 75:
+        warnings.append("Your stress/burnout levels are high. Please consider reaching out to a mental health professional.")
+    if prediction['safety_risk'] == 'high':
+        warnings.append("Safety concerns detected. Please review safety tips and keep emergency contacts accessible.")
+    return warnings
+
+def assessment_priority(prediction: Dict) -> str:
+    """LLM scheduling priority: high where warnings are shown, low when every band is low, else normal"""
+    if build_warnings(prediction):
+        return "high"
+    if prediction['stress_level'] == prediction['burnout_risk'] == prediction['safety_risk'] == 'low':
+        return "low"
+    return "normal"
+
+def require_admin(x_admin_key: Optional[str] = Header(None)) -> None:
+    """Dependency for admin-only routes"""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled (ADMIN_API_KEY is not set)")
+    if not x_admin_key or not secrets.compare_digest(x_admin_key.encode(), ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=403, detail="Admin credential required")
+
+def llm_client_id(request: Request) -> str:
+    return request.headers.get(LLM_CLIENT_HEADER) or (request.client.host if request.client else "")
+
+def assessment_document(result: AssessmentResult, questionnaire: QuestionnaireInput, **extra) -> Dict[str, Any]:
+    """The stored form of an assessment; the only model_dump of the result on the request path"""
+    doc = result.model_dump()
+    doc['timestamp'] = doc['timestamp'].isoformat()
+    doc['questionnaire'] = questionnaire.model_dump()
+    doc.update(extra)
+    return doc
+
+STORAGE_ONLY_FIELDS = ('_id', 'questionnaire', 'idempotency_key', 'request_hash', 'stressor_keys')
+
+def assessment_view(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """The API form of a stored assessment document (shares its nested values)"""
+    return {key: value for key, value in doc.items() if key not in STORAGE_ONLY_FIELDS}
+
+def assessment_json_response(result: AssessmentResult, doc: Dict[str, Any]) -> Response:
+    """Encode the already-dumped document once with pydantic-core, skipping response_model re-validation"""
+    view = assessment_view(doc)
+    view['timestamp'] = result.timestamp  # same JSON format response_model serialization used
+    return Response(content=pydantic_core.to_json(view), media_type="application/json")
+
+def stored_assessment_response(doc: Dict[str, Any], replayed: bool = True) -> Response:
+    """An assessment read back from MongoDB, in the same JSON form as a fresh one"""
+    view = assessment_view(doc)
+    view['timestamp'] = datetime.fromisoformat(view['timestamp'])
+    headers = {"Idempotent-Replayed": "true"} if replayed else None
+    return Response(content=pydantic_core.to_json(view), media_type="application/json", headers=headers)
+
+async def record_rollups(doc: Dict[str, Any]) -> None:
+    try:
+        await cohort_rollups.record_assessment(db.assessment_rollups, doc)
+    except Exception as e:
+        # Analytics drift is repairable with rebuild_rollups.py; the assessment itself is saved
+        logger.warning(f"Could not update cohort rollups for {doc['id']}: {str(e)}")
+
+async def save_assessment(result: AssessmentResult, questionnaire: QuestionnaireInput, buffered: bool = True, **extra) -> Dict[str, Any]:
+    """Persist an assessment together with its questionnaire (write-behind when enabled and ``buffered``) and return the document"""
+    started = time.perf_counter()
+    doc = assessment_document(result, questionnaire, **extra)
+    stored = assessment_codec.encode(doc) if COMPACT_STORAGE else doc
+    try:
+        if ASSESSMENT_WRITE_BEHIND and buffered:
+            await assessment_writer.submit(stored)
+        else:
+            await db.assessments.insert_one(stored)
+    except Exception:
+        observe_stage("persist", started, "error")
+        raise
     
-    if prediction['stress_level'] in ['medium', 'high'] or prediction['burnout_risk'] in ['medium', 'high']:
-        resources.append(Resource(
-            title="NIMHANS Mental Health Helpline",
-            type="mental_health",
-            contact="080-46110007",
-            why="Professional mental health support and counseling"
-        ))
+    if COHORT_ROLLUPS_ENABLED:
+        if ASSESSMENT_WRITE_BEHIND and buffered:
+            # Off the response path like the buffered insert itself
+            task = asyncio.create_task(record_rollups(doc))
+            rollup_tasks.add(task)
+            task.add_done_callback(rollup_tasks.discard)
+        else:
+            await record_rollups(doc)
     
-    return resources
+    PERSIST_SECONDS.observe(time.perf_counter() - started)
+    return doc
+
+def deterministic_fields(prediction: Dict, stressors: List[str], safety_tips: List[str], resources: List[Resource], warnings: List[str]) -> Dict[str, Any]:
+    """The parts of an assessment that are available before any AI generation"""
+    return {
+        "stress_level": prediction['stress_level'],
+        "stress_score": prediction['stress_score'],
+        "burnout_risk": prediction['burnout_risk'],
+        "burnout_score": prediction['burnout_score'],
+        "safety_risk": prediction['safety_risk'],
+        "model_version": prediction['model_version'],
+        "key_stressors": stressors,
+        "quick_summary": build_quick_summary(prediction, stressors),
+        "safety_tips": safety_tips,
+        "resources": resources,
+        "warnings": warnings
+    }
+
+def section_fields(stage: str, section: Any) -> Dict[str, Any]:
+    """AssessmentResult fields filled by one LLM section"""
+    if stage == 'daily_plan':
+        return {"daily_plan": section}
+    return section
+
+def build_assessment_result(prediction: Dict, stressors: List[str], sections: Dict[str, Any], safety_tips: List[str], resources: List[Resource], warnings: List[str], **fields) -> AssessmentResult:
+    return AssessmentResult(
+        stress_level=prediction['stress_level'],
+        stress_score=prediction['stress_score'],
+        burnout_risk=prediction['burnout_risk'],
+        burnout_score=prediction['burnout_score'],
+        safety_risk=prediction['safety_risk'],
+        model_version=prediction['model_version'],
+        key_stressors=stressors,
+        quick_summary=sections['empathy']['quick_summary'],
+        explanation=sections['empathy']['explanation'],
+        daily_plan=sections['daily_plan'],
+        flex_suggestions=sections['workplace']['flex_suggestions'],
+        email_to_manager=sections['workplace']['email_to_manager'],
+        email_to_hr=sections['workplace']['email_to_hr'],
+        safety_tips=safety_tips,
+        resources=resources,
+        warnings=warnings,
+        **fields
+    )
 
 @api_router.post("/assessment/analyze", response_model=AssessmentResult)
-async def analyze_assessment(questionnaire: QuestionnaireInput):
+async def analyze_assessment(questionnaire: QuestionnaireInput, request: Request, idempotency_key: Optional[str] = Header(None)):
     """Complete assessment analysis with AI-powered recommendations"""
+    client = llm_client_id(request)
+    if not IDEMPOTENCY_ENABLED:
+        result, doc = await run_assessment(questionnaire, client=client)
+        return assessment_json_response(result, doc)
     
     try:
-        # Step 1: Simulate prediction
-        prediction = simulate_prediction(questionnaire)
-        
-        # Step 2: Extract stressors
-        stressors = extract_key_stressors(questionnaire, prediction)
-        
-        # Step 3: Generate empathy response
-        empathy = await generate_empathy_response(prediction, stressors, questionnaire)
-        
-        # Step 4: Generate daily plan
-        daily_plan = await generate_daily_plan(prediction, stressors, questionnaire)
-        
-        # Step 5: Generate workplace suggestions
-        workplace = await generate_workplace_suggestions(prediction, stressors, questionnaire)
+        keys = idempotency.request_keys(idempotency_key, questionnaire.model_dump(), IDEMPOTENCY_WINDOW_SECONDS)
+        stored = await find_idempotent_assessment(keys)
+    except (ValueError, IdempotencyKeyReused) as e:
+        IDEMPOTENT_SUBMISSIONS.inc("conflict")
+        raise HTTPException(status_code=422, detail=str(e))
+    except SubmissionPending as e:
+        raise submission_pending(e)
+    if stored:
+        IDEMPOTENT_SUBMISSIONS.inc("replayed")
+        return stored_assessment_response(stored)
+    
+    IDEMPOTENT_SUBMISSIONS.inc("shared" if keys.key in assessment_flights else "executed")
+    result, doc = await assessment_flights.run(keys.key, lambda: run_assessment(questionnaire, keys, client))
+    if result is None:
+        # Another process stored this submission first
+        return stored_assessment_response(doc)
+    return assessment_json_response(result, doc)
+
+async def find_claimed_assessment(keys: idempotency.IdempotencyKeys) -> Optional[Dict[str, Any]]:
+    return await idempotency.find_stored(
+        db.idempotency_keys, db.assessments, keys, {"_id": 0, "questionnaire": 0}, IDEMPOTENCY_PENDING_SECONDS
+    )
+
+def submission_pending(e: SubmissionPending) -> HTTPException:
+    IDEMPOTENT_SUBMISSIONS.inc("pending")
+    return HTTPException(status_code=409, detail=str(e), headers={"Retry-After": str(math.ceil(WRITE_BEHIND_FLUSH_INTERVAL))})
+
+async def find_idempotent_assessment(keys: idempotency.IdempotencyKeys) -> Optional[Dict[str, Any]]:
+    try:
+        return await assessment_codec.decode(await find_claimed_assessment(keys))
+    except (IdempotencyKeyReused, SubmissionPending):
+        raise
+    except Exception as e:
+        # Without the lookup a retry costs a pipeline run; the key claim still prevents a duplicate
+        logger.warning(f"Idempotency lookup failed: {str(e)}")
+        return None
+
+@api_router.post("/assessments/{assessment_id}/reassess", response_model=AssessmentResult)
+async def reassess_assessment(assessment_id: str, questionnaire: QuestionnaireInput, request: Request):
+    """Assessment of a retaken questionnaire, reusing the previous assessment's sections whose inputs did not change"""
+    previous = await db.assessments.find_one({"id": assessment_id}, assessment_history.STORED_PROJECTION)
+    if not previous:
+        raise HTTPException(status_code=404, detail="Assessment not found")
+    previous = await assessment_codec.decode(previous)
+    result, doc = await run_assessment(questionnaire, client=llm_client_id(request), previous=previous)
+    return assessment_json_response(result, doc)
+
+def llm_generated_stages(prediction: Dict) -> List[str]:
+    """Stages the generation route sends to the LLM; the others come from templates"""
+    route = generation_route(prediction)
+    if route == 'template':
+        return []
+    return ['empathy'] if route == 'hybrid' else [stage for stage, _, _ in LLM_STAGES]
+
+def stored_section(stage: str, doc: Dict[str, Any]) -> Any:
+    """One section of a stored assessment, in the form section_to_cache gives"""
+    if stage == 'empathy':
+        return {"explanation": doc['explanation']}
+    if stage == 'daily_plan':
+        return doc['daily_plan']
+    return {field: doc[field] for field in ('flex_suggestions', 'email_to_manager', 'email_to_hr')}
+
+def plan_reassessment(previous: Dict[str, Any], questionnaire: QuestionnaireInput, prediction: Dict, stressors: List[str]):
+    """Sections of the previous assessment a retake reuses, and the report of what changed"""
+    try:
+        previous_questionnaire = QuestionnaireInput(**previous['questionnaire'])
+    except (KeyError, TypeError, ValidationError):
+        previous_questionnaire = None  # nothing to diff against, so every section is generated again
+    current = AssessmentInputs(prediction, stressors, questionnaire.model_dump())
+    if previous_questionnaire:
+        previous_prediction = {key: previous.get(key) for key in ('stress_level', 'stress_score', 'burnout_risk', 'burnout_score', 'safety_risk', 'model_version')}
+        previous_prediction['stressor_keys'] = cohort_rollups.stressor_keys(previous)
+        before = AssessmentInputs(previous_prediction, previous.get('key_stressors') or [], previous_questionnaire.model_dump())
+    
+    reused = {}
+    report = {
+        "previous_id": previous['id'],
+        "changed_fields": changed_fields(before.questionnaire, current.questionnaire) if previous_questionnaire else None,
+        "reused": [],
+        "sections": {}
+    }
+    generated = llm_generated_stages(prediction)
+    for stage, _, fallback in LLM_STAGES:
+        changed = []
+        if stage not in generated:
+            outcome = "template"  # microseconds to build again
+        elif not previous_questionnaire:
+            outcome = "no_previous_answers"
+        else:
+            changed = changed_inputs(SECTION_INPUTS[stage], before, current)
+            stored = stored_section(stage, previous)
+            # Default or template content is left behind, so the retake gets the LLM-written section
+            not_generated = [
+                section_to_cache(stage, build(before.prediction, before.stressors, previous_questionnaire))
+                for build in (fallback, TEMPLATE_SECTIONS[stage])
+            ]
+            if changed:
+                outcome = "inputs_changed"
+            elif stored in not_generated:
+                outcome = "fallback"
+            else:
+                outcome = "reused"
+                reused[stage] = section_from_cache(stage, stored, prediction, stressors)
+                report["reused"].append(stage)
+        report["sections"][stage] = {"outcome": outcome, "changed_inputs": changed}
+        REASSESSMENT_SECTIONS.inc(stage, outcome)
+    return reused, report
+
+async def run_assessment(questionnaire: QuestionnaireInput, keys: Optional[idempotency.IdempotencyKeys] = None, client: str = "", previous: Optional[Dict[str, Any]] = None):
+    """Score, generate and save one assessment; (None, stored document) if its idempotency key was taken meanwhile.
+    
+    With a ``previous`` assessment document, sections whose inputs did not change are reused from it.
+    """
+    # Steps 1-2: Simulate prediction and extract stressors
+    prediction, stressors = await predict_questionnaire(questionnaire)
+    llm_call_class.set((assessment_priority(prediction), client))
+    reused, extra = {}, {"stressor_keys": prediction['stressor_keys']}
+    if previous is not None:
+        reused, extra['reassessment'] = plan_reassessment(previous, questionnaire, prediction, stressors)
+    if set(llm_generated_stages(prediction)) - reused.keys():
+        llm_limiter.check_admission()
+    ASSESSMENTS_IN_FLIGHT.inc("analyze")
+    
+    try:
+        # Steps 3-5: Generate empathy response, daily plan and workplace suggestions (templates or LLM, by risk)
+        empathy, daily_plan, workplace = await generate_llm_sections(prediction, stressors, questionnaire, reused)
         
         # Step 6: Generate safety tips
         safety_tips = generate_safety_tips(questionnaire, prediction['safety_risk'])
@@ -428,72 +1391,532 @@ async def analyze_assessment(questionnaire: QuestionnaireInput):
         resources = get_resources(prediction, questionnaire)
         
         # Step 8: Generate warnings if needed
-        warnings = []
-        if prediction['stress_score'] > 75 or prediction['burnout_score'] > 75:
-            warnings.append("Your stress/burnout levels are high. Please consider reaching out to a mental health professional.")
-        if prediction['safety_risk'] == 'high':
-            warnings.append("Safety concerns detected. Please review safety tips and keep emergency contacts accessible.")
+        warnings = build_warnings(prediction)
         
         # Create result
-        result = AssessmentResult(
-            stress_level=prediction['stress_level'],
-            stress_score=prediction['stress_score'],
-            burnout_risk=prediction['burnout_risk'],
-            burnout_score=prediction['burnout_score'],
-            safety_risk=prediction['safety_risk'],
-            key_stressors=stressors,
-            quick_summary=empathy['quick_summary'],
-            explanation=empathy['explanation'],
-            daily_plan=daily_plan,
-            flex_suggestions=workplace['flex_suggestions'],
-            email_to_manager=workplace['email_to_manager'],
-            email_to_hr=workplace['email_to_hr'],
-            safety_tips=safety_tips,
-            resources=resources,
-            warnings=warnings
-        )
+        sections = {'empathy': empathy, 'daily_plan': daily_plan, 'workplace': workplace}
+        result = build_assessment_result(prediction, stressors, sections, safety_tips, resources, warnings)
         
-        # Save to database
-        doc = result.model_dump()
-        doc['timestamp'] = doc['timestamp'].isoformat()
-        doc['questionnaire'] = questionnaire.model_dump()
-        await db.assessments.insert_one(doc)
-        
-        return result
+        # Save to database and answer with the same dumped document
+        if keys is None:
+            return result, await save_assessment(result, questionnaire, **extra)
+        try:
+            # Claimed directly, so races between processes are settled before the assessment is buffered
+            await idempotency.claim(
+                db.idempotency_keys, db.assessments, keys, result.id, result.timestamp, IDEMPOTENCY_PENDING_SECONDS
+            )
+        except DuplicateKeyError:
+            try:
+                stored = await find_claimed_assessment(keys)
+            except IdempotencyKeyReused as e:
+                # Another process claimed the key for a different questionnaire first
+                IDEMPOTENT_SUBMISSIONS.inc("conflict")
+                raise HTTPException(status_code=422, detail=str(e))
+            except SubmissionPending as e:
+                raise submission_pending(e)
+            if not stored:
+                raise
+            return None, await assessment_codec.decode(stored)
+        try:
+            return result, await save_assessment(
+                result, questionnaire, idempotency_key=keys.key, request_hash=keys.request_hash, **extra
+            )
+        except Exception:
+            try:
+                await idempotency.release(db.idempotency_keys, keys, result.id)
+            except Exception as e:
+                logger.warning(f"Could not release idempotency key {keys.key}: {str(e)}")
+            raise
         
+    except (HTTPException, WriteBehindFull):
+        raise
     except Exception as e:
         logger.error(f"Error in assessment: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Assessment failed: {str(e)}")
+    finally:
+        ASSESSMENTS_IN_FLIGHT.dec("analyze")
+
+SECTION_EVENTS = {'empathy': "explanation", 'daily_plan': "daily_plan", 'workplace': "workplace"}
+
+def ndjson_event(event: str, data: Any) -> str:
+    return json.dumps({"event": event, "data": jsonable_encoder(data)}) + "\n"
+
+async def stream_assessment(questionnaire: QuestionnaireInput, prediction: Dict, stressors: List[str], client: str = ""):
+    """Yield NDJSON events: deterministic results first, then each LLM section as it finishes"""
+    llm_call_class.set((assessment_priority(prediction), client))
+    ASSESSMENTS_IN_FLIGHT.inc("stream")
+    try:
+        safety_tips = generate_safety_tips(questionnaire, prediction['safety_risk'])
+        resources = get_resources(prediction, questionnaire)
+        warnings = build_warnings(prediction)
+        
+        yield ndjson_event("scores", deterministic_fields(prediction, stressors, safety_tips, resources, warnings))
+        
+        sections = {}
+        async for stage, section in iter_llm_sections(prediction, stressors, questionnaire):
+            sections[stage] = section
+            yield ndjson_event(SECTION_EVENTS[stage], section_fields(stage, section))
+        
+        result = build_assessment_result(prediction, stressors, sections, safety_tips, resources, warnings)
+        
+        try:
+            await save_assessment(result, questionnaire, stressor_keys=prediction['stressor_keys'])
+        except Exception as e:
+            logger.error(f"Error saving streamed assessment: {str(e)}")
+            yield ndjson_event("error", {"detail": f"Assessment failed: {str(e)}"})
+            return
+        
+        yield ndjson_event("complete", {"id": result.id, "timestamp": result.timestamp})
+    finally:
+        ASSESSMENTS_IN_FLIGHT.dec("stream")
+
+@api_router.post("/assessment/analyze/stream")
+async def analyze_assessment_stream(questionnaire: QuestionnaireInput, request: Request):
+    """Streaming assessment analysis (NDJSON): scores first, AI sections as they complete"""
+    prediction, stressors = await predict_questionnaire(questionnaire)
+    if generation_route(prediction) != 'template':
+        llm_limiter.check_admission()
+    return StreamingResponse(
+        stream_assessment(questionnaire, prediction, stressors, llm_client_id(request)),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def process_assessment_job(job: Dict[str, Any], queue: JobQueue) -> Dict[str, Any]:
+    """Worker handler: run the LLM stages for a queued assessment and persist the result"""
+    ASSESSMENTS_IN_FLIGHT.inc("job")
+    try:
+        # A previous attempt may have saved the assessment and crashed before completing the job
+        existing = await db.assessments.find_one({"id": job['_id']}, {"_id": 0, "questionnaire": 0})
+        if existing:
+            return await assessment_codec.decode(existing)
+        
+        questionnaire = QuestionnaireInput(**job['payload'])
+        partial = job['result']
+        if job.get('prediction'):
+            # Scored when queued: the assessment keeps the scores the client already got, even across a model reload
+            prediction, stressors = job['prediction'], partial['key_stressors']
+            safety_tips, resources, warnings = partial['safety_tips'], partial['resources'], partial['warnings']
+        else:
+            prediction, stressors = await predict_questionnaire(questionnaire)
+            safety_tips = generate_safety_tips(questionnaire, prediction['safety_risk'])
+            resources = get_resources(prediction, questionnaire)
+            warnings = build_warnings(prediction)
+        llm_call_class.set((assessment_priority(prediction), job.get('client', '')))
+        
+        sections = {}
+        async for stage, section in iter_llm_sections(prediction, stressors, questionnaire):
+            sections[stage] = section
+            await queue.save_progress(job, jsonable_encoder(section_fields(stage, section)))
+        
+        result = build_assessment_result(prediction, stressors, sections, safety_tips, resources, warnings, id=job['_id'])
+        # Written directly: the crash-recovery check above must be able to read it back
+        doc = await save_assessment(result, questionnaire, buffered=False, stressor_keys=prediction['stressor_keys'])
+        return assessment_view(doc)
+    finally:
+        ASSESSMENTS_IN_FLIGHT.dec("job")
+
+job_pool = JobWorkerPool(
+    assessment_jobs,
+    process_assessment_job,
+    concurrency=ASSESSMENT_JOB_WORKERS,
+    poll_interval=ASSESSMENT_JOB_POLL_INTERVAL
+)
+
+def job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    return jsonable_encoder({
+        "job_id": job['_id'],
+        "status": job['status'],
+        "attempts": job['attempts'],
+        "error": job['error'],
+        "created_at": job['created_at'],
+        "updated_at": job['updated_at'],
+        "result": job['result']
+    })
+
+@api_router.post("/assessment/jobs", status_code=202)
+async def create_assessment_job(questionnaire: QuestionnaireInput, request: Request):
+    """Queue an assessment: scores are returned now, AI sections are generated by a worker"""
+    prediction, stressors = await predict_questionnaire(questionnaire)
+    partial = deterministic_fields(
+        prediction, stressors,
+        generate_safety_tips(questionnaire, prediction['safety_risk']),
+        get_resources(prediction, questionnaire),
+        build_warnings(prediction)
+    )
+    
+    try:
+        job = await assessment_jobs.enqueue(
+            questionnaire.model_dump(), jsonable_encoder(partial), client=llm_client_id(request),
+            prediction=jsonable_encoder(prediction)
+        )
+    except Exception as e:
+        logger.error(f"Error queueing assessment job: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Assessment failed: {str(e)}")
+    
+    return job_response(job)
+
+@api_router.get("/assessment/jobs/{job_id}")
+async def get_assessment_job(job_id: str):
+    """Job status with the partial or final assessment result"""
+    job = await assessment_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+# Registered before /assessments/{assessment_id}, which would match it
+@api_router.get("/assessments/export", dependencies=[Depends(require_admin)])
+async def export_assessments(
+    format: Literal['ndjson', 'csv', 'parquet'] = 'ndjson',
+    fields: Optional[str] = None,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    city: Optional[str] = None,
+    role: Optional[str] = None,
+    age_group: Optional[str] = None,
+    years_in_it: Optional[str] = None,
+    stress_level: Optional[List[Literal['low', 'medium', 'high']]] = Query(None),
+    burnout_risk: Optional[List[Literal['low', 'medium', 'high']]] = Query(None),
+    safety_risk: Optional[List[Literal['low', 'medium', 'high']]] = Query(None)
+):
+    """Stream assessments oldest first as NDJSON, CSV or Parquet (admin only); ``fields`` is a comma-separated column list"""
+    try:
+        export = AssessmentExport(
+            format, QUESTIONNAIRE_COLUMN_TYPES,
+            fields=[f.strip() for f in fields.split(',') if f.strip()] if fields else None,
+            batch_size=batch_size,
+            decode=assessment_codec.decode_many
+        )
+        query = export_query(
+            start=start, end=end, city=city, role=role, age_group=age_group, years_in_it=years_in_it,
+            bands={"stress_level": stress_level, "burnout_risk": burnout_risk, "safety_risk": safety_risk}
+        )
+        await check_min_rows(db.assessments, query, COHORT_MIN_SIZE)
+    except InvalidExport as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        export.chunks(db.assessments, query),
+        media_type=export.media_type,
+        headers={"Content-Disposition": f'attachment; filename="assessments.{format}"'}
+    )
+
+@api_router.get("/assessments/{assessment_id}")
+async def get_assessment(assessment_id: str):
+    """A stored assessment by id"""
+    doc = await db.assessments.find_one({"id": assessment_id}, assessment_history.FULL_PROJECTION)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Assessment not found")
+    return await assessment_codec.decode(doc)
+
+@api_router.get("/assessments")
+async def list_assessments(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    city: Optional[str] = None,
+    role: Optional[str] = None,
+    stress_level: Optional[List[Literal['low', 'medium', 'high']]] = Query(None),
+    burnout_risk: Optional[List[Literal['low', 'medium', 'high']]] = Query(None),
+    safety_risk: Optional[List[Literal['low', 'medium', 'high']]] = Query(None),
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    view: Literal['summary', 'full'] = 'summary'
+):
+    """Assessments newest first, filtered by time range, city, role and risk bands, with cursor pagination"""
+    try:
+        page = await assessment_history.list_assessments(
+            db.assessments,
+            limit=limit,
+            full=view == 'full',
+            start=start,
+            end=end,
+            city=city,
+            role=role,
+            bands={"stress_level": stress_level, "burnout_risk": burnout_risk, "safety_risk": safety_risk},
+            cursor=cursor
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    page["items"] = await assessment_codec.decode_many(page["items"])
+    return page
+
+@api_router.get("/analytics/cohorts")
+async def get_cohort_analytics(
+    dimension: Literal['all', 'city', 'role', 'age_group', 'years_in_it'] = 'all',
+    start: Optional[date] = None,
+    end: Optional[date] = None
+):
+    """Stress and burnout distributions per cohort over a UTC day range, from the daily rollups"""
+    return await cohort_rollups.read_cohorts(
+        db.assessment_rollups,
+        dimension,
+        start=start,
+        end=end,
+        min_cohort_size=COHORT_MIN_SIZE
+    )
+
+def parse_questionnaire_batch(body: bytes, ndjson: bool) -> List[QuestionnaireInput]:
+    """Validate a JSON array or NDJSON upload of questionnaires"""
+    if not ndjson:
+        return QUESTIONNAIRE_LIST_ADAPTER.validate_json(body)
+    
+    questionnaires = []
+    errors = []
+    for line_no, line in enumerate(body.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            questionnaires.append(QuestionnaireInput.model_validate_json(line))
+        except ValidationError as e:
+            errors.extend({**err, "loc": ("body", line_no, *err["loc"])} for err in e.errors(include_url=False))
+    if errors:
+        raise RequestValidationError(errors)
+    return questionnaires
+
+def score_questionnaire_batch(questionnaires: List[QuestionnaireInput]) -> List[Dict[str, Any]]:
+    model = scoring_models.model
+    if not predictor:
+        return model.score_rows(columns_from_questionnaires(questionnaires, model.fields))
+    
+    columns = columns_from_questionnaires(questionnaires, dict.fromkeys(model.fields + predictor.fields))
+    rows = model.score_rows(columns)
+    try:
+        scores = predictor.predict_batch(columns)
+    except Exception as e:
+        PREDICTOR_FALLBACKS.inc("error", amount=len(rows))
+        logger.warning(f"Trained predictor failed for a batch of {len(rows)}, using the scoring model: {str(e)}")
+        return rows
+    return [apply_trained_scores(model, row, dict(zip(predictor.targets, values)), predictor.version)
+            for row, values in zip(rows, scores.tolist())]
+
+@api_router.post("/assessment/score-batch")
+async def score_assessment_batch(request: Request):
+    """Score a batch of questionnaires (JSON array or NDJSON) without AI generation"""
+    body = await request.body()
+    ndjson = 'ndjson' in request.headers.get('content-type', '')
+    
+    try:
+        questionnaires = await run_in_threadpool(parse_questionnaire_batch, body, ndjson)
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
+    
+    if len(questionnaires) > SCORE_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: {len(questionnaires)} rows (max {SCORE_BATCH_MAX_ROWS})")
+    
+    results = await run_in_threadpool(score_questionnaire_batch, questionnaires)
+    
+    if ndjson:
+        return StreamingResponse(
+            (json.dumps(row) + "\n" for row in results),
+            media_type="application/x-ndjson"
+        )
+    return {"count": len(results), "results": results}
+
+RESOURCE_DIRECTORY = {
+    "emergency": [
+        {"name": "Women Helpline", "contact": "181", "available": "24/7"},
+        {"name": "National Emergency", "contact": "112", "available": "24/7"},
+        {"name": "NCW Helpline", "contact": "7827-170-170", "available": "10 AM - 6 PM"}
+    ],
+    "workplace": [
+        {"name": "SHe-Box (POSH)", "url": "https://shebox.nic.in", "type": "Online Portal"},
+        {"name": "Labour Ministry Helpline", "contact": "1800-11-1256", "type": "Workplace Rights"}
+    ],
+    "mental_health": [
+        {"name": "NIMHANS", "contact": "080-46110007", "available": "Working hours"},
+        {"name": "Vandrevala Foundation", "contact": "9999-666-555", "available": "24/7"}
+    ],
+    "legal": [
+        {"name": "Cyber Crime Portal", "url": "https://cybercrime.gov.in", "contact": "1930"},
+        {"name": "NCW Legal Cell", "email": "ncw@nic.in", "type": "Legal Support"}
+    ]
+}
+
+RESOURCE_DIRECTORY_PAYLOAD = StaticPayload(RESOURCE_DIRECTORY, max_age=RESOURCES_CACHE_MAX_AGE)
 
 @api_router.get("/resources")
-async def get_all_resources():
+async def get_all_resources(request: Request):
     """Get all India-specific resources"""
-    return {
-        "emergency": [
-            {"name": "Women Helpline", "contact": "181", "available": "24/7"},
-            {"name": "National Emergency", "contact": "112", "available": "24/7"},
-            {"name": "NCW Helpline", "contact": "7827-170-170", "available": "10 AM - 6 PM"}
-        ],
-        "workplace": [
-            {"name": "SHe-Box (POSH)", "url": "https://shebox.nic.in", "type": "Online Portal"},
-            {"name": "Labour Ministry Helpline", "contact": "1800-11-1256", "type": "Workplace Rights"}
-        ],
-        "mental_health": [
-            {"name": "NIMHANS", "contact": "080-46110007", "available": "Working hours"},
-            {"name": "Vandrevala Foundation", "contact": "9999-666-555", "available": "24/7"}
-        ],
-        "legal": [
-            {"name": "Cyber Crime Portal", "url": "https://cybercrime.gov.in", "contact": "1930"},
-            {"name": "NCW Legal Cell", "email": "ncw@nic.in", "type": "Legal Support"}
-        ]
-    }
+    return RESOURCE_DIRECTORY_PAYLOAD.response(request)
+
+@api_router.get("/llm-cache/stats")
+async def get_llm_cache_stats():
+    """Hit/miss counters for the LLM section cache"""
+    return llm_cache.stats()
+
+@api_router.get("/scoring-model")
+async def get_scoring_model():
+    """Version and source of the active scoring model, and reload errors"""
+    return scoring_models.stats()
+
+@api_router.get("/predictor")
+async def get_predictor():
+    """Trained predictor in use (or why not) and its micro-batching statistics"""
+    if not predictor:
+        return {"backend": "scoring_model", "version": scoring_models.model.version, "load_error": predictor_load_error}
+    return {**predictor.stats(), "batching": predictor_batcher.stats()}
+
+@api_router.get("/idempotency/stats")
+async def get_idempotency_stats():
+    """Pipeline runs in flight and how many duplicate submissions joined one"""
+    return {"enabled": IDEMPOTENCY_ENABLED, "window_seconds": IDEMPOTENCY_WINDOW_SECONDS, **assessment_flights.stats()}
+
+@api_router.get("/llm-limiter/stats")
+async def get_llm_limiter_stats():
+    """In-flight calls, queue depth and wait times for the LLM concurrency limiter"""
+    return llm_limiter.stats()
+
+@api_router.get("/llm-resilience/stats")
+async def get_llm_resilience_stats():
+    """Circuit breaker state and hedged-call win rate for the LLM calls"""
+    return {"breaker": llm_breaker.stats(), "hedging": llm_hedging.stats()}
+
+@api_router.get("/assessment-writer/stats")
+async def get_assessment_writer_stats():
+    """Buffer depth, flush size and flush latency for write-behind persistence"""
+    return {"enabled": ASSESSMENT_WRITE_BEHIND, **assessment_writer.stats()}
+
+@api_router.get("/health/ready")
+async def readiness():
+    """Ready when MongoDB answers a ping; includes connection pool statistics"""
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(mongo.ping(), timeout=HEALTH_PING_TIMEOUT)
+    except Exception as e:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "unavailable", "error": str(e) or type(e).__name__, "pool": mongo.stats()}
+        )
+    ready = {"status": "ready", "ping_ms": round((time.perf_counter() - started) * 1000, 2), "pool": mongo.stats()}
+    if failed_indexes:
+        ready["index_errors"] = failed_indexes
+    return ready
 
 @api_router.get("/")
 async def root():
     return {"message": "SheHuMaan API - Supporting Women in IT", "status": "active"}
 
+async def publish_shared_content() -> None:
+    try:
+        await shared_content.publish()
+    except Exception as e:
+        # Compact documents keep static content inline until a later retry publishes it
+        logger.warning(f"Could not publish shared content: {str(e)}")
+
+INDEX_SETUP = {
+    "llm_cache": lambda: llm_cache.ensure_indexes(),
+    "assessment_jobs": lambda: assessment_jobs.ensure_indexes(),
+    "assessment_history": lambda: assessment_history.ensure_indexes(db.assessments),
+    "idempotency": lambda: idempotency.ensure_indexes(db.idempotency_keys),
+    "cohort_rollups": lambda: cohort_rollups.ensure_indexes(db.assessment_rollups),
+}
+failed_indexes: Dict[str, str] = {}  # INDEX_SETUP name -> last error
+
+async def ensure_indexes(names) -> None:
+    """Create each group of indexes on its own, so one failure doesn't skip the rest"""
+    names = list(names)
+    for i, name in enumerate(names):
+        try:
+            await INDEX_SETUP[name]()
+            failed_indexes.pop(name, None)
+        except ConnectionFailure as e:
+            # MongoDB is unreachable: the other groups would each wait out the server selection timeout
+            failed_indexes.update(dict.fromkeys(names[i:], str(e) or type(e).__name__))
+            logger.warning(f"Could not create {', '.join(names[i:])} indexes: {str(e)}")
+            return
+        except Exception as e:
+            failed_indexes[name] = str(e) or type(e).__name__
+            logger.warning(f"Could not create {name} indexes: {str(e)}")
+
+async def retry_startup_setup(interval: float) -> None:
+    """Retry what MongoDB being unavailable at startup left undone: connecting, index groups, shared content"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            mongo.connect()
+        except Exception as e:
+            logger.warning(f"Could not connect to MongoDB: {str(e)}")
+            continue
+        if failed_indexes:
+            await ensure_indexes(failed_indexes)
+        if not shared_content.published:
+            await publish_shared_content()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        mongo.connect()
+        await mongo.warm_up(MONGO_WARM_CONNECTIONS)
+        logger.info(f"MongoDB connected, {mongo.stats()['open']} pooled connections")
+    except Exception as e:
+        # Keep serving; /api/health/ready reports unavailable until MongoDB answers. Creating indexes
+        # and publishing would only wait out the server selection timeout again, so both are left
+        # to the background retry
+        logger.error(f"MongoDB warm-up failed: {str(e)}")
+        failed_indexes.update(dict.fromkeys(INDEX_SETUP, f"MongoDB unavailable at startup: {str(e) or type(e).__name__}"))
+    else:
+        # Failures are retried in the background; /api/health/ready reports them
+        await ensure_indexes(INDEX_SETUP)
+        await publish_shared_content()
+    
+    if ASSESSMENT_WRITE_BEHIND:
+        await assessment_writer.start()
+    
+    if predictor_batcher:
+        predictor_batcher.start()
+    
+    if ASSESSMENT_JOB_WORKERS > 0:
+        job_pool.start()
+    
+    metrics_collector = asyncio.create_task(metrics_registry.collect_forever(METRICS_COLLECT_INTERVAL))
+    model_watcher = asyncio.create_task(scoring_models.watch(SCORING_MODEL_RELOAD_INTERVAL)) if SCORING_MODEL_RELOAD_INTERVAL > 0 else None
+    setup_retrier = asyncio.create_task(retry_startup_setup(INDEX_RETRY_INTERVAL))
+    
+    yield
+    
+    # Open requests are finished by now; analyze runs whose client went away may still be going
+    unfinished = await assessment_flights.drain(SHUTDOWN_GRACE_SECONDS)
+    if unfinished:
+        logger.warning(f"Shutting down with {unfinished} assessments still running")
+    metrics_collector.cancel()
+    if model_watcher:
+        model_watcher.cancel()
+    setup_retrier.cancel()
+    await job_pool.stop(grace_seconds=SHUTDOWN_GRACE_SECONDS)
+    if predictor_batcher:
+        await predictor_batcher.close()
+    if rollup_tasks:
+        await asyncio.wait(rollup_tasks, timeout=SHUTDOWN_GRACE_SECONDS)
+    if ASSESSMENT_WRITE_BEHIND:
+        await assessment_writer.close()
+    mongo.close()
+
+# Create the main app
+app = FastAPI(lifespan=lifespan)
+
 app.include_router(api_router)
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Pipeline metrics in Prometheus text format"""
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.exception_handler(LlmQueueFull)
+async def llm_queue_full_handler(request: Request, exc: LlmQueueFull):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many assessments in progress, please retry shortly"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(WriteBehindFull)
+async def write_behind_full_handler(request: Request, exc: WriteBehindFull):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many assessments waiting to be saved, please retry shortly"},
+        headers={"Retry-After": str(math.ceil(WRITE_BEHIND_FLUSH_INTERVAL))}
+    )
+
 # app.add_middleware(
 #     CORSMiddleware,
 #     allow_credentials=True,
@@ -519,6 +1942,3 @@ app.add_middleware(
 # )
 # logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
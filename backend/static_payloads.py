@@ -0,0 +1,38 @@
+"""Pre-serialized JSON payloads served with strong ETags.
+
+A ``StaticPayload`` is encoded once, when it is built, and hashed into a
+strong ETag. ``response`` answers a conditional GET whose ``If-None-Match``
+lists that tag (or ``*``) with an empty 304, and everything else with the
+stored bytes, so a request never touches the JSON encoder.
+"""
+import hashlib
+import json
+from typing import Any
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+
+class StaticPayload:
+    def __init__(self, content: Any, max_age: int = 3600):
+        self.body = json.dumps(jsonable_encoder(content), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.headers = {
+            "ETag": self.etag,
+            "Cache-Control": f"public, max-age={max_age}",
+        }
+
+    def matches(self, if_none_match: str) -> bool:
+        # If-None-Match uses the weak comparison, so W/"x" matches "x"
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*" or tag.removeprefix("W/") == self.etag:
+                return True
+        return False
+
+    def response(self, request: Request) -> Response:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and self.matches(if_none_match):
+            return Response(status_code=304, headers=self.headers)
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
@@ -0,0 +1,107 @@
+"""Tolerant parsing of the single JSON document returned in structured generation mode.
+
+Models wrap JSON in markdown fences, add a sentence before it, leave trailing
+commas or get cut off mid-document. ``extract_json`` makes one pass over the
+text, dropping whitespace and trailing commas outside strings and remembering
+the last point where every open value was complete. If the text ends early,
+the document is cut back to that point and the open brackets are closed, so
+the sections that did arrive in full can still be used.
+
+A fenced ```json block is tried first, since the text around it may contain
+braces of its own. Otherwise, or if the block holds nothing usable, parsing
+starts at each ``{`` in turn until one of them yields an object.
+"""
+import json
+import re
+from typing import Any, Dict, Optional
+
+_CLOSERS = {"{": "}", "[": "]"}
+_JSON_FENCE = re.compile(r"```json[ \t]*\n(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)  # unclosed if cut off
+
+
+def extract_json(text: str) -> Optional[Any]:
+    """Parse the JSON object in ``text``, repairing it if needed; None if nothing usable"""
+    fence = _JSON_FENCE.search(text)
+    if fence:
+        block = fence.group(1)
+        start = block.find("{")
+        parsed = _parse_from(block, start) if start >= 0 else None
+        if parsed is not None:
+            return parsed
+
+    start = text.find("{")
+    while start >= 0:
+        parsed = _parse_from(text, start)
+        if parsed is not None:
+            return parsed
+        start = text.find("{", start + 1)
+    return None
+
+
+def _parse_from(text: str, start: int) -> Optional[Any]:
+    out = []
+    stack = []
+    in_string = False
+    escaped = False
+    pending_comma = False
+    safe_point = None  # (len(out), open brackets) after the last complete value
+
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch in " \t\r\n":
+            continue
+
+        if pending_comma:
+            pending_comma = False
+            if ch not in "}]":
+                out.append(",")
+
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            stack.append(ch)
+            out.append(ch)
+        elif ch in "}]":
+            if not stack or _CLOSERS[stack[-1]] != ch:
+                break
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                return _loads("".join(out))
+            safe_point = (len(out), tuple(stack))
+        elif ch == ",":
+            safe_point = (len(out), tuple(stack))
+            pending_comma = True
+        else:
+            out.append(ch)
+
+    # Truncated or malformed: keep everything up to the last complete value
+    if safe_point is None:
+        return None
+    length, open_brackets = safe_point
+    repaired = "".join(out[:length]) + "".join(_CLOSERS[b] for b in reversed(open_brackets))
+    return _loads(repaired)
+
+
+def _loads(document: str) -> Optional[Any]:
+    try:
+        # strict=False accepts raw newlines inside strings, which models emit in emails
+        return json.loads(document, strict=False)
+    except ValueError:
+        return None
+
+
+def parse_structured_response(text: str) -> Dict[str, Any]:
+    """The parsed top-level object, or an empty dict if the response held no usable JSON"""
+    parsed = extract_json(text or "")
+    return parsed if isinstance(parsed, dict) else {}
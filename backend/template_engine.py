@@ -0,0 +1,285 @@
+"""Deterministic, template-based assessment sections and the generation routing policy.
+
+The template engine assembles the same sections the LLM stages produce (the
+explanation, a 7-day plan and the workplace suggestions and emails) from
+curated fragments chosen by the scoring model's stressor rule keys
+(``prediction["stressor_keys"]``).
+It needs no network call and returns in microseconds, and the same inputs
+always give the same text.
+
+``route`` picks how an assessment's sections are generated from its highest
+risk band (stress, burnout or safety) and a policy such as
+``low=template,medium=hybrid,high=llm``:
+
+- ``template``: every section comes from the engine.
+- ``hybrid``: the LLM writes only the explanation; the plan and the workplace
+  section come from the engine.
+- ``llm``: every section is generated by the LLM, as before.
+
+Sections are returned as plain dicts; ``server.py`` wraps plan days in
+``DayPlan``.
+"""
+from typing import Any, Dict, List, Sequence
+
+ROUTES = ("template", "hybrid", "llm")
+BAND_ORDER = {"low": 0, "medium": 1, "high": 2}
+
+# Curated fragments per stressor rule key (scoring_models/*.json), in the voice
+# of the LLM prompts: supportive, never diagnostic
+FRAGMENTS: Dict[str, Dict[str, str]] = {
+    "long_work_hours": {
+        "why": "long working days that leave little time to recover",
+        "habit": "Write down a fixed end time for your day each morning",
+        "boundary": "Log off at your planned end time, even if one task is unfinished",
+        "flex": "Agree on core hours with your team and protect time outside them",
+        "manager": "I have been regularly working beyond my scheduled hours, and I would like to agree on which deliverables can move so my days stay sustainable.",
+        "hr": "I would like to understand the policies on working hours and overtime compensation.",
+    },
+    "insufficient_sleep": {
+        "why": "not getting enough sleep, which can make everything else feel heavier",
+        "habit": "Put screens away 30 minutes before bed",
+        "boundary": "No work messages after dinner",
+        "flex": "Ask to avoid early-morning meetings on days after late releases",
+        "manager": "Late-evening work has been cutting into my rest, and I would like to discuss keeping meetings and handoffs within regular hours.",
+        "hr": "I would like to know whether flexible start times are available.",
+    },
+    "high_workload": {
+        "why": "a heavy workload with many things competing for your attention",
+        "habit": "Pick the three tasks that matter most before opening email",
+        "boundary": "Say 'let me check my priorities' before accepting new work",
+        "flex": "Request a workload prioritization meeting",
+        "manager": "I am currently managing more parallel work than I can do well, and I would value your help prioritizing it.",
+        "hr": "I would like guidance on how workload concerns are usually raised and supported.",
+    },
+    "high_deadline_pressure": {
+        "why": "constant deadline pressure that keeps you in a rush",
+        "habit": "Add a buffer of one extra day when you estimate a task",
+        "boundary": "Flag deadline risks as soon as you see them, not on the due date",
+        "flex": "Ask for deadline extensions when scope changes",
+        "manager": "Several deadlines have been very tight, and I would like to discuss building realistic buffers into our plans.",
+        "hr": "I would like to learn about any support available for teams under sustained deadline pressure.",
+    },
+    "low_manager_support": {
+        "why": "not feeling supported by your manager",
+        "habit": "Note one thing you need from your manager this week",
+        "boundary": "Ask for decisions and feedback in writing when they affect your work",
+        "flex": "Propose a short weekly one-on-one with your manager",
+        "manager": "I would find a short regular check-in with you very helpful for staying aligned and getting timely feedback.",
+        "hr": "I would like to know what mentoring or skip-level support options are available.",
+    },
+    "poor_work_life_balance": {
+        "why": "work spilling into the time meant for yourself and your family",
+        "habit": "Schedule 20 minutes for something you enjoy, just for you",
+        "boundary": "Keep one evening this week completely free of work",
+        "flex": "Propose flexible start and end times",
+        "manager": "I would like to explore a schedule that helps me balance my work and personal commitments while keeping my output steady.",
+        "hr": "I would like to learn about flexible work arrangements and how to apply for them.",
+    },
+    "long_commute": {
+        "why": "a long commute that takes a daily toll on your energy",
+        "habit": "Use part of your commute for music, a podcast or quiet rest",
+        "boundary": "Don't start work calls until you have arrived",
+        "flex": "Request 2-3 work-from-home days per week",
+        "manager": "My commute takes a significant part of each day, and a few remote days a week would give me more focused working time.",
+        "hr": "I would like to know the eligibility criteria for hybrid or remote work.",
+    },
+    "night_shifts": {
+        "why": "night shifts that work against your body's natural rhythm",
+        "habit": "Keep your sleep window the same on workdays and days off where you can",
+        "boundary": "Protect your daytime sleep with a do-not-disturb schedule",
+        "flex": "Ask for a predictable shift roster with recovery days after night shifts",
+        "manager": "I would like to discuss a more predictable shift rotation with recovery time after night shifts.",
+        "hr": "I would like information on night-shift policies, including transport and safety arrangements.",
+    },
+    "workplace_bias": {
+        "why": "experiences of bias at work, which are not your fault and can be very draining",
+        "habit": "Keep a private, dated note of incidents and how they affected you",
+        "boundary": "Reach out to someone you trust after a difficult interaction",
+        "flex": "Ask about your organization's POSH and grievance processes",
+        "manager": "I would like to talk about some team interactions that have affected my work, so we can address them together.",
+        "hr": "I would like to understand the confidential process for raising concerns about bias or harassment.",
+    },
+    "high_family_responsibilities": {
+        "why": "significant family responsibilities alongside your job",
+        "habit": "Share one household task with someone else this week",
+        "boundary": "Block your family time in your calendar so meetings avoid it",
+        "flex": "Ask about caregiver leave and flexible hours",
+        "manager": "I have significant family commitments, and some flexibility in my schedule would help me give my best at work.",
+        "hr": "I would like to learn about caregiver support, leave and flexible-hours policies.",
+    },
+    "multiple_physical_symptoms": {
+        "why": "physical symptoms that may be your body signalling it needs rest",
+        "habit": "Drink a glass of water and stretch your neck and shoulders at lunch",
+        "boundary": "Take a proper lunch break away from your desk",
+        "flex": "Request an ergonomic review of your workstation",
+        "manager": "I would like to make a few changes to my routine and workspace to look after my health, and I would appreciate your support.",
+        "hr": "I would like to know about health benefits, ergonomic support and the employee assistance programme.",
+    },
+}
+
+GENERAL_HABITS = (
+    "Two minutes of slow breathing before your first meeting",
+    "A 10-minute walk outside during the day",
+    "Write down one thing that went well today",
+    "Eat one meal without screens",
+    "Stretch for five minutes after lunch",
+    "Call or message a friend just to catch up",
+    "Plan tomorrow's first task before logging off",
+)
+GENERAL_BOUNDARIES = (
+    "No emails after 7 PM",
+    "Mute non-urgent chat notifications for one focus block",
+    "Keep your lunch break meeting-free",
+    "Turn off work notifications on your phone this evening",
+    "Decline one meeting that doesn't need you",
+    "Leave work on time at least twice this week",
+    "Take one full day this weekend away from work",
+)
+BREAK_LADDER = (
+    "A 5-minute break every 2 hours",
+    "A 5-minute break every 90 minutes",
+    "A 5-minute stretch every hour",
+    "A 5-minute stretch every hour and a 10-minute walk after lunch",
+    "Hourly stretches, a 10-minute walk after lunch and eyes off the screen every 20 minutes",
+    "Keep your hourly breaks and add a 15-minute afternoon pause",
+    "Keep the breaks that worked best for you this week",
+)
+DAILY_MESSAGES = (
+    "Small steps count. Starting is the hardest part.",
+    "You are allowed to go at your own pace.",
+    "Noticing how you feel is already progress.",
+    "Halfway through the week. Be proud of showing up for yourself.",
+    "Rest is part of doing good work, not a reward for it.",
+    "Look back at what has become a little easier.",
+    "You've built new habits this week. Keep the ones that helped.",
+)
+GENERAL_FLEX_SUGGESTIONS = (
+    "Request 2-3 WFH days per week",
+    "Propose flexible start/end times",
+    "Request workload prioritization meeting",
+    "Ask for deadline extensions when needed",
+)
+
+OPENINGS = {
+    "low": "Your results suggest that your stress and burnout levels are in a manageable range right now.",
+    "medium": "Your results suggest that you may be under a moderate amount of pressure at the moment.",
+    "high": "Your results suggest that you may be carrying a heavy load right now, and it makes sense if things feel hard.",
+}
+REASSURANCES = {
+    "low": "Keeping up the routines that already work for you is a great way to stay steady, and the plan below offers a few gentle additions.",
+    "medium": "Many women in IT go through phases like this, and small, consistent changes can make a real difference. The plan below is a gentle place to start.",
+    "high": "You don't have to change everything at once. Many women in IT have been where you are, and reaching out for support can make a real difference. The plan below starts with small, manageable steps.",
+}
+
+SLEEP_TARGET_HOURS = 7.5
+SLEEP_STEP_MINUTES = 15  # added per day, and the granularity sleep goals are rounded to
+FLEX_SUGGESTIONS = 4
+EMAIL_REQUESTS = 2
+
+
+def highest_band(prediction: Dict[str, Any]) -> str:
+    bands = (prediction["stress_level"], prediction["burnout_risk"], prediction["safety_risk"])
+    return max(bands, key=BAND_ORDER.__getitem__)
+
+
+def parse_routes(spec: str) -> Dict[str, str]:
+    """'low=template,medium=hybrid,high=llm' -> {band: route}; unlisted bands use the LLM"""
+    routes = dict.fromkeys(BAND_ORDER, "llm")
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        band, _, route = part.partition("=")
+        band, route = band.strip(), route.strip()
+        if band not in BAND_ORDER or route not in ROUTES:
+            raise ValueError(f"Invalid generation route: {part}")
+        routes[band] = route
+    return routes
+
+
+def route(prediction: Dict[str, Any], routes: Dict[str, str]) -> str:
+    return routes[highest_band(prediction)]
+
+
+def _fragments(stressor_keys: Sequence[str]) -> List[Dict[str, str]]:
+    return [FRAGMENTS[key] for key in stressor_keys if key in FRAGMENTS]
+
+
+def _pick(preferred: Sequence[str], general: Sequence[str], n: int) -> List[str]:
+    """The first n of ``preferred`` then ``general``, without repeats"""
+    return list(dict.fromkeys([*preferred, *general]))[:n]
+
+
+def _join(parts: Sequence[str]) -> str:
+    return parts[0] if len(parts) == 1 else f"{', '.join(parts[:-1])} and {parts[-1]}"
+
+
+def _sleep_minutes(hours: float) -> int:
+    """Hours as whole minutes, rounded to the nearest SLEEP_STEP_MINUTES"""
+    return int(round(hours * 60 / SLEEP_STEP_MINUTES)) * SLEEP_STEP_MINUTES
+
+
+def _hours(minutes: int) -> str:
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} hours" if not minutes else f"{hours} h {minutes} min"
+
+
+def explanation(prediction: Dict[str, Any], stressor_keys: Sequence[str]) -> str:
+    band = max(prediction["stress_level"], prediction["burnout_risk"], key=BAND_ORDER.__getitem__)
+    reasons = [f["why"] for f in _fragments(stressor_keys)[:3]]
+    if reasons:
+        why = f"This may be linked to {_join(reasons)}."
+    else:
+        why = "No single factor stands out, which often means small everyday habits are what keep things steady."
+    return f"{OPENINGS[band]} {why} {REASSURANCES[band]}"
+
+
+def daily_plan(stressor_keys: Sequence[str], sleep_hours: float) -> List[Dict[str, Any]]:
+    """A 7-day plan that builds up: sleep moves towards the target and breaks add up day by day
+
+    Once the sleep target is reached, the remaining days keep the bedtime steady instead.
+    """
+    fragments = _fragments(stressor_keys)
+    habits = _pick([f["habit"] for f in fragments], GENERAL_HABITS, 7)
+    boundaries = _pick([f["boundary"] for f in fragments], GENERAL_BOUNDARIES, 7)
+    current = _sleep_minutes(sleep_hours)
+    target = max(current, _sleep_minutes(SLEEP_TARGET_HOURS))
+
+    days = []
+    reached = current >= target
+    for day in range(1, 8):
+        goal = min(target, current + SLEEP_STEP_MINUTES * day)
+        if reached:
+            sleep_goal = f"Keep a consistent bedtime and wake-up time for {_hours(target)} of sleep"
+        else:
+            sleep_goal = f"{_hours(goal)}, lights out {goal - current} min earlier"
+            reached = goal >= target
+        days.append({
+            "day": day,
+            "sleep_goal": sleep_goal,
+            "breaks": BREAK_LADDER[day - 1],
+            "habit": habits[day - 1],
+            "boundary": boundaries[day - 1],
+            "message": DAILY_MESSAGES[day - 1],
+        })
+    return days
+
+
+def workplace(stressor_keys: Sequence[str]) -> Dict[str, Any]:
+    fragments = _fragments(stressor_keys)
+    requests = [f["manager"] for f in fragments[:EMAIL_REQUESTS]] or [
+        "I would like to discuss my current workload and how we can keep it sustainable."
+    ]
+    questions = [f["hr"] for f in fragments[:EMAIL_REQUESTS]] or [
+        "I would like to learn about the flexible work arrangements available at our organization."
+    ]
+    return {
+        "flex_suggestions": _pick([f["flex"] for f in fragments], GENERAL_FLEX_SUGGESTIONS, FLEX_SUGGESTIONS),
+        "email_to_manager": (
+            "Dear [Manager Name],\n\nI hope you are doing well. I wanted to share how things are going for me and ask for your support.\n\n"
+            + " ".join(requests)
+            + "\n\nWould you have time for a short conversation this week? I am confident we can find an approach that works for the team and for me.\n\nThank you for your support.\n\nBest regards"
+        ),
+        "email_to_hr": (
+            "Dear HR Team,\n\nI am writing to ask about the support available to employees.\n\n"
+            + " ".join(questions)
+            + "\n\nPlease let me know the process and any documentation required. I would appreciate this being kept confidential.\n\nThank you for your time.\n\nSincerely"
+        ),
+    }
@@ -0,0 +1,116 @@
+"""Train a risk-score predictor on stored assessments and export it for PREDICTOR_PATH.
+
+Reads questionnaires and labels from the ``assessments`` collection. Labels
+come from ``outcome.<score>`` (labelled outcomes recorded after the fact) by
+default; ``--labels scores`` trains on the stored scores instead, which only
+reproduces the scoring model and is meant for trying the pipeline out. The
+features are the active scoring model's feature definitions, copied into
+the artifact so later scoring model edits don't change what it sees.
+
+    cd backend && python train_predictor.py --out scoring_models/predictor.joblib
+    cd backend && python train_predictor.py --format onnx --out scoring_models/predictor.onnx
+
+Needs scikit-learn and joblib; ``--format onnx`` also needs skl2onnx and onnx.
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+from pydantic import ValidationError
+
+from compact_storage import decode_questionnaire
+from scoring import columns_from_questionnaires, feature_matrix
+from server import QuestionnaireInput, db, logger, mongo, scoring_models
+
+
+def build_estimator(kind: str, seed: int):
+    from sklearn.ensemble import HistGradientBoostingRegressor
+    from sklearn.linear_model import Ridge
+    from sklearn.multioutput import MultiOutputRegressor
+
+    if kind == "ridge":
+        return Ridge(alpha=1.0)
+    return MultiOutputRegressor(HistGradientBoostingRegressor(max_iter=200, random_state=seed))
+
+
+async def load_training_rows(labels: str, targets, limit: int):
+    """Questionnaires and their (rows x targets) label matrix; documents missing a label are skipped"""
+    prefix = "outcome." if labels == "outcome" else ""
+    query = {"questionnaire": {"$exists": True}, **{f"{prefix}{name}": {"$type": "number"} for name in targets}}
+    projection = {"_id": 0, "questionnaire": 1, **{f"{prefix}{name}": 1 for name in targets}}
+    questionnaires, y, skipped = [], [], 0
+    async for doc in db.assessments.find(query, projection).limit(limit):
+        try:
+            questionnaires.append(QuestionnaireInput.model_validate(decode_questionnaire(doc["questionnaire"])))
+        except ValidationError:
+            skipped += 1
+            continue
+        source = doc["outcome"] if labels == "outcome" else doc
+        y.append([float(source[name]) for name in targets])
+    if skipped:
+        logger.warning(f"Skipped {skipped} assessments with questionnaires that no longer validate")
+    return questionnaires, np.array(y, dtype=np.float64).reshape(len(y), len(targets))
+
+
+def export_onnx(estimator, n_features: int, metadata, out: Path) -> None:
+    from skl2onnx import to_onnx
+
+    onnx_model = to_onnx(estimator, np.zeros((1, n_features), dtype=np.float32), target_opset=17)
+    entry = onnx_model.metadata_props.add()
+    entry.key, entry.value = "predictor", json.dumps(metadata)
+    out.write_bytes(onnx_model.SerializeToString())
+
+
+async def main(out: Path, labels: str, estimator_kind: str, fmt: str, version: str, limit: int,
+               test_fraction: float, seed: int) -> None:
+    mongo.connect()
+    model = scoring_models.model
+    targets = model.score_names
+    questionnaires, y = await load_training_rows(labels, targets, limit)
+    mongo.close()
+    if len(questionnaires) < 10:
+        raise SystemExit(f"Only {len(questionnaires)} labelled assessments found, not enough to train on")
+
+    features = model.features
+    X = feature_matrix(features, columns_from_questionnaires(questionnaires, dict.fromkeys(f["field"] for f in features)))
+    order = np.random.default_rng(seed).permutation(len(X))
+    n_test = int(len(X) * test_fraction)
+    test, train = order[:n_test], order[n_test:]
+
+    estimator = build_estimator(estimator_kind, seed)
+    estimator.fit(X[train], y[train])
+    if n_test:
+        predicted = np.clip(np.trunc(estimator.predict(X[test])), 0, 100)
+        for j, score in enumerate(model.scores):
+            mae = np.abs(predicted[:, j] - y[test, j]).mean()
+            same_band = np.mean([model.band(score["name"], p) == model.band(score["name"], t)
+                                 for p, t in zip(predicted[:, j], y[test, j])])
+            logger.info(f"{score['name']}: MAE {mae:.2f}, band agreement {same_band:.1%} on {n_test} held-out rows")
+
+    version = version or f"{estimator_kind}-{labels}-{datetime.now(timezone.utc):%Y%m%d%H%M}"
+    metadata = {"version": version, "features": features, "targets": targets}
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "onnx":
+        export_onnx(estimator, len(features), metadata, out)
+    else:
+        import joblib
+        joblib.dump({**metadata, "estimator": estimator}, out)
+    logger.info(f"Trained {version} on {len(train)} assessments, written to {out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and export a risk-score predictor")
+    parser.add_argument("--out", type=Path, required=True, help=".joblib or .onnx path")
+    parser.add_argument("--labels", choices=["outcome", "scores"], default="outcome")
+    parser.add_argument("--estimator", choices=["gbrt", "ridge"], default="gbrt")
+    parser.add_argument("--format", choices=["joblib", "onnx"], help="default: from the --out suffix")
+    parser.add_argument("--version", default="", help="default: <estimator>-<labels>-<UTC timestamp>")
+    parser.add_argument("--limit", type=int, default=0, help="max assessments to read (0 = all)")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    fmt = args.format or ("onnx" if args.out.suffix == ".onnx" else "joblib")
+    asyncio.run(main(args.out, args.labels, args.estimator, fmt, args.version, args.limit, args.test_fraction, args.seed))
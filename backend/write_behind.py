@@ -0,0 +1,337 @@
+"""Write-behind buffered persistence with a crash-safe journal.
+
+``submit`` appends the document to an on-disk journal segment and to an
+in-memory buffer, then returns; a background task flushes the buffer with
+``insert_many(ordered=False)`` once ``batch_size`` documents are pending or
+``flush_interval`` seconds have passed. When the buffer holds ``max_buffer``
+documents, new ones are kept only in the journal and read back from disk at
+the next flush, so memory stays bounded under a slow database. Without a
+journal, ``submit`` raises ``WriteBehindFull`` instead once ``max_buffer``
+documents are buffered or being inserted.
+
+Each segment is deleted only after its documents are written. Segments are
+held under an exclusive ``flock`` by the process that owns them; on start, a
+writer replays every segment it can lock, i.e. the ones left behind by a
+crashed process. A segment whose flush failed is closed (and so unlocked)
+until the next flush retries it, which a writer starting meanwhile may replay
+first. Documents get a client-side ``_id`` before they are journaled, so a
+replay of an already-written segment only produces duplicate key errors,
+which are ignored.
+
+A database that is unavailable is retried for as long as it takes. Documents
+it rejects (e.g. failing validation) are retried ``max_attempts`` times: a
+segment's rejected documents are then moved to the ``dead-letter``
+directory next to the journal, and without a journal they are dropped. Either
+way they are logged with their ``_id``.
+
+With ``fsync``, the fsync runs in the default executor so it doesn't block
+the event loop.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+DEAD_LETTER_DIR = "dead-letter"
+
+
+class WriteBehindFull(Exception):
+    """The in-memory buffer holds ``max_buffer`` documents and there is no journal to spill to"""
+
+
+class _Segment:
+    """An append-only journal file, locked for as long as it is open"""
+
+    def __init__(self, path: Path, create: bool = True):
+        self.path = path
+        # Reopening an existing segment must not recreate one another process replayed and deleted
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | (os.O_CREAT if create else 0), 0o666)
+        self.file = open(fd, "a", encoding="utf-8")
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.file.close()
+            raise
+
+    def append(self, doc: Dict[str, Any]) -> None:
+        self.file.write(json_util.dumps(doc) + "\n")
+        self.file.flush()
+
+    async def sync(self) -> None:
+        # On a duplicate descriptor, so a rotation closing the file meanwhile is harmless
+        fd = os.dup(self.file.fileno())
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, os.fsync, fd)
+        finally:
+            os.close(fd)
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self.file.close()
+
+
+def _read_segment(path: Path) -> List[Dict[str, Any]]:
+    docs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                docs.append(json_util.loads(line))
+            except ValueError:
+                # Torn final line from a crash mid-write
+                logger.warning(f"Skipping unreadable journal line in {path.name}")
+    return docs
+
+
+class WriteBehindWriter:
+    def __init__(self, collection, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_buffer: int = 10000, journal_dir: Optional[str] = None,
+                 write_concern: Optional[WriteConcern] = None, fsync: bool = False, max_attempts: int = 5):
+        self.collection = collection.with_options(write_concern=write_concern) if write_concern else collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.journal_dir = Path(journal_dir) if journal_dir else None
+        self.fsync = fsync
+        self.max_attempts = max_attempts
+
+        self._buffer: List[Dict[str, Any]] = []
+        self._spilled = 0
+        self._inserting = 0  # documents taken from the buffer by the running flush
+        self._segment: Optional[_Segment] = None
+        self._unwritten: List[Path] = []  # rotated segments whose flush failed, closed until retried
+        self._rejections: Dict[Any, int] = {}  # segment path or (without a journal) _id -> rejected attempts
+        self._sequence = 0
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.documents_written = 0
+        self.dead_lettered = 0
+        self._flush_sizes = deque(maxlen=1000)
+        self._flush_seconds = deque(maxlen=1000)
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer) + self._spilled
+
+    def _new_segment(self) -> _Segment:
+        self._sequence += 1
+        return _Segment(self.journal_dir / f"segment-{os.getpid()}-{time.time_ns()}-{self._sequence}.ndjson")
+
+    async def start(self) -> None:
+        if self.journal_dir:
+            self.journal_dir.mkdir(parents=True, exist_ok=True)
+            await self._replay_orphans()
+            self._segment = self._new_segment()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def _replay_orphans(self) -> None:
+        for path in sorted(self.journal_dir.glob("segment-*.ndjson")):
+            try:
+                segment = _Segment(path, create=False)
+            except (BlockingIOError, FileNotFoundError):
+                continue  # owned by a live process, or replayed by one just now
+            docs = _read_segment(path)
+            if await self._write_segment(segment, docs):
+                logger.info(f"Replayed {len(docs)} journaled documents from {path.name}")
+
+    async def submit(self, doc: Dict[str, Any]) -> None:
+        """Queue a document for insertion; it is durable in the journal when this returns"""
+        doc.setdefault("_id", ObjectId())
+
+        segment = self._segment
+        if not segment and len(self._buffer) + self._inserting >= self.max_buffer:
+            # Without a journal there is nowhere else to keep it
+            self._wake.set()
+            raise WriteBehindFull(f"Write-behind buffer is full ({self.max_buffer} documents)")
+
+        if segment:
+            segment.append(doc)
+        if len(self._buffer) < self.max_buffer:
+            self._buffer.append(doc)
+        else:
+            self._spilled += 1
+
+        if self.pending >= self.batch_size:
+            self._wake.set()
+        if segment and self.fsync:
+            await segment.sync()
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush failed: {str(e)}")
+
+    async def flush(self) -> None:
+        async with self._lock:
+            # Retry segments from earlier failed flushes first
+            for path in list(self._unwritten):
+                try:
+                    segment = _Segment(path, create=False)
+                except FileNotFoundError:
+                    self._unwritten.remove(path)  # replayed by a writer that started meanwhile
+                    self._rejections.pop(path, None)
+                    continue
+                except BlockingIOError:
+                    continue  # being replayed right now
+                self._unwritten.remove(path)
+                await self._write_segment(segment, _read_segment(path))
+
+            if not self.pending:
+                return
+
+            segment = self._segment
+            if segment:
+                # Opened before the buffer is taken, so a failure here leaves everything pending
+                self._segment = self._new_segment()
+            docs, spilled = self._buffer, self._spilled
+            self._buffer, self._spilled = [], 0
+            if segment and spilled:
+                docs = _read_segment(segment.path)
+
+            if segment:
+                await self._write_segment(segment, docs)
+                return
+            self._inserting = len(docs)
+            try:
+                rejected = await self._insert(docs)
+            finally:
+                self._inserting = 0
+            if rejected is None:
+                # No journal: keep the documents in memory for the next attempt
+                self._buffer = docs + self._buffer
+            elif rejected:
+                self._buffer = self._retry_rejected(rejected) + self._buffer
+
+    async def _write_segment(self, segment: _Segment, docs: List[Dict[str, Any]]) -> bool:
+        """Insert a locked segment's documents; True once it is deleted, else it joins ``_unwritten``"""
+        rejected = await self._insert(docs) if docs else []
+        if rejected == []:
+            self._rejections.pop(segment.path, None)
+            segment.remove()
+            return True
+        if rejected:
+            attempts = self._rejections[segment.path] = self._rejections.get(segment.path, 0) + 1
+            if attempts >= self.max_attempts:
+                self._dead_letter(segment, rejected)
+                return True
+        segment.file.close()
+        self._unwritten.append(segment.path)
+        return False
+
+    def _dead_letter(self, segment: _Segment, rejected: List[Dict[str, Any]]) -> None:
+        """Keep the documents the database keeps rejecting aside; the rest of the segment was written"""
+        directory = segment.path.parent / DEAD_LETTER_DIR
+        directory.mkdir(exist_ok=True)
+        with open(directory / segment.path.name, "w", encoding="utf-8") as f:
+            f.writelines(json_util.dumps(doc) + "\n" for doc in rejected)
+        self._rejections.pop(segment.path, None)
+        segment.remove()
+        self.dead_lettered += len(rejected)
+        logger.error(
+            f"Moved {len(rejected)} documents rejected {self.max_attempts} times to {directory / segment.path.name}: "
+            f"{', '.join(str(doc['_id']) for doc in rejected)}"
+        )
+
+    def _retry_rejected(self, rejected: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rejected documents to buffer again; the ones out of attempts are dropped"""
+        retry, dropped = [], []
+        for doc in rejected:
+            attempts = self._rejections[doc["_id"]] = self._rejections.get(doc["_id"], 0) + 1
+            (dropped if attempts >= self.max_attempts else retry).append(doc)
+        for doc in dropped:
+            del self._rejections[doc["_id"]]
+        if dropped:
+            self.dead_lettered += len(dropped)
+            logger.error(
+                f"Dropped {len(dropped)} documents rejected {self.max_attempts} times: "
+                f"{', '.join(str(doc['_id']) for doc in dropped)}"
+            )
+        return retry
+
+    async def _insert(self, docs: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """The documents the database rejected (duplicates count as written), or None if it is unavailable"""
+        started = time.perf_counter()
+        rejected: List[Dict[str, Any]] = []
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+            written = len(docs)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors"):
+                logger.error(f"Write-behind flush of {len(docs)} documents failed: {str(e)}")
+                self.failed_flushes += 1
+                return None
+            # Unordered: everything without a write error was inserted
+            rejected = [docs[err["index"]] for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY]
+            if rejected:
+                logger.error(f"Write-behind flush of {len(docs)} documents: {len(rejected)} rejected: {str(e)}")
+                self.failed_flushes += 1
+            written = e.details.get("nInserted", 0)
+        except Exception as e:
+            logger.error(f"Write-behind flush of {len(docs)} documents failed: {str(e)}")
+            self.failed_flushes += 1
+            return None
+
+        self.flushes += 1
+        self.documents_written += written
+        self._flush_sizes.append(len(docs))
+        self._flush_seconds.append(time.perf_counter() - started)
+        return rejected
+
+    async def close(self) -> None:
+        """Stop the flush loop and write out everything still pending"""
+        self._closing = True
+        self._wake.set()
+        if self._task:
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if self._segment and not self.pending:
+            self._segment.remove()
+            self._segment = None
+
+    def stats(self) -> Dict[str, Any]:
+        sizes, seconds = list(self._flush_sizes), list(self._flush_seconds)
+        return {
+            "pending": self.pending,
+            "buffered": len(self._buffer),
+            "spilled_to_journal": self._spilled,
+            "unwritten_segments": len(self._unwritten),
+            "dead_lettered": self.dead_lettered,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "documents_written": self.documents_written,
+            "flush_size": {
+                "avg": sum(sizes) / len(sizes) if sizes else 0.0,
+                "max": max(sizes) if sizes else 0,
+            },
+            "flush_seconds": {
+                "avg": sum(seconds) / len(seconds) if seconds else 0.0,
+                "max": max(seconds) if seconds else 0.0,
+            },
+        }
@@ -1,6 +1,7 @@
 import requests
 import sys
 import json
+import time
 from datetime import datetime
 
 class SheHuMaanAPITester:
@@ -199,6 +200,69 @@ class SheHuMaanAPITester:
         except Exception as e:
             self.log_test("Assessment Analysis", False, f"Error: {str(e)}")
 
+    def test_assessment_analyze_stream(self):
+        """Test the streaming (NDJSON) assessment endpoint"""
+        try:
+            questionnaire = self.create_sample_questionnaire()
+            
+            print("🔍 Testing Streaming Assessment Analysis...")
+            response = requests.post(
+                f"{self.api_url}/assessment/analyze/stream",
+                json=questionnaire,
+                timeout=30,
+                stream=True,
+                headers={'Content-Type': 'application/json'}
+            )
+            
+            if response.status_code != 200:
+                self.log_test("Streaming Assessment Analysis", False, f"Status: {response.status_code}")
+                return
+            
+            events = [json.loads(line) for line in response.iter_lines() if line]
+            names = [event.get('event') for event in events]
+            
+            expected_sections = {"explanation", "daily_plan", "workplace"}
+            success = (
+                names[:1] == ["scores"]
+                and names[-1:] == ["complete"]
+                and expected_sections.issubset(names)
+                and bool(events[-1].get('data', {}).get('id'))
+            )
+            self.log_test("Streaming Assessment Analysis", success, f"Events: {names}")
+            
+        except requests.exceptions.Timeout:
+            self.log_test("Streaming Assessment Analysis", False, "Request timeout (>30s) - AI generation may be slow")
+        except Exception as e:
+            self.log_test("Streaming Assessment Analysis", False, f"Error: {str(e)}")
+
+    def test_assessment_job(self):
+        """Test the asynchronous job mode: create a job and poll it to completion"""
+        try:
+            questionnaire = self.create_sample_questionnaire()
+            
+            print("🔍 Testing Assessment Job (polling for up to 60 seconds)...")
+            response = requests.post(f"{self.api_url}/assessment/jobs", json=questionnaire, timeout=10)
+            if response.status_code != 202:
+                self.log_test("Assessment Job", False, f"Create status: {response.status_code}")
+                return
+            
+            job = response.json()
+            if 'stress_score' not in job.get('result', {}):
+                self.log_test("Assessment Job", False, "Scores missing from job creation response")
+                return
+            
+            for _ in range(30):
+                time.sleep(2)
+                job = requests.get(f"{self.api_url}/assessment/jobs/{job['job_id']}", timeout=10).json()
+                if job.get('status') in ('completed', 'failed'):
+                    break
+            
+            success = job.get('status') == 'completed' and len(job.get('result', {}).get('daily_plan', [])) == 7
+            self.log_test("Assessment Job", success, f"Status: {job.get('status')}, attempts: {job.get('attempts')}")
+            
+        except Exception as e:
+            self.log_test("Assessment Job", False, f"Error: {str(e)}")
+
     def test_invalid_assessment_data(self):
         """Test assessment endpoint with invalid data"""
         try:
@@ -234,6 +298,8 @@ class SheHuMaanAPITester:
         
         # Test main functionality
         self.test_assessment_analyze()
+        self.test_assessment_analyze_stream()
+        self.test_assessment_job()
         self.test_invalid_assessment_data()
         
         # Print summary
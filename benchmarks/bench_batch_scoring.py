@@ -0,0 +1,119 @@
+"""Throughput of the vectorized batch scorer vs. the scalar simulate_prediction path.
+
+Checks that both paths agree on a random sample first, then times the batch
+scorer at 1k, 100k and 1M rows.
+
+    python benchmarks/bench_batch_scoring.py [--rows 1000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import server  # noqa: E402
+from scoring import columns_from_questionnaires  # noqa: E402
+
+SYMPTOMS = ["headache", "fatigue", "insomnia", "back pain", "anxiety"]
+
+
+def random_columns(n, rng):
+    columns = {
+        "work_hours_per_day": rng.integers(4, 15, n),
+        "sleep_hours": rng.integers(6, 20, n) / 2,
+        "commute_time_minutes": rng.integers(0, 121, n),
+        "workload_level": rng.integers(1, 11, n),
+        "deadline_pressure": rng.integers(1, 11, n),
+        "manager_support": rng.integers(1, 11, n),
+        "team_support": rng.integers(1, 11, n),
+        "career_growth": rng.integers(1, 11, n),
+        "work_life_balance": rng.integers(1, 11, n),
+        "stress_level": rng.integers(1, 11, n),
+        "night_shifts": rng.random(n) < 0.2,
+        "workplace_bias_experienced": rng.random(n) < 0.15,
+        "anxiety_frequency": rng.choice(["rarely", "sometimes", "often", "always"], n),
+        "burnout_feeling": rng.choice(["none", "mild", "moderate", "severe"], n),
+        "family_responsibilities": rng.choice(["low", "medium", "high"], n),
+        "safety_concerns": rng.choice(["none", "minor", "moderate", "major"], n),
+    }
+    counts = rng.integers(0, len(SYMPTOMS) + 1, n)
+    symptoms = np.empty(n, dtype=object)
+    symptoms[:] = [SYMPTOMS[:c] for c in counts.tolist()]
+    columns["physical_symptoms"] = symptoms
+    columns["physical_symptoms_count"] = counts
+    return columns
+
+
+def random_questionnaires(n, rng):
+    columns = random_columns(n, rng)
+    rows = []
+    for i in range(n):
+        rows.append(server.QuestionnaireInput(
+            work_from_home=False,
+            flexible_hours=False,
+            posh_awareness=True,
+            social_support="fair",
+            hobbies_time="rare",
+            exercise_frequency="none",
+            age_group="25-30",
+            years_in_it=3,
+            current_role="Engineer",
+            city="Pune",
+            **{k: v[i].item() if hasattr(v[i], "item") else v[i] for k, v in columns.items() if k != "physical_symptoms_count"},
+        ))
+    return rows
+
+
+def check_parity(n, rng):
+    questionnaires = random_questionnaires(n, rng)
+    model = server.scoring_models.model
+    batch = model.score_rows(columns_from_questionnaires(questionnaires, model.fields))
+    for q, row in zip(questionnaires, batch):
+        expected = server.simulate_prediction(q)
+        expected["key_stressors"] = server.extract_key_stressors(q, expected)
+        if expected != row:
+            raise AssertionError(f"batch/scalar mismatch for {q}: {row} != {expected}")
+    print(f"parity: {n} rows identical")
+    return questionnaires
+
+
+def bench(label, fn, rows, repeat=3):
+    best = min(_timed(fn) for _ in range(repeat))
+    print(f"{label:<28} {rows:>9} rows  {best * 1000:10.2f} ms  {rows / best:14,.0f} rows/s")
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--parity-rows", type=int, default=20_000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(7)
+    model = server.scoring_models.model
+
+    questionnaires = check_parity(args.parity_rows, rng)
+
+    scalar = questionnaires[:1_000]
+    bench("scalar (per questionnaire)", lambda: [
+        server.extract_key_stressors(q, server.simulate_prediction(q)) for q in scalar
+    ], len(scalar))
+
+    for n in args.rows:
+        columns = random_columns(n, rng)
+        bench("batch score_batch", lambda: model.score_batch(columns), n)
+        bench("batch score_rows", lambda: model.score_rows(columns), n, repeat=1)
+
+
+if __name__ == "__main__":
+    main()
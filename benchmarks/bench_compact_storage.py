@@ -0,0 +1,168 @@
+"""Storage size and read cost of compact vs. plain assessment documents.
+
+Builds assessment documents the way the API does, with a mix of LLM-written
+sections (from the recorded structured responses in fixtures/), template
+sections and fallback content. It reports their BSON size in both formats
+and the per-document encode and read-side decode time. Shared content
+comes from a warm cache, as in a running server.
+
+With --mongo-url it also inserts both sets into a scratch database. It then
+reports collStats (data size, on-disk size) and the latency of reading by
+id and of a full history page.
+
+    python benchmarks/bench_compact_storage.py [--docs 5000] [--mix llm=0.6,template=0.3,fallback=0.1] [--mongo-url mongodb://localhost:27017]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+import bson
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "backend"))
+sys.path.insert(0, str(HERE))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import server  # noqa: E402
+from load_test import random_questionnaire  # noqa: E402
+
+STRUCTURED = [json.loads(line) for line in open(HERE / "fixtures" / "structured_responses.jsonl")]
+
+
+def build_docs(n, mix, rng):
+    kinds = list(mix)
+    weights = [mix[k] for k in kinds]
+    docs = []
+    for _ in range(n):
+        questionnaire = server.QuestionnaireInput(**random_questionnaire(rng))
+        prediction, stressors = server.score_questionnaire(questionnaire)
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "llm":
+            response = rng.choice(STRUCTURED)["response"]
+            sections, _ = server.parse_structured_sections(response, prediction, stressors, questionnaire)
+        elif kind == "template":
+            sections = {stage: fn(prediction, stressors, questionnaire) for stage, fn in server.TEMPLATE_SECTIONS.items()}
+        else:
+            sections = {}
+        for stage, _, default in server.LLM_STAGES:
+            sections.setdefault(stage, default(prediction, stressors, questionnaire))
+        result = server.build_assessment_result(
+            prediction, stressors, sections,
+            server.generate_safety_tips(questionnaire, prediction['safety_risk']),
+            server.get_resources(prediction, questionnaire),
+            server.build_warnings(prediction)
+        )
+        docs.append((kind, server.assessment_document(result, questionnaire, stressor_keys=prediction['stressor_keys'])))
+    return docs
+
+
+def per_doc_us(fn, items, repeat=3):
+    best = min(_timed(fn, items) for _ in range(repeat))
+    return best / len(items) * 1e6
+
+
+def _timed(fn, items):
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return time.perf_counter() - started
+
+
+async def mongo_comparison(url, plain, compact, reads):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(url)
+    database = client["bench_compact_storage"]
+    codec = server.assessment_codec
+    try:
+        print(f"\n{'MongoDB':<10} {'data MB':>9} {'storage MB':>11} {'by id p50 ms':>13} {'by id p99 ms':>13} {'page of 100 ms':>15}")
+        ids = [doc["id"] for doc in plain]
+        for name, docs in (("plain", plain), ("compact", compact)):
+            collection = database[name]
+            await collection.drop()
+            await collection.insert_many([dict(doc) for doc in docs])
+            await collection.create_index("id")
+            stats = await database.command("collStats", name)
+
+            latencies = []
+            for assessment_id in random.Random(1).choices(ids, k=reads):
+                started = time.perf_counter()
+                await codec.decode(await collection.find_one({"id": assessment_id}, {"_id": 0}))
+                latencies.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            for _ in range(20):
+                await codec.decode_many(await collection.find({}, {"_id": 0}).limit(100).to_list(100))
+            page_ms = (time.perf_counter() - started) / 20 * 1000
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            print(f"{name:<10} {stats['size'] / 1e6:>9.2f} {stats['storageSize'] / 1e6:>11.2f} {p50:>13.3f} {p99:>13.3f} {page_ms:>15.2f}")
+    finally:
+        await client.drop_database("bench_compact_storage")
+        client.close()
+
+
+def main(n, mix, mongo_url, reads):
+    from mongomock_motor import AsyncMongoMockClient
+
+    # Only shared content is written; a throwaway in-memory database is enough to publish it
+    server.mongo.connect(AsyncMongoMockClient())
+    asyncio.run(server.shared_content.publish())
+    codec = server.assessment_codec
+
+    docs = build_docs(n, mix, random.Random(20))
+    plain = [doc for _, doc in docs]
+    compact = [codec.encode(doc) for doc in plain]
+    plain_bson = [bson.encode(doc) for doc in plain]
+    compact_bson = [bson.encode(doc) for doc in compact]
+
+    decoded = asyncio.run(codec.decode_many([bson.decode(raw) for raw in compact_bson]))
+    assert decoded == [bson.decode(raw) for raw in plain_bson], "compact documents don't decode to the originals"
+
+    print(f"{n} documents, mix {mix}, compress_min_bytes {codec.compress_min_bytes}")
+    print(f"{'content':<10} {'docs':>6} {'plain B/doc':>12} {'compact B/doc':>14} {'ratio':>7}")
+    kinds = [kind for kind, _ in docs]
+    for kind in [*mix, "all"]:
+        rows = [i for i, k in enumerate(kinds) if kind in ("all", k)]
+        if not rows:
+            continue
+        before = sum(len(plain_bson[i]) for i in rows) / len(rows)
+        after = sum(len(compact_bson[i]) for i in rows) / len(rows)
+        print(f"{kind:<10} {len(rows):>6} {before:>12,.0f} {after:>14,.0f} {after / before:>7.0%}")
+
+    loop = asyncio.new_event_loop()
+    pages = [compact_bson[i:i + 100] for i in range(0, len(compact_bson), 100)]
+    encode_us = per_doc_us(codec.encode, plain)
+    plain_read_us = per_doc_us(bson.decode, plain_bson)
+    compact_read_us = per_doc_us(
+        lambda page: loop.run_until_complete(codec.decode_many([bson.decode(raw) for raw in page])), pages
+    ) / 100
+    loop.close()
+    print(f"\nencode {encode_us:.1f} us/doc; read in pages of 100 (BSON decode + codec) plain {plain_read_us:.1f} us/doc, "
+          f"compact {compact_read_us:.1f} us/doc")
+
+    if mongo_url:
+        asyncio.run(mongo_comparison(mongo_url, plain, compact, reads))
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        kind, weight = part.split("=")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("llm=0.6,template=0.3,fallback=0.1"))
+    parser.add_argument("--mongo-url", help="also compare collStats and read latency on this server")
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.docs, args.mix, args.mongo_url, args.reads)
@@ -0,0 +1,120 @@
+"""Metrics overhead on the deterministic assessment path.
+
+Times everything analyze_assessment does apart from the LLM stages
+(prediction and stressors via score_questionnaire, tips, resources,
+warnings, result, save_assessment to an in-memory null collection, response
+encoding), then times the instrumentation that path performs per request on
+its own: five clock readings and three histogram observations, plus the
+deferred bucketing of those three samples. An A/B run of the whole path is
+not used because run-to-run noise on a ~100 us path is larger than the
+effect being measured.
+
+    python benchmarks/bench_metrics_overhead.py [--requests 2000] [--repeat 30]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import timeit
+from pathlib import Path
+from types import SimpleNamespace
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+os.environ["ASSESSMENT_WRITE_BEHIND"] = "false"
+
+import server  # noqa: E402
+from metrics import Histogram  # noqa: E402
+
+
+class NullCollection:
+    async def insert_one(self, doc):
+        return None
+
+    async def bulk_write(self, operations, ordered=True):
+        return None
+
+
+QUESTIONNAIRE = server.QuestionnaireInput(
+    work_hours_per_day=10, sleep_hours=6.5, work_from_home=True, commute_time_minutes=45,
+    night_shifts=False, flexible_hours=True, workload_level=8, deadline_pressure=7,
+    manager_support=4, team_support=6, career_growth=5, work_life_balance=3, stress_level=8,
+    anxiety_frequency="often", burnout_feeling="moderate", physical_symptoms=["headache", "fatigue"],
+    family_responsibilities="high", social_support="fair", hobbies_time="rare",
+    exercise_frequency="1-2/week", workplace_bias_experienced=True, posh_awareness=True,
+    safety_concerns="moderate", age_group="25-30", years_in_it=4, current_role="Software Engineer",
+    city="Bangalore"
+)
+
+
+async def deterministic_request(questionnaire):
+    prediction, stressors = server.score_questionnaire(questionnaire)
+    sections = {stage: fallback(prediction, stressors, questionnaire) for stage, _, fallback in server.LLM_STAGES}
+    result = server.build_assessment_result(
+        prediction, stressors, sections,
+        server.generate_safety_tips(questionnaire, prediction['safety_risk']),
+        server.get_resources(prediction, questionnaire),
+        server.build_warnings(prediction)
+    )
+    doc = await server.save_assessment(result, questionnaire)
+    return server.assessment_json_response(result, doc)
+
+
+def path_us(requests, repeat):
+    loop = asyncio.new_event_loop()
+
+    async def batch():
+        for _ in range(requests):
+            await deterministic_request(QUESTIONNAIRE)
+
+    timings = [timeit.timeit(lambda: loop.run_until_complete(batch()), number=1) for _ in range(repeat)]
+    loop.close()
+    return min(timings) / requests * 1e6
+
+
+def instrumentation_us(requests, repeat):
+    histogram = Histogram("bench_seconds", "benchmark", ["stage"])
+    prediction, stressors, persist = histogram.labels("a"), histogram.labels("b"), histogram.labels("c")
+    clock = time.perf_counter
+
+    def per_request():
+        # score_questionnaire: three readings, two observations
+        started = clock()
+        scored = clock()
+        prediction.observe(scored - started)
+        stressors.observe(clock() - scored)
+        # save_assessment: two readings, one observation
+        started = clock()
+        persist.observe(clock() - started)
+
+    recording = min(timeit.repeat(per_request, number=requests, repeat=repeat)) / requests * 1e6
+    histogram.collect()
+    for _ in range(requests):
+        per_request()
+    started = time.perf_counter()
+    histogram.collect()
+    bucketing = (time.perf_counter() - started) / requests * 1e6
+    return recording, bucketing
+
+
+def main(requests, repeat):
+    server.db = SimpleNamespace(assessments=NullCollection(), assessment_rollups=NullCollection())
+    path = path_us(requests, repeat)
+    recording, bucketing = instrumentation_us(requests * 10, repeat)
+
+    print(f"deterministic path           {path:8.2f} us/request (min of {repeat} x {requests})")
+    print(f"recording (on request path)  {recording:8.3f} us/request  {recording / path * 100:5.2f}%")
+    print(f"bucketing (at collection)    {bucketing:8.3f} us/request  {bucketing / path * 100:5.2f}%")
+    print(f"total                        {recording + bucketing:8.3f} us/request  {(recording + bucketing) / path * 100:5.2f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    main(args.requests, args.repeat)
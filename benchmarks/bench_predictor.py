@@ -0,0 +1,107 @@
+"""Trained-predictor throughput: micro-batched vs. per-request inference.
+
+Trains a predictor in memory on random questionnaires labelled by the
+scoring model (plus noise), then drives it with N concurrent requests the
+way the API does: "per-request" sends every questionnaire through its own
+inference call in the thread pool, "batched" goes through the same
+MicroBatcher as predict_questionnaire. Reports requests/s and per-request
+latency at each concurrency.
+
+    python benchmarks/bench_predictor.py [--estimator gbrt ridge] [--concurrency 1 8 64 256] [--requests 4000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "backend"))
+sys.path.insert(0, str(HERE))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import server  # noqa: E402
+from bench_batch_scoring import random_questionnaires  # noqa: E402
+from predictor import MicroBatcher, SklearnPredictor  # noqa: E402
+from scoring import columns_from_questionnaires, feature_matrix  # noqa: E402
+from train_predictor import build_estimator  # noqa: E402
+
+
+def train(kind, rng, rows=20_000):
+    model = server.scoring_models.model
+    questionnaires = random_questionnaires(rows, rng)
+    columns = columns_from_questionnaires(questionnaires, model.fields)
+    scores = model.score_batch(columns)
+    y = np.column_stack([scores[name] for name in model.score_names]) + rng.normal(0, 3, (rows, len(model.score_names)))
+    estimator = build_estimator(kind, 0)
+    estimator.fit(feature_matrix(model.features, columns), y)
+    return SklearnPredictor(estimator, version=f"bench-{kind}", features=model.features, targets=model.score_names)
+
+
+def predict_many_for(predictor):
+    def predict_many(questionnaires):
+        scores = predictor.predict_batch(columns_from_questionnaires(questionnaires, predictor.fields))
+        return [dict(zip(predictor.targets, row)) for row in scores.tolist()]
+    return predict_many
+
+
+async def drive(call, questionnaires, concurrency):
+    """Requests/s and latency percentiles (ms) for ``concurrency`` clients sharing the questionnaires"""
+    latencies = []
+    position = 0
+
+    async def client():
+        nonlocal position
+        while position < len(questionnaires):
+            q = questionnaires[position]
+            position += 1
+            started = time.perf_counter()
+            await call(q)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return len(latencies) / elapsed, p50, p99
+
+
+async def run(kind, concurrencies, requests, max_batch, max_wait_ms, rng):
+    predictor = train(kind, rng)
+    predict_many = predict_many_for(predictor)
+    questionnaires = random_questionnaires(requests, rng)
+    loop = asyncio.get_running_loop()
+
+    async def per_request(q):
+        return await loop.run_in_executor(None, predict_many, [q])
+
+    batcher = MicroBatcher(predict_many, max_batch=max_batch, max_wait=max_wait_ms / 1000)
+    batcher.start()
+    await per_request(questionnaires[0])  # warm the thread pool
+
+    print(f"\n{kind}: {requests} requests, max_batch {max_batch}, max_wait {max_wait_ms} ms")
+    print(f"{'clients':>8} {'per-request/s':>14} {'p50 ms':>8} {'p99 ms':>8} {'batched/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'avg batch':>10}")
+    for concurrency in concurrencies:
+        single = await drive(per_request, questionnaires, concurrency)
+        rows_before, batches_before = batcher.rows, batcher.batches
+        batched = await drive(batcher.submit, questionnaires, concurrency)
+        avg_batch = (batcher.rows - rows_before) / max(1, batcher.batches - batches_before)
+        print(f"{concurrency:>8} {single[0]:>14,.0f} {single[1]:>8.2f} {single[2]:>8.2f} "
+              f"{batched[0]:>11,.0f} {batched[1]:>8.2f} {batched[2]:>8.2f} {avg_batch:>10.1f}")
+    await batcher.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--estimator", nargs="+", choices=["gbrt", "ridge"], default=["gbrt", "ridge"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64, 256])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--max-batch", type=int, default=server.PREDICTOR_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=server.PREDICTOR_MAX_WAIT_MS)
+    args = parser.parse_args()
+    for kind in args.estimator:
+        asyncio.run(run(kind, args.concurrency, args.requests, args.max_batch, args.max_wait_ms, np.random.default_rng(18)))
@@ -0,0 +1,187 @@
+"""Compiled scoring model vs. the hand-written simulate_prediction / extract_key_stressors.
+
+"Before" is the formula code the scoring model replaced, copied here
+verbatim. "After" is the compiled heuristic-v1 model (scoring_models/), both
+the generated single-questionnaire functions and the NumPy batch path. The
+script first checks that all three agree on every score, band and stressor
+for a random sample, then times them.
+
+    python benchmarks/bench_scoring_model.py [--parity-rows 200000] [--iterations 200000]
+"""
+import argparse
+import os
+import sys
+import time
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+import server  # noqa: E402
+from scoring import columns_from_questionnaires  # noqa: E402
+
+ANXIETY_POINTS = {"always": 25, "often": 15, "sometimes": 8, "rarely": 2}
+BURNOUT_FEELING_POINTS = {"severe": 30, "moderate": 20, "mild": 10, "none": 0}
+FAMILY_POINTS = {"high": 15, "medium": 8, "low": 3}
+SAFETY_CONCERN_POINTS = {"major": 25, "moderate": 15, "minor": 8, "none": 0}
+SYMPTOMS = ["headache", "fatigue", "insomnia", "back pain", "anxiety"]
+
+
+def legacy_simulate_prediction(questionnaire):
+    stress_factors = [
+        (questionnaire.work_hours_per_day - 8) * 5,
+        (8 - questionnaire.sleep_hours) * 8,
+        questionnaire.commute_time_minutes / 3,
+        questionnaire.workload_level * 5,
+        questionnaire.deadline_pressure * 4,
+        (10 - questionnaire.manager_support) * 3,
+        (10 - questionnaire.work_life_balance) * 4,
+        questionnaire.stress_level * 4
+    ]
+    stress_score = min(100, max(0, int(sum(stress_factors))))
+    burnout_factors = [
+        stress_score * 0.3,
+        (10 - questionnaire.career_growth) * 3,
+        (10 - questionnaire.team_support) * 2,
+        ANXIETY_POINTS.get(questionnaire.anxiety_frequency, 0),
+        BURNOUT_FEELING_POINTS.get(questionnaire.burnout_feeling, 0),
+        len(questionnaire.physical_symptoms) * 5,
+        FAMILY_POINTS.get(questionnaire.family_responsibilities, 0)
+    ]
+    burnout_score = min(100, max(0, int(sum(burnout_factors))))
+    safety_factors = [
+        20 if questionnaire.night_shifts else 0,
+        min(15, questionnaire.commute_time_minutes / 4),
+        SAFETY_CONCERN_POINTS.get(questionnaire.safety_concerns, 0),
+        10 if questionnaire.workplace_bias_experienced else 0
+    ]
+    safety_score = min(100, max(0, int(sum(safety_factors))))
+    return {
+        "stress_score": stress_score,
+        "stress_level": "high" if stress_score > 65 else "medium" if stress_score > 35 else "low",
+        "burnout_score": burnout_score,
+        "burnout_risk": "high" if burnout_score > 65 else "medium" if burnout_score > 35 else "low",
+        "safety_score": safety_score,
+        "safety_risk": "high" if safety_score > 50 else "medium" if safety_score > 25 else "low"
+    }
+
+
+def legacy_extract_key_stressors(questionnaire, prediction):
+    stressors = []
+    if questionnaire.work_hours_per_day > 9:
+        stressors.append(f"Long work hours ({questionnaire.work_hours_per_day}h/day)")
+    if questionnaire.sleep_hours < 6:
+        stressors.append(f"Insufficient sleep ({questionnaire.sleep_hours}h)")
+    if questionnaire.workload_level >= 7:
+        stressors.append("High workload")
+    if questionnaire.deadline_pressure >= 7:
+        stressors.append("High deadline pressure")
+    if questionnaire.manager_support <= 4:
+        stressors.append("Low manager support")
+    if questionnaire.work_life_balance <= 4:
+        stressors.append("Poor work-life balance")
+    if questionnaire.commute_time_minutes > 60:
+        stressors.append(f"Long commute ({questionnaire.commute_time_minutes} min)")
+    if questionnaire.night_shifts:
+        stressors.append("Night shift work")
+    if questionnaire.workplace_bias_experienced:
+        stressors.append("Workplace bias/discrimination")
+    if questionnaire.family_responsibilities == "high":
+        stressors.append("High family responsibilities")
+    if len(questionnaire.physical_symptoms) > 2:
+        stressors.append(f"Multiple physical symptoms ({', '.join(questionnaire.physical_symptoms[:3])})")
+    return stressors[:7]
+
+
+def random_questionnaires(n, rng):
+    """Inputs over (and past) the ranges the form allows, so clamping and every band are exercised"""
+    py = rng.integers
+    rows = []
+    for _ in range(n):
+        rows.append(server.QuestionnaireInput.model_construct(
+            work_hours_per_day=int(py(0, 25)), sleep_hours=float(py(0, 25)) / 2, work_from_home=False,
+            commute_time_minutes=int(py(0, 241)), night_shifts=bool(py(0, 2)), flexible_hours=False,
+            workload_level=int(py(1, 11)), deadline_pressure=int(py(1, 11)), manager_support=int(py(1, 11)),
+            team_support=int(py(1, 11)), career_growth=int(py(1, 11)), work_life_balance=int(py(1, 11)),
+            stress_level=int(py(1, 11)),
+            anxiety_frequency=str(rng.choice(["rarely", "sometimes", "often", "always", "unknown"])),
+            burnout_feeling=str(rng.choice(["none", "mild", "moderate", "severe"])),
+            physical_symptoms=SYMPTOMS[:int(py(0, len(SYMPTOMS) + 1))],
+            family_responsibilities=str(rng.choice(["low", "medium", "high"])), social_support="fair",
+            hobbies_time="rare", exercise_frequency="none", workplace_bias_experienced=bool(py(0, 2)),
+            posh_awareness=True, safety_concerns=str(rng.choice(["none", "minor", "moderate", "major"])),
+            age_group="25-30", years_in_it=3, current_role="Engineer", city="Pune",
+        ))
+    return rows
+
+
+def check_parity(model, questionnaires):
+    batch = model.score_rows(columns_from_questionnaires(questionnaires, model.fields))
+    for q, row in zip(questionnaires, batch):
+        expected = {**legacy_simulate_prediction(q), "model_version": model.version}
+        compiled = model.predict(q)
+        keys = compiled.pop("stressor_keys")  # the legacy code had labels only
+        stressors = legacy_extract_key_stressors(q, expected)
+        if compiled != expected or model.stressors(q) != stressors or len(keys) != len(stressors):
+            raise AssertionError(f"compiled/legacy mismatch for {q}: {compiled} != {expected}")
+        if row != {**expected, "stressor_keys": keys, "key_stressors": stressors}:
+            raise AssertionError(f"batch/legacy mismatch for {q}: {row}")
+    print(f"parity: {len(questionnaires)} questionnaires identical (legacy, compiled, batch)")
+
+
+def per_call_us(before, after, iterations, repeat=7):
+    """Best per-call time of each, with the runs interleaved so machine noise hits both alike"""
+    timings = {before: [], after: []}
+    for _ in range(repeat):
+        for fn in timings:
+            timings[fn].append(timeit.timeit(fn, number=iterations))
+    return [min(timings[fn]) / iterations * 1e6 for fn in (before, after)]
+
+
+def main(parity_rows, iterations):
+    model = server.scoring_models.model
+    rng = np.random.default_rng(17)
+    check_parity(model, random_questionnaires(parity_rows, rng))
+
+    q = server.QuestionnaireInput(
+        work_hours_per_day=10, sleep_hours=6.5, work_from_home=True, commute_time_minutes=45,
+        night_shifts=False, flexible_hours=True, workload_level=8, deadline_pressure=7,
+        manager_support=4, team_support=6, career_growth=5, work_life_balance=3, stress_level=8,
+        anxiety_frequency="often", burnout_feeling="moderate", physical_symptoms=["headache", "fatigue", "insomnia"],
+        family_responsibilities="high", social_support="fair", hobbies_time="rare",
+        exercise_frequency="1-2/week", workplace_bias_experienced=True, posh_awareness=True,
+        safety_concerns="moderate", age_group="25-30", years_in_it=4, current_role="Software Engineer",
+        city="Bangalore"
+    )
+    print(f"\nsingle questionnaire, {iterations} calls, model {model.version}")
+    print(f"{'':<12} {'before us':>10} {'after us':>10}")
+    rows = [
+        ("prediction", lambda: legacy_simulate_prediction(q), lambda: model.predict(q)),
+        ("stressors", lambda: legacy_extract_key_stressors(q, None), lambda: model.stressors(q)),
+    ]
+    for name, before, after in rows:
+        before_us, after_us = per_call_us(before, after, iterations)
+        print(f"{name:<12} {before_us:>10.2f} {after_us:>10.2f}")
+
+    questionnaires = random_questionnaires(100_000, rng)
+    columns = columns_from_questionnaires(questionnaires, model.fields)
+    started = time.perf_counter()
+    for row in questionnaires:
+        legacy_extract_key_stressors(row, legacy_simulate_prediction(row))
+    scalar = time.perf_counter() - started
+    batch = min(timeit.repeat(lambda: model.score_batch(columns), number=1, repeat=3))
+    print(f"\n{len(questionnaires)} questionnaires: legacy scalar loop {scalar * 1000:.0f} ms, "
+          f"compiled score_batch (matrix) {batch * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--parity-rows", type=int, default=200_000)
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+    main(args.parity_rows, args.iterations)
@@ -0,0 +1,102 @@
+"""Latency and allocations: serialize-once assessment responses vs. the response_model path.
+
+"Before" replays what analyze_assessment used to do per request: model_dump
+for the Mongo document, then FastAPI's response_model handling (model_dump,
+re-validation, JSON-mode serialization, json.dumps). "After" is
+assessment_document + assessment_json_response: one model_dump shared by the
+document and a single pydantic-core encode. Both produce identical bytes,
+which the script checks first.
+
+    python benchmarks/bench_serialization.py [--iterations 20000]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from pydantic import TypeAdapter  # noqa: E402
+
+import server  # noqa: E402
+
+RESPONSE_ADAPTER = TypeAdapter(server.AssessmentResult)
+
+
+def sample_result():
+    questionnaire = server.QuestionnaireInput(
+        work_hours_per_day=10, sleep_hours=6.5, work_from_home=True, commute_time_minutes=45,
+        night_shifts=False, flexible_hours=True, workload_level=8, deadline_pressure=7,
+        manager_support=4, team_support=6, career_growth=5, work_life_balance=3, stress_level=8,
+        anxiety_frequency="often", burnout_feeling="moderate", physical_symptoms=["headache", "fatigue"],
+        family_responsibilities="high", social_support="fair", hobbies_time="rare",
+        exercise_frequency="1-2/week", workplace_bias_experienced=True, posh_awareness=True,
+        safety_concerns="moderate", age_group="25-30", years_in_it=4, current_role="Software Engineer",
+        city="Bangalore"
+    )
+    prediction = server.simulate_prediction(questionnaire)
+    stressors = server.extract_key_stressors(questionnaire, prediction)
+    sections = {
+        stage: fallback(prediction, stressors, questionnaire)
+        for stage, _, fallback in server.LLM_STAGES
+    }
+    result = server.build_assessment_result(
+        prediction, stressors, sections,
+        server.generate_safety_tips(questionnaire, prediction['safety_risk']),
+        server.get_resources(prediction, questionnaire),
+        server.build_warnings(prediction)
+    )
+    return result, questionnaire
+
+
+def before(result, questionnaire):
+    doc = result.model_dump()
+    doc['timestamp'] = doc['timestamp'].isoformat()
+    doc['questionnaire'] = questionnaire.model_dump()
+    validated = RESPONSE_ADAPTER.validate_python(result.model_dump())
+    content = RESPONSE_ADAPTER.dump_python(validated, mode="json")
+    return doc, json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def after(result, questionnaire):
+    doc = server.assessment_document(result, questionnaire)
+    return doc, server.assessment_json_response(result, doc).body
+
+
+def measure(fn, result, questionnaire, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(result, questionnaire)
+    per_call_us = (time.perf_counter() - started) / iterations * 1e6
+
+    tracemalloc.start()
+    fn(result, questionnaire)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call_us, peak
+
+
+def main(iterations):
+    result, questionnaire = sample_result()
+    old_doc, old_body = before(result, questionnaire)
+    new_doc, new_body = after(result, questionnaire)
+    assert old_body == new_body, "response bytes differ"
+    assert old_doc == new_doc, "stored documents differ"
+    print(f"response size {len(new_body)} bytes, {iterations} iterations\n")
+
+    print(f"{'path':<8} {'us/request':>12} {'peak allocated bytes':>22}")
+    for name, fn in (("before", before), ("after", after)):
+        per_call_us, peak = measure(fn, result, questionnaire, iterations)
+        print(f"{name:<8} {per_call_us:>12.1f} {peak:>22,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    main(parser.parse_args().iterations)
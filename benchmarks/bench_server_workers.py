@@ -0,0 +1,128 @@
+"""Startup time and requests/second of `python -m backend` across worker counts.
+
+For each --workers value (and each launch mode: preloaded app, --no-preload,
+and with --reuse-port) the launcher is started as a subprocess. Startup time
+is read from its "N workers ready in Xs" log line. The benchmark then drives
+GET /api/ and /api/resources at fixed concurrency with keep-alive
+connections for --duration seconds, and stops the launcher with SIGTERM.
+
+Without --mongo-url, MONGO_URL points at a closed port: the app starts and
+serves these endpoints as it does while MongoDB is down, but startup then
+includes the failed warm-up (MONGO_SERVER_SELECTION_TIMEOUT_MS, set to 200
+here). The load generator runs on the same machine, so compare the numbers
+relative to each other, on a machine with more cores than workers.
+
+    python benchmarks/bench_server_workers.py [--workers 1,2,4] [--concurrency 64] [--duration 10] [--mongo-url mongodb://localhost:27017]
+"""
+import argparse
+import asyncio
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+READY = re.compile(r"(\d+) workers ready in ([\d.]+)s")
+MODES = {
+    "preload": [],
+    "no-preload": ["--no-preload"],
+    "reuse-port": ["--reuse-port"],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start(workers, mode, port, env):
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "backend", "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), *MODES[mode]],
+        cwd=HERE.parent, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    for line in process.stderr:
+        match = READY.search(line)
+        if match:
+            return process, float(match.group(2)), time.perf_counter() - started
+    process.wait()
+    raise RuntimeError(f"launcher exited with status {process.returncode} before its workers were ready")
+
+
+def stop(process):
+    process.send_signal(signal.SIGTERM)
+    # Keep reading so workers logging during shutdown never block on a full pipe
+    for _ in process.stderr:
+        pass
+    return process.wait(timeout=180)
+
+
+async def drive(port, path, concurrency, duration):
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        for _ in range(concurrency):
+            await client.get(path)  # warm up the connections
+        done = errors = 0
+        deadline = time.perf_counter() + duration
+
+        async def loop():
+            nonlocal done, errors
+            while time.perf_counter() < deadline:
+                response = await client.get(path)
+                if response.status_code == 200:
+                    done += 1
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(loop() for _ in range(concurrency)))
+        return done / (time.perf_counter() - started), errors
+
+
+def main(worker_counts, modes, paths, concurrency, duration, mongo_url):
+    env = dict(os.environ)
+    env.setdefault("DB_NAME", "benchmark")
+    env["ASSESSMENT_JOB_WORKERS"] = "0"
+    if mongo_url:
+        env["MONGO_URL"] = mongo_url
+    else:
+        env["MONGO_URL"] = f"mongodb://127.0.0.1:{free_port()}"
+        env["MONGO_SERVER_SELECTION_TIMEOUT_MS"] = "200"
+
+    print(f"{os.cpu_count()} CPUs, concurrency {concurrency}, {duration}s per endpoint, "
+          f"MongoDB {'at ' + mongo_url if mongo_url else 'unavailable'}")
+    header = f"{'workers':>7} {'mode':<11} {'ready s':>8} {'wall s':>7}"
+    for path in paths:
+        header += f" {path + ' req/s':>20}"
+    print(header)
+    for workers in worker_counts:
+        for mode in modes:
+            port = free_port()
+            process, ready, wall = start(workers, mode, port, env)
+            row = f"{workers:>7} {mode:<11} {ready:>8.2f} {wall:>7.2f}"
+            try:
+                for path in paths:
+                    rate, errors = asyncio.run(drive(port, path, concurrency, duration))
+                    row += f" {rate:>20,.0f}" if not errors else f" {f'{rate:,.0f} ({errors} err)':>20}"
+            finally:
+                status = stop(process)
+            print(row + ("" if status == 0 else f"  (exit status {status})"), flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=lambda s: [int(n) for n in s.split(",")], default=[1, 2, 4])
+    parser.add_argument("--modes", type=lambda s: s.split(","), default=list(MODES))
+    parser.add_argument("--paths", type=lambda s: s.split(","), default=["/api/", "/api/resources"])
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--mongo-url", help="a reachable MongoDB, so startup includes the real warm-up")
+    args = parser.parse_args()
+    main(args.workers, args.modes, args.paths, args.concurrency, args.duration, args.mongo_url)
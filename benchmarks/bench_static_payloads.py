@@ -0,0 +1,88 @@
+"""Requests/sec for /api/resources and per-assessment resource/tip lookups, before and after precomputation.
+
+"Before" rebuilds the resource directory dict and lets FastAPI encode it on
+every request (the previous handler); "after" serves the pre-serialized
+StaticPayload, both unconditionally (200) and as a revalidation (304). The
+in-process ASGI client keeps network noise out of the comparison.
+
+    python benchmarks/bench_static_payloads.py [--requests 5000]
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+def legacy_app():
+    app = FastAPI()
+
+    @app.get("/api/resources")
+    async def get_all_resources():
+        return copy.deepcopy(server.RESOURCE_DIRECTORY)
+
+    return app
+
+
+def current_app():
+    app = FastAPI()
+    app.include_router(server.api_router)
+    return app
+
+
+def legacy_get_resources(prediction):
+    resources = [server.Resource(**r.model_dump()) for r in server.BASE_RESOURCES]
+    if prediction['stress_level'] in ['medium', 'high'] or prediction['burnout_risk'] in ['medium', 'high']:
+        resources.append(server.Resource(**server.MENTAL_HEALTH_RESOURCE.model_dump()))
+    return resources
+
+
+def requests_per_second(client, n, headers=None, expect=200):
+    response = client.get("/api/resources", headers=headers)
+    assert response.status_code == expect, response.status_code
+    started = time.perf_counter()
+    for _ in range(n):
+        client.get("/api/resources", headers=headers)
+    return n / (time.perf_counter() - started)
+
+
+def calls_per_second(fn, n):
+    started = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return n / (time.perf_counter() - started)
+
+
+def main(n):
+    with TestClient(legacy_app()) as legacy, TestClient(current_app()) as current:
+        assert legacy.get("/api/resources").json() == current.get("/api/resources").json()
+        etag = current.get("/api/resources").headers["etag"]
+
+        print(f"/api/resources, {n} requests")
+        print(f"  before (build + encode)   {requests_per_second(legacy, n):>10,.0f} req/s")
+        print(f"  after  (200, bytes)       {requests_per_second(current, n):>10,.0f} req/s")
+        print(f"  after  (304, If-None-Match) {requests_per_second(current, n, {'If-None-Match': etag}, 304):>8,.0f} req/s")
+
+    prediction = {"stress_level": "high", "burnout_risk": "medium"}
+    assert legacy_get_resources(prediction) == server.get_resources(prediction, None)
+    calls = n * 20
+    print(f"\nget_resources, {calls} calls")
+    print(f"  before  {calls_per_second(lambda: legacy_get_resources(prediction), calls):>12,.0f} calls/s")
+    print(f"  after   {calls_per_second(lambda: server.get_resources(prediction, None), calls):>12,.0f} calls/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    main(parser.parse_args().requests)
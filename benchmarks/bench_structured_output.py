@@ -0,0 +1,142 @@
+"""Parse success and latency: structured single-call mode vs. the per-section text parsers.
+
+Replays recorded model responses (benchmarks/fixtures/*.jsonl) through
+parse_structured_sections and through generate_daily_plan /
+generate_workplace_suggestions, then times a full generate_llm_sections in
+both modes against a replay LlmChat with a fixed round-trip latency.
+
+    python benchmarks/bench_structured_output.py [--llm-latency-ms 800]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "benchmark")
+os.environ["LLM_CACHE_ENABLED"] = "false"
+
+import server  # noqa: E402
+
+
+def load_fixtures(name):
+    with open(HERE / "fixtures" / name) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayChat:
+    """Stands in for LlmChat, answering every message with a recorded response"""
+
+    responses = {}
+    latency = 0.0
+    calls = 0
+
+    def __init__(self, api_key=None, session_id="", system_message=""):
+        self.kind = session_id.split("_", 1)[0]
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        ReplayChat.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.responses[self.kind]
+
+
+class ReplayMessage:
+    def __init__(self, text):
+        self.text = text
+
+
+def sample_inputs():
+    questionnaire = server.QuestionnaireInput(
+        work_hours_per_day=10, sleep_hours=6.5, work_from_home=True, commute_time_minutes=45,
+        night_shifts=False, flexible_hours=True, workload_level=8, deadline_pressure=7,
+        manager_support=4, team_support=6, career_growth=5, work_life_balance=3, stress_level=8,
+        anxiety_frequency="often", burnout_feeling="moderate", physical_symptoms=["headache", "fatigue", "insomnia"],
+        family_responsibilities="high", social_support="fair", hobbies_time="rare", exercise_frequency="1-2/week",
+        workplace_bias_experienced=True, posh_awareness=True, safety_concerns="moderate", age_group="25-30",
+        years_in_it=4, current_role="Software Engineer", city="Bangalore",
+    )
+    prediction = server.simulate_prediction(questionnaire)
+    return prediction, server.extract_key_stressors(questionnaire, prediction), questionnaire
+
+
+def timed_us(fn, repeat=2000):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat * 1e6
+
+
+def bench_structured(prediction, stressors, questionnaire):
+    print("structured responses (sections recovered out of 3)")
+    recovered = 0
+    fixtures = load_fixtures("structured_responses.jsonl")
+    for fx in fixtures:
+        (sections, _), us = timed_us(lambda: server.parse_structured_sections(fx["response"], prediction, stressors, questionnaire))
+        recovered += len(sections)
+        print(f"  {fx['name']:<26} {len(sections)}/3  {us:8.1f} us")
+    print(f"  parse success: {recovered}/{3 * len(fixtures)} sections")
+
+
+def bench_sections(prediction, stressors, questionnaire):
+    print("per-section text responses (parsed without falling back to defaults)")
+    defaults = server.default_workplace_suggestions(prediction, stressors, questionnaire)
+    fixtures = load_fixtures("sections_responses.jsonl")
+    ok = 0
+    for fx in fixtures:
+        if fx["stage"] == "daily_plan":
+            ReplayChat.responses = {"plan": fx["response"]}
+            generate = server.generate_daily_plan
+        else:
+            ReplayChat.responses = {"workplace": fx["response"]}
+            generate = server.generate_workplace_suggestions
+        (result, _), us = timed_us(lambda: asyncio.run(generate(prediction, stressors, questionnaire)), repeat=200)
+        if fx["stage"] == "daily_plan":
+            parsed = len(result) == 7 and all(day.sleep_goal and not day.sleep_goal.startswith(("Sleep", "-", "*")) for day in result)
+        else:
+            parsed = result["flex_suggestions"] != defaults["flex_suggestions"] and result["email_to_hr"] != defaults["email_to_hr"]
+        ok += parsed
+        print(f"  {fx['stage'] + '/' + fx['name']:<36} {'ok' if parsed else 'FALLBACK/garbled':<16} {us:8.1f} us")
+    print(f"  parse success: {ok}/{len(fixtures)} responses")
+
+
+def bench_round_trips(prediction, stressors, questionnaire, latency):
+    print(f"generate_llm_sections with {latency * 1000:.0f} ms per LLM call")
+    structured = load_fixtures("structured_responses.jsonl")[0]["response"]
+    sections = {fx["stage"]: fx["response"] for fx in load_fixtures("sections_responses.jsonl") if fx["name"] == "clean"}
+    ReplayChat.responses = {"empathy": "It may help to slow down.", "plan": sections["daily_plan"],
+                            "workplace": sections["workplace"], "structured": structured}
+    ReplayChat.latency = latency
+    for mode in ("sections", "structured"):
+        server.LLM_GENERATION_MODE = mode
+        ReplayChat.calls = 0
+        start = time.perf_counter()
+        asyncio.run(server.generate_llm_sections(prediction, stressors, questionnaire))
+        elapsed = time.perf_counter() - start
+        print(f"  {mode:<11} {elapsed * 1000:8.1f} ms  {ReplayChat.calls} LLM call(s)")
+    ReplayChat.latency = 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    args = parser.parse_args()
+
+    server.LlmChat = ReplayChat
+    server.UserMessage = ReplayMessage
+    inputs = sample_inputs()
+    bench_structured(*inputs)
+    bench_sections(*inputs)
+    bench_round_trips(*inputs, latency=args.llm_latency_ms / 1000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Explain-based check that every assessment history query is index-backed.
+
+Seeds a scratch collection on a real MongoDB (mongomock has no query planner),
+creates the history indexes and asserts that the winning plan of each
+supported filter combination has no COLLSCAN and no blocking SORT, on the
+first page and on a cursor page. The scratch database is dropped afterwards.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/check_history_indexes.py [--docs 200000]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import assessment_history  # noqa: E402
+
+CITIES = ["Bangalore", "Pune", "Hyderabad", "Chennai", "Gurugram", "Noida", "Mumbai", "Kolkata"]
+ROLES = ["Software Engineer", "QA Engineer", "Data Scientist", "Engineering Manager", "DevOps Engineer"]
+
+FILTERS = {
+    "unfiltered": {},
+    "time_range": {"start": datetime(2026, 3, 1), "end": datetime(2026, 4, 1)},
+    "city": {"city": "Pune"},
+    "role": {"role": "Data Scientist"},
+    "city_and_time_range": {"city": "Pune", "start": datetime(2026, 3, 1)},
+    "stress_band": {"bands": {"stress_level": ["high"]}},
+    "two_bands": {"bands": {"burnout_risk": ["high", "medium"], "safety_risk": ["high"]}},
+    "band_and_time_range": {"bands": {"safety_risk": ["high"]}, "end": datetime(2026, 6, 1)},
+    "city_role_band": {"city": "Bangalore", "role": "QA Engineer", "bands": {"stress_level": ["low"]}},
+}
+FORBIDDEN_STAGES = {"COLLSCAN", "SORT"}
+
+
+def random_doc(start):
+    timestamp = start + timedelta(seconds=random.randint(0, 365 * 24 * 3600))
+    return {
+        "id": str(uuid.uuid4()),
+        "timestamp": timestamp.isoformat(),
+        "stress_level": random.choice(assessment_history.BANDS),
+        "burnout_risk": random.choice(assessment_history.BANDS),
+        "safety_risk": random.choice(assessment_history.BANDS),
+        "stress_score": random.randint(0, 100),
+        "burnout_score": random.randint(0, 100),
+        "explanation": "x" * 2000,
+        "questionnaire": {"city": random.choice(CITIES), "current_role": random.choice(ROLES)},
+    }
+
+
+async def seed(collection, count):
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    batch = 10_000
+    for offset in range(0, count, batch):
+        await collection.insert_many([random_doc(start) for _ in range(min(batch, count - offset))], ordered=False)
+    await assessment_history.ensure_indexes(collection)
+
+
+async def explain(collection, filters, limit=20):
+    query = assessment_history.build_list_query(**filters)
+    cursor = collection.find(query, assessment_history.SUMMARY_PROJECTION).sort(assessment_history.SORT).limit(limit + 1)
+    return await cursor.explain()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=200_000)
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db_name = f"history_index_check_{uuid.uuid4().hex[:8]}"
+    collection = client[db_name].assessments
+    failures = 0
+    try:
+        await seed(collection, args.docs)
+        for name, filters in FILTERS.items():
+            page = await assessment_history.list_assessments(collection, limit=20, **filters)
+            pages = {"first page": filters}
+            if page["next_cursor"]:
+                pages["cursor page"] = {**filters, "cursor": page["next_cursor"]}
+            for label, page_filters in pages.items():
+                result = await explain(collection, page_filters)
+                stages = assessment_history.plan_stages(result)
+                bad = stages & FORBIDDEN_STAGES
+                failures += bool(bad)
+                print(f"{'FAIL' if bad else 'ok  '} {name:<22} {label:<12} {' > '.join(sorted(stages))}")
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+    print(f"{failures} query plan(s) not index-backed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,442 @@
+"""Offline load test: the API in-process with a fake LLM and an in-memory MongoDB.
+
+The app runs inside this process (its lifespan included, so the job workers,
+write-behind writer and metrics collector behave as in production) behind an
+httpx ASGI transport. LlmChat is replaced by FakeLlmChat, which answers with
+recorded responses (benchmarks/fixtures by default, or --replay FILE) after a
+latency drawn from --llm-latency. MongoDB is mongomock-motor, or a real server
+with --mongo-url.
+
+Each endpoint is driven open-loop at each --rates value for --duration
+seconds: requests are sent on a fixed schedule whether or not earlier ones
+have finished, and latency is measured from the scheduled send time, so a
+saturated server shows up as growing latency instead of a slower client.
+Results (throughput, p50/p95/p99 per endpoint and per pipeline stage) are
+printed and written as JSON; --compare OLD.json prints the change against an
+earlier run. mongomock is far slower than a MongoDB server at queries, so use
+--mongo-url when measuring the database-bound endpoints (history, jobs).
+
+    python benchmarks/load_test.py --endpoints analyze,stream --rates 5,20 --duration 20 \\
+        --llm-latency lognormal:800:0.4 --output results.json
+
+--llm-latency takes fixed:MS, uniform:LOW_MS:HIGH_MS, normal:MEAN_MS:SD_MS,
+lognormal:MEDIAN_MS:SIGMA, exponential:MEAN_MS or recorded (the latency_ms of
+each replayed response). A replay file is JSONL with "kind" (empathy, plan,
+workplace or structured), "response" and optionally "latency_ms".
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE.parent / "backend"))
+
+ENDPOINTS = ("analyze", "stream", "jobs", "resources", "history")
+
+EMPATHY_RESPONSE = (
+    "It may help to know that feeling stretched like this is common in demanding IT roles. "
+    "Long hours and tight deadlines could be adding up, and short, regular breaks might ease some of that load. "
+    "You have already taken a positive step by checking in with yourself."
+)
+
+
+def parse_latency(spec):
+    """A sampler returning seconds for one LLM call, from an --llm-latency spec"""
+    kind, _, rest = spec.partition(":")
+    values = [float(v) for v in rest.split(":")] if rest else []
+    samplers = {
+        "fixed": lambda rng, ms: ms,
+        "uniform": lambda rng, low, high: rng.uniform(low, high),
+        "normal": lambda rng, mean, sd: max(0.0, rng.gauss(mean, sd)),
+        "lognormal": lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma),
+        "exponential": lambda rng, mean: rng.expovariate(1 / mean),
+    }
+    if kind == "recorded":
+        return None
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution: {kind}")
+    return lambda rng: samplers[kind](rng, *values) / 1000
+
+
+def load_replay(path=None):
+    """Recorded responses by kind, from a replay file or the benchmark fixtures"""
+    responses = defaultdict(list)
+    if path:
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    responses[entry["kind"]].append(entry)
+        return dict(responses)
+
+    kinds = {"daily_plan": "plan", "workplace": "workplace"}
+    with open(HERE / "fixtures" / "sections_responses.jsonl") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                responses[kinds[entry["stage"]]].append({"response": entry["response"]})
+    with open(HERE / "fixtures" / "structured_responses.jsonl") as f:
+        responses["structured"] = [{"response": json.loads(line)["response"]} for line in f if line.strip()]
+    responses["empathy"] = [{"response": EMPATHY_RESPONSE}]
+    return dict(responses)
+
+
+class FakeLlmChat:
+    """Stands in for LlmChat: replays recorded responses after a sampled latency"""
+
+    responses = {}
+    latency = None  # sampler from parse_latency; None replays each response's latency_ms
+    error_rate = 0.0
+    rng = random.Random(0)
+    positions = defaultdict(int)
+    calls = defaultdict(int)
+
+    def __init__(self, api_key=None, session_id="", system_message=""):
+        self.kind = session_id.split("_", 1)[0]
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        cls = FakeLlmChat
+        recorded = cls.responses[self.kind]
+        entry = recorded[cls.positions[self.kind] % len(recorded)]
+        cls.positions[self.kind] += 1
+        cls.calls[self.kind] += 1
+        delay = cls.latency(cls.rng) if cls.latency else entry.get("latency_ms", 0) / 1000
+        await asyncio.sleep(delay)
+        if cls.error_rate and cls.rng.random() < cls.error_rate:
+            raise RuntimeError("injected LLM failure")
+        return entry["response"]
+
+
+class FakeUserMessage:
+    def __init__(self, text):
+        self.text = text
+
+
+def random_questionnaire(rng):
+    return {
+        "work_hours_per_day": rng.randint(6, 13),
+        "sleep_hours": rng.choice([4.5, 5, 5.5, 6, 6.5, 7, 7.5, 8]),
+        "work_from_home": rng.random() < 0.5,
+        "commute_time_minutes": rng.choice([0, 15, 30, 45, 60, 90]),
+        "night_shifts": rng.random() < 0.2,
+        "flexible_hours": rng.random() < 0.5,
+        "workload_level": rng.randint(1, 10),
+        "deadline_pressure": rng.randint(1, 10),
+        "manager_support": rng.randint(1, 10),
+        "team_support": rng.randint(1, 10),
+        "career_growth": rng.randint(1, 10),
+        "work_life_balance": rng.randint(1, 10),
+        "stress_level": rng.randint(1, 10),
+        "anxiety_frequency": rng.choice(["rarely", "sometimes", "often", "always"]),
+        "burnout_feeling": rng.choice(["none", "mild", "moderate", "severe"]),
+        "physical_symptoms": rng.sample(["headache", "fatigue", "insomnia", "back pain", "eye strain"], rng.randint(0, 3)),
+        "family_responsibilities": rng.choice(["low", "medium", "high"]),
+        "social_support": rng.choice(["poor", "fair", "good", "excellent"]),
+        "hobbies_time": rng.choice(["none", "rare", "occasional", "regular"]),
+        "exercise_frequency": rng.choice(["none", "1-2/week", "3-4/week", "daily"]),
+        "workplace_bias_experienced": rng.random() < 0.3,
+        "posh_awareness": rng.random() < 0.6,
+        "safety_concerns": rng.choice(["none", "minor", "moderate", "major"]),
+        "age_group": rng.choice(["18-24", "25-30", "31-35", "36-40", "41+"]),
+        "years_in_it": rng.randint(0, 20),
+        "current_role": rng.choice(["Software Engineer", "QA Engineer", "Data Analyst", "Engineering Manager"]),
+        "city": rng.choice(["Bangalore", "Pune", "Hyderabad", "Chennai", "Gurgaon"]),
+    }
+
+
+async def call_analyze(client, body, record):
+    response = await client.post("/api/assessment/analyze", json=body)
+    return response.status_code == 200
+
+
+async def call_stream(client, body, record):
+    async with client.stream("POST", "/api/assessment/analyze/stream", json=body) as response:
+        if response.status_code != 200:
+            return False
+        events = []
+        async for line in response.aiter_lines():
+            if line:
+                if not events:
+                    record("stream:first_event")
+                events.append(json.loads(line)["event"])
+    return events[-1:] == ["complete"]
+
+
+async def call_jobs(client, body, record, poll_interval=0.05):
+    response = await client.post("/api/assessment/jobs", json=body)
+    if response.status_code != 202:
+        return False
+    record("jobs:enqueue")
+    job_id = response.json()["job_id"]
+    while True:
+        await asyncio.sleep(poll_interval)
+        status = (await client.get(f"/api/assessment/jobs/{job_id}")).json()["status"]
+        if status in ("completed", "failed"):
+            return status == "completed"
+
+
+async def call_resources(client, body, record):
+    return (await client.get("/api/resources")).status_code == 200
+
+
+async def call_history(client, body, record):
+    return (await client.get("/api/assessments", params={"limit": 20})).status_code == 200
+
+
+CALLS = {
+    "analyze": call_analyze,
+    "stream": call_stream,
+    "jobs": call_jobs,
+    "resources": call_resources,
+    "history": call_history,
+}
+
+
+def percentile(ordered, q):
+    """Linearly interpolated percentile of an already sorted list"""
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else None,
+        **{f"p{q}_ms": round(percentile(ordered, q / 100) * 1000, 3) if ordered else None for q in (50, 95, 99)},
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else None,
+    }
+
+
+def drain_stage_samples(server):
+    """Per-stage samples (and LLM queue waits per priority) recorded since the last drain, from the pipeline histograms
+
+    The collector is disabled for the run (METRICS_COLLECT_INTERVAL), so every
+    sample is still pending; reading them gives exact percentiles rather than
+    bucket estimates.
+    """
+    stages = defaultdict(lambda: {"samples": [], "outcomes": defaultdict(int)})
+    histograms = ((server.STAGE_SECONDS, ""), (server.LLM_REQUEST_SECONDS, "llm:"), (server.LLM_QUEUE_WAIT_SECONDS, "llm_wait:"))
+    for histogram, prefix in histograms:
+        for labels, series in histogram.values.items():
+            stage = stages[prefix + labels[0]]
+            stage["samples"].extend(series.pending)
+            if len(labels) > 1:
+                stage["outcomes"][labels[1]] += len(series.pending)
+        histogram.collect()
+    return {
+        name: {**summarize(stage["samples"]), "outcomes": dict(stage["outcomes"])}
+        for name, stage in sorted(stages.items()) if stage["samples"]
+    }
+
+
+async def run_load(client, server, endpoint, rate, duration, rng, drain_timeout):
+    """Send requests to one endpoint at a fixed arrival rate and summarize the run"""
+    call = CALLS[endpoint]
+    total = max(1, int(rate * duration))
+    latencies = defaultdict(list)
+    outcomes = defaultdict(int)
+    finished = []
+
+    async def one(scheduled, body):
+        def record(name):
+            latencies[name].append(time.perf_counter() - scheduled)
+        try:
+            ok = await call(client, body, record)
+        except Exception as e:
+            ok = False
+            outcomes[type(e).__name__] += 1
+        if ok:
+            record(endpoint)
+        outcomes["ok" if ok else "error"] += 1
+        finished.append(time.perf_counter())
+
+    drain_stage_samples(server)
+    tasks = []
+    started = time.perf_counter()
+    for i in range(total):
+        scheduled = started + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(scheduled, random_questionnaire(rng))))
+    send_lag = time.perf_counter() - (started + (total - 1) / rate)
+
+    done, pending = await asyncio.wait(tasks, timeout=drain_timeout)
+    for task in pending:
+        task.cancel()
+    elapsed = (max(finished) if finished else time.perf_counter()) - started
+
+    return {
+        "endpoint": endpoint,
+        "offered_rps": rate,
+        "duration_s": duration,
+        "sent": total,
+        "completed": outcomes.pop("ok", 0),
+        "errors": outcomes.pop("error", 0),
+        "timed_out": len(pending),
+        "exceptions": dict(outcomes),
+        "throughput_rps": round(len(latencies[endpoint]) / elapsed, 3) if elapsed > 0 else None,
+        "send_lag_ms": round(send_lag * 1000, 3),
+        "latency": {name: summarize(samples) for name, samples in sorted(latencies.items())},
+        "stages": drain_stage_samples(server),
+    }
+
+
+async def seed_history(client, rng, count):
+    """Store some assessments so the history endpoint has pages to read"""
+    latency, FakeLlmChat.latency = FakeLlmChat.latency, lambda rng: 0.0
+    try:
+        for _ in range(count):
+            await client.post("/api/assessment/analyze", json=random_questionnaire(rng))
+    finally:
+        FakeLlmChat.latency = latency
+
+
+async def run(args):
+    import httpx
+
+    server = importlib.import_module("server")
+    server.LlmChat = FakeLlmChat
+    server.UserMessage = FakeUserMessage
+    FakeLlmChat.responses = load_replay(args.replay)
+    FakeLlmChat.latency = parse_latency(args.llm_latency)
+    FakeLlmChat.error_rate = args.llm_error_rate
+    FakeLlmChat.rng = random.Random(args.seed)
+
+    if not args.mongo_url:
+        from mongomock_motor import AsyncMongoMockClient
+        server.mongo.connect(AsyncMongoMockClient())
+
+    rng = random.Random(args.seed)
+    runs = []
+    async with server.lifespan(server.app):
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+            if "history" in args.endpoints:
+                await seed_history(client, rng, args.history_seed)
+            for endpoint in args.endpoints:
+                for rate in args.rates:
+                    result = await run_load(client, server, endpoint, rate, args.duration, rng, args.drain_timeout)
+                    runs.append(result)
+                    print_run(result)
+    return runs
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_run(result):
+    latency = result["latency"].get(result["endpoint"], {})
+    print(
+        f"{result['endpoint']:<10} {result['offered_rps']:>7g} req/s offered  "
+        f"{result['throughput_rps'] or 0:>8.2f} req/s  "
+        f"p50 {latency.get('p50_ms') or 0:>9.1f}  p95 {latency.get('p95_ms') or 0:>9.1f}  "
+        f"p99 {latency.get('p99_ms') or 0:>9.1f} ms  "
+        f"{result['completed']}/{result['sent']} ok"
+    )
+    for name, stage in result["stages"].items():
+        outcomes = ", ".join(f"{outcome} {n}" for outcome, n in stage["outcomes"].items() if outcome != "ok")
+        print(f"    {name:<22} n={stage['count']:<6} p50 {stage['p50_ms']:>9.2f}  p95 {stage['p95_ms']:>9.2f}  "
+              f"p99 {stage['p99_ms']:>9.2f} ms  {outcomes}")
+
+
+def compare(old_path, runs):
+    """Print p50/p95/p99 and throughput changes against an earlier results file"""
+    with open(old_path) as f:
+        old = {(r["endpoint"], r["offered_rps"]): r for r in json.load(f)["runs"]}
+    print(f"\nchange vs {old_path}")
+    for run in runs:
+        before = old.get((run["endpoint"], run["offered_rps"]))
+        if not before:
+            continue
+        parts = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            a = before["latency"].get(run["endpoint"], {}).get(key)
+            b = run["latency"].get(run["endpoint"], {}).get(key)
+            if a and b:
+                parts.append(f"{key[:3]} {(b - a) / a * 100:+6.1f}%")
+        if before["throughput_rps"] and run["throughput_rps"]:
+            parts.append(f"throughput {(run['throughput_rps'] - before['throughput_rps']) / before['throughput_rps'] * 100:+6.1f}%")
+        print(f"  {run['endpoint']:<10} {run['offered_rps']:>7g} req/s  " + "  ".join(parts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", default="analyze,stream,jobs",
+                        type=lambda value: [e for e in value.split(",") if e],
+                        help=f"comma-separated, from {', '.join(ENDPOINTS)}")
+    parser.add_argument("--rates", default="5,20", type=lambda value: [float(r) for r in value.split(",")],
+                        help="arrival rates in requests/second, each run in turn")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of arrivals per run")
+    parser.add_argument("--drain-timeout", type=float, default=120, help="seconds to wait for requests in flight")
+    parser.add_argument("--llm-latency", default="lognormal:800:0.4")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--replay", help="JSONL of recorded LLM responses (default: benchmarks/fixtures)")
+    parser.add_argument("--generation-mode", choices=["sections", "structured"], default="sections")
+    parser.add_argument("--llm-cache", action="store_true", help="leave the LLM section cache on")
+    parser.add_argument("--mongo-url", help="use this MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--history-seed", type=int, default=200, help="assessments stored before the history runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    # Read by server at import
+    os.environ["MONGO_URL"] = args.mongo_url or "mongodb://load-test"
+    os.environ.setdefault("DB_NAME", "load_test")
+    os.environ["LLM_GENERATION_MODE"] = args.generation_mode
+    os.environ["LLM_CACHE_ENABLED"] = "true" if args.llm_cache else "false"
+    os.environ["METRICS_COLLECT_INTERVAL"] = "1e9"
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # Fallbacks are counted in the per-stage outcomes instead of logged per request
+    logging.getLogger("server").setLevel(logging.ERROR)
+
+    runs = asyncio.run(run(args))
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "llm_calls": dict(FakeLlmChat.calls),
+        "runs": runs,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.output}")
+    if args.compare:
+        compare(args.compare, runs)
+
+
+if __name__ == "__main__":
+    main()
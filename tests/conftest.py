@@ -0,0 +1,58 @@
+"""Fixtures for tests that go through the FastAPI app: ``server`` on a fresh mongomock database per test."""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+BACKEND = str(Path(__file__).resolve().parent.parent / "backend")
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
+
+# Read once when server is imported; no LLM cache or job workers, so each test sees only its own requests
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+os.environ.setdefault("ASSESSMENT_JOB_WORKERS", "0")
+os.environ.setdefault("METRICS_COLLECT_INTERVAL", "3600")
+
+QUESTIONNAIRE = {
+    "work_hours_per_day": 10, "sleep_hours": 6.5, "work_from_home": True, "commute_time_minutes": 45,
+    "night_shifts": False, "flexible_hours": True, "workload_level": 8, "deadline_pressure": 7,
+    "manager_support": 4, "team_support": 6, "career_growth": 5, "work_life_balance": 3, "stress_level": 8,
+    "anxiety_frequency": "often", "burnout_feeling": "moderate", "physical_symptoms": ["headache", "fatigue", "insomnia"],
+    "family_responsibilities": "high", "social_support": "fair", "hobbies_time": "rare",
+    "exercise_frequency": "1-2/week", "workplace_bias_experienced": True, "posh_awareness": True,
+    "safety_concerns": "moderate", "age_group": "25-30", "years_in_it": 4, "current_role": "Software Engineer",
+    "city": "Bangalore",
+}
+
+
+@pytest.fixture
+def questionnaire():
+    return dict(QUESTIONNAIRE)
+
+
+@pytest.fixture
+def server():
+    import server as module
+
+    module.mongo.connect(AsyncMongoMockClient())
+    yield module
+    module.mongo.close()
+
+
+@pytest.fixture
+def call_api(server):
+    """Run ``scenario(client)`` against the app inside its lifespan and return what it returns"""
+    def call(scenario):
+        async def main():
+            async with server.lifespan(server.app):
+                transport = httpx.ASGITransport(app=server.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+                    return await scenario(client)
+        return asyncio.run(main())
+    return call
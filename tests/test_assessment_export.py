@@ -0,0 +1,141 @@
+"""GET /assessments/export: the admin key, the minimum row count and the NDJSON/CSV rows (on mongomock)."""
+import asyncio
+import csv
+import io
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from assessment_export import DEFAULT_FIELDS, AssessmentExport, InvalidExport  # noqa: E402
+
+ADMIN = {"X-Admin-Key": "s3cret"}
+EXPORT = "/api/assessments/export"
+
+
+def stored(n, city="Pune", age_group="25-30"):
+    return {
+        "id": f"a{n}", "timestamp": f"2026-03-0{n + 1}T10:00:00+00:00", "model_version": "heuristic-v1",
+        "stress_level": "high", "stress_score": 70 + n, "burnout_risk": "medium", "burnout_score": 50,
+        "safety_risk": "low", "key_stressors": ["Long work hours (10h/day)", "High workload"],
+        "stressor_keys": ["long_work_hours", "high_workload"], "quick_summary": "Summary",
+        "explanation": "Written for you. " * 30, "warnings": [],
+        "questionnaire": {"city": city, "age_group": age_group, "years_in_it": 4, "sleep_hours": 6.5},
+    }
+
+
+@pytest.fixture
+def export_api(call_api, server, monkeypatch):
+    """``call(scenario, docs)``: the stored documents (odd ones in the compact form) and an admin key of s3cret"""
+    monkeypatch.setattr(server, "ADMIN_API_KEY", "s3cret")
+    monkeypatch.setattr(server, "COHORT_MIN_SIZE", 3)
+
+    def call(scenario, docs):
+        async def with_docs(client):
+            rows = [server.assessment_codec.encode(doc) if n % 2 else doc for n, doc in enumerate(docs)]
+            await server.db.assessments.insert_many(rows)
+            return await scenario(client)
+        return call_api(with_docs)
+    return call
+
+
+def test_export_requires_the_admin_key(export_api):
+    async def scenario(client):
+        return [
+            (await client.get(EXPORT, headers=headers)).status_code
+            for headers in ({}, {"X-Admin-Key": "wrong"}, ADMIN)
+        ]
+
+    assert export_api(scenario, [stored(n) for n in range(3)]) == [403, 403, 200]
+
+
+def test_export_is_disabled_without_an_admin_key(export_api, server, monkeypatch):
+    monkeypatch.setattr(server, "ADMIN_API_KEY", "")
+    response = export_api(lambda client: client.get(EXPORT, headers=ADMIN), [stored(n) for n in range(3)])
+    assert response.status_code == 403
+    assert "disabled" in response.json()["detail"]
+
+
+def test_export_refuses_fewer_rows_than_the_cohort_minimum(export_api):
+    async def scenario(client):
+        everyone = await client.get(EXPORT, headers=ADMIN)
+        narrowed = await client.get(EXPORT, params={"city": "Chennai"}, headers=ADMIN)
+        return everyone, narrowed
+
+    docs = [stored(n) for n in range(3)] + [stored(n, city="Chennai") for n in range(3, 5)]
+    everyone, narrowed = export_api(scenario, docs)
+    assert everyone.status_code == 200 and len(everyone.text.splitlines()) == 5
+    assert narrowed.status_code == 400
+    assert narrowed.json()["detail"] == "Fewer than 3 assessments match these filters"
+
+
+def test_ndjson_rows_keep_the_stored_structure(export_api):
+    async def scenario(client):
+        default = await client.get(EXPORT, headers=ADMIN)
+        chosen = await client.get(EXPORT, params={"fields": "id,explanation,questionnaire.city,questionnaire.age_group"}, headers=ADMIN)
+        return default, chosen
+
+    docs = [stored(n) for n in (2, 0, 1)]
+    default, chosen = export_api(scenario, docs)
+    assert default.headers["content-type"] == "application/x-ndjson"
+    assert default.headers["content-disposition"] == 'attachment; filename="assessments.ndjson"'
+    rows = [json.loads(line) for line in default.text.splitlines()]
+    assert [row["id"] for row in rows] == ["a0", "a1", "a2"]
+    assert all(list(row) == list(DEFAULT_FIELDS) for row in rows)
+    assert rows[0]["key_stressors"] == ["Long work hours (10h/day)", "High workload"]
+
+    rows = [json.loads(line) for line in chosen.text.splitlines()]
+    # a0 and a1 were stored compact: the long text and enum codes come back decoded
+    assert rows[0] == {"id": "a0", "explanation": docs[1]["explanation"], "questionnaire": {"city": "Pune", "age_group": "25-30"}}
+    assert rows[1] == rows[0] | {"id": "a1"}
+
+
+def test_csv_rows_are_flat(export_api):
+    async def scenario(client):
+        return await client.get(
+            EXPORT, params={"format": "csv", "fields": "id,stress_score,key_stressors,questionnaire", "age_group": "25-30"}, headers=ADMIN
+        )
+
+    docs = [stored(n) for n in range(3)] + [stored(3, age_group="40+")]
+    response = export_api(scenario, docs)
+    assert response.headers["content-type"].startswith("text/csv")
+    header, *rows = list(csv.reader(io.StringIO(response.text)))
+    assert header == ["id", "stress_score", "key_stressors"] + [column for column in header if column.startswith("questionnaire_")]
+    assert {"questionnaire_city", "questionnaire_age_group", "questionnaire_sleep_hours"} <= set(header)
+    assert [row[0] for row in rows] == ["a0", "a1", "a2"]
+    first = dict(zip(header, rows[1]))
+    assert (first["stress_score"], first["key_stressors"]) == ("71", "long_work_hours;high_workload")
+    assert (first["questionnaire_city"], first["questionnaire_age_group"], first["questionnaire_sleep_hours"]) == ("Pune", "25-30", "6.5")
+
+
+def test_invalid_export_parameters(export_api):
+    async def scenario(client):
+        return [
+            (await client.get(EXPORT, params=params, headers=ADMIN)).status_code
+            for params in ({"format": "xml"}, {"fields": "id,password"}, {"years_in_it": "1-2"})
+        ]
+
+    assert export_api(scenario, [stored(n) for n in range(3)]) == [422, 400, 400]
+
+
+def test_one_chunk_per_batch():
+    async def scenario():
+        collection = AsyncMongoMockClient().db.assessments
+        await collection.insert_many([stored(n) for n in range(5)])
+        export = AssessmentExport("csv", {"city": str}, fields=["id", "questionnaire.city"], batch_size=2)
+        return [chunk.decode() async for chunk in export.chunks(collection, {})]
+
+    assert asyncio.run(scenario()) == [
+        "id,questionnaire_city\r\n",
+        "a0,Pune\r\na1,Pune\r\n",
+        "a2,Pune\r\na3,Pune\r\n",
+        "a4,Pune\r\n",
+    ]
+    with pytest.raises(InvalidExport):
+        AssessmentExport("xml", {})
+    with pytest.raises(InvalidExport):
+        AssessmentExport("csv", {"city": str}, fields=["questionnaire.password"])
@@ -0,0 +1,126 @@
+"""build_list_query, the history index key order and keyset paging (on mongomock).
+
+mongomock has no query planner, so the plans themselves are checked against a
+real MongoDB by benchmarks/check_history_indexes.py; these tests pin down the
+query shapes and index definitions that check relies on.
+"""
+import asyncio
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import assessment_history  # noqa: E402
+from assessment_history import BAND_FIELDS, BANDS, INDEXES, SORT, InvalidCursor, build_list_query  # noqa: E402
+
+FILTERS = {
+    "unfiltered": {},
+    "time_range": {"start": datetime(2026, 3, 1), "end": datetime(2026, 4, 1)},
+    "city": {"city": "Pune"},
+    "role": {"role": "Data Scientist"},
+    "city_and_time_range": {"city": "Pune", "start": datetime(2026, 3, 1)},
+    "stress_band": {"bands": {"stress_level": ["high"]}},
+    "two_bands": {"bands": {"burnout_risk": ["high", "medium"], "safety_risk": ["high"]}},
+    "band_and_time_range": {"bands": {"safety_risk": ["high"]}, "end": datetime(2026, 6, 1)},
+    "city_role_band": {"city": "Bangalore", "role": "QA Engineer", "bands": {"stress_level": ["low"]}},
+}
+
+
+def serving_index(query):
+    """The first index whose leading keys are all filtered on and are followed by exactly the sort keys"""
+    for index in INDEXES:
+        keys = list(index.document["key"].items())
+        prefix, rest = keys[:len(keys) - len(SORT)], keys[len(keys) - len(SORT):]
+        if rest == SORT and all(field in query for field, _ in prefix):
+            return index.document["name"]
+    return None
+
+
+def test_filters_become_equality_fields_and_a_timestamp_range():
+    query = build_list_query(city="Pune", role="QA Engineer", start=datetime(2026, 3, 1), end=datetime(2026, 4, 1, tzinfo=timezone.utc))
+    assert query == {
+        "questionnaire.city": "Pune",
+        "questionnaire.current_role": "QA Engineer",
+        "timestamp": {"$gte": "2026-03-01T00:00:00+00:00", "$lt": "2026-04-01T00:00:00+00:00"},
+    }
+
+
+def test_band_filter_is_sent_for_every_band_field():
+    query = build_list_query(bands={"burnout_risk": ["high"]})
+    assert {field: query[field] for field in BAND_FIELDS} == {
+        "stress_level": {"$in": BANDS},
+        "burnout_risk": {"$in": ["high"]},
+        "safety_risk": {"$in": BANDS},
+    }
+    assert build_list_query(bands={"burnout_risk": []}) == {}
+
+
+def test_cursor_is_a_single_timestamp_bound_plus_a_tie_filter():
+    cursor = assessment_history.encode_cursor({"timestamp": "2026-03-05T10:00:00+00:00", "id": "b"})
+    query = build_list_query(start=datetime(2026, 3, 1), cursor=cursor)
+    assert query["timestamp"] == {"$gte": "2026-03-01T00:00:00+00:00", "$lte": "2026-03-05T10:00:00+00:00"}
+    assert query["$nor"] == [{"timestamp": "2026-03-05T10:00:00+00:00", "id": {"$gte": "b"}}]
+    assert "$or" not in query
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", "WzFd", assessment_history.encode_cursor({"timestamp": 1, "id": "a"})])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        build_list_query(cursor=cursor)
+
+
+def test_indexes_put_equality_fields_before_the_sort_keys():
+    for index in INDEXES[1:]:
+        keys = list(index.document["key"].items())
+        assert keys[-len(SORT):] == SORT, index.document["name"]
+        assert all(field not in dict(SORT) for field, _ in keys[:-len(SORT)]), index.document["name"]
+
+
+@pytest.mark.parametrize("name", list(FILTERS))
+def test_every_supported_filter_has_a_serving_index(name):
+    query = build_list_query(**FILTERS[name])
+    assert serving_index(query) is not None
+    cursor = assessment_history.encode_cursor({"timestamp": "2026-03-05T10:00:00+00:00", "id": "b"})
+    assert serving_index(build_list_query(cursor=cursor, **FILTERS[name])) is not None
+
+
+def test_pages_cover_every_matching_row_once_newest_first():
+    rng = random.Random(7)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    docs = [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            # Few distinct timestamps, so pages split rows with equal timestamps
+            "timestamp": (start + timedelta(hours=rng.randint(0, 20))).isoformat(),
+            "stress_level": rng.choice(BANDS),
+            "burnout_risk": rng.choice(BANDS),
+            "safety_risk": rng.choice(BANDS),
+            "questionnaire": {"city": rng.choice(["Pune", "Chennai"]), "current_role": "Engineer"},
+        }
+        for _ in range(120)
+    ]
+    filters = {"city": "Pune", "bands": {"stress_level": ["high", "medium"]}}
+    expected = sorted(
+        (d for d in docs if d["questionnaire"]["city"] == "Pune" and d["stress_level"] in ("high", "medium")),
+        key=lambda d: (d["timestamp"], d["id"]), reverse=True,
+    )
+
+    async def read_all_pages():
+        collection = AsyncMongoMockClient().db.assessments
+        await collection.insert_many([dict(d) for d in docs])
+        await assessment_history.ensure_indexes(collection)
+        seen, cursor = [], None
+        while True:
+            page = await assessment_history.list_assessments(collection, 7, cursor=cursor, **filters)
+            seen += [item["id"] for item in page["items"]]
+            cursor = page["next_cursor"]
+            if not cursor:
+                return seen
+
+    assert asyncio.run(read_all_pages()) == [d["id"] for d in expected]
@@ -0,0 +1,159 @@
+"""JobQueue claiming, lease expiry, retries and the failed state, and JobWorkerPool (on mongomock)."""
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from assessment_jobs import COMPLETED, FAILED, QUEUED, RUNNING, JobQueue, JobWorkerPool, LeaseLost  # noqa: E402
+
+
+def new_queue(**options):
+    options = {"lease_seconds": 60, "max_attempts": 3, "retry_backoff_seconds": 0, **options}
+    return JobQueue(AsyncMongoMockClient().db.assessment_jobs, **options)
+
+
+async def expire_lease(queue, job):
+    """What a crashed worker leaves behind: a running job whose lease ran out"""
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    await queue.collection.update_one({"_id": job["_id"]}, {"$set": {"lease_expires_at": past}})
+
+
+def test_claim_leases_the_oldest_queued_job_once():
+    async def scenario():
+        queue = new_queue()
+        first = await queue.enqueue({"n": 1}, {}, job_id="a")
+        await queue.enqueue({"n": 2}, {}, job_id="b")
+        claimed = [await queue.claim("w1"), await queue.claim("w2"), await queue.claim("w3")]
+        return first, claimed
+
+    first, (one, two, none) = asyncio.run(scenario())
+    assert first["status"] == QUEUED and first["finished_at"] is None
+    assert (one["_id"], one["status"], one["worker_id"], one["attempts"], one["attempts_left"]) == ("a", RUNNING, "w1", 1, 2)
+    assert two["_id"] == "b"
+    assert none is None
+
+
+def test_expired_lease_is_reclaimed_and_the_old_owner_is_locked_out():
+    async def scenario():
+        queue = new_queue()
+        await queue.enqueue({}, {"stress_score": 50}, job_id="a")
+        crashed = await queue.claim("w1")
+        assert await queue.claim("w2") is None  # lease still held
+        await expire_lease(queue, crashed)
+        reclaimed = await queue.claim("w2")
+        with pytest.raises(LeaseLost):
+            await queue.save_progress(crashed, {"explanation": "stale"})
+        await queue.save_progress(reclaimed, {"explanation": "fresh"})
+        await queue.complete(reclaimed, {"stress_score": 50, "explanation": "fresh"})
+        return reclaimed, await queue.get("a")
+
+    reclaimed, job = asyncio.run(scenario())
+    assert (reclaimed["worker_id"], reclaimed["attempts"]) == ("w2", 2)
+    assert job["status"] == COMPLETED
+    assert job["result"]["explanation"] == "fresh"
+    assert job["finished_at"] is not None
+
+
+def test_failures_are_retried_until_max_attempts_then_failed():
+    async def scenario():
+        queue = new_queue(max_attempts=3)
+        await queue.enqueue({}, {}, job_id="a")
+        states = []
+        while (job := await queue.claim("w")) is not None:
+            await queue.fail(job, f"attempt {job['attempts']} failed")
+            stored = await queue.get("a")
+            states.append((stored["status"], stored["error"], stored["finished_at"] is not None))
+        return states
+
+    assert asyncio.run(scenario()) == [
+        (QUEUED, "attempt 1 failed", False),
+        (QUEUED, "attempt 2 failed", False),
+        (FAILED, "attempt 3 failed", True),
+    ]
+
+
+def test_retry_waits_for_the_backoff():
+    async def scenario():
+        queue = new_queue(retry_backoff_seconds=60)
+        await queue.enqueue({}, {}, job_id="a")
+        await queue.fail(await queue.claim("w"), "boom")
+        return await queue.claim("w"), await queue.get("a")
+
+    claimed, job = asyncio.run(scenario())
+    assert claimed is None
+    assert (job["status"], job["error"], job["attempts_left"]) == (QUEUED, "boom", 2)
+
+
+def test_crash_on_the_last_attempt_is_marked_failed():
+    async def scenario():
+        queue = new_queue(max_attempts=1)
+        await queue.enqueue({}, {}, job_id="a")
+        job = await queue.claim("w")
+        assert await queue.fail_abandoned() == 0  # lease still held
+        await expire_lease(queue, job)
+        failed = await queue.fail_abandoned()
+        return failed, await queue.claim("w"), await queue.get("a"), await queue.counts()
+
+    failed, claimed, job, counts = asyncio.run(scenario())
+    assert failed == 1 and claimed is None
+    assert (job["status"], job["error"]) == (FAILED, "Worker lease expired")
+    assert job["finished_at"] is not None
+    assert counts == {QUEUED: 0, RUNNING: 0, COMPLETED: 0, FAILED: 1}
+
+
+def test_finished_jobs_expire_through_a_ttl_index():
+    async def scenario():
+        queue = new_queue(retention_seconds=3600)
+        await queue.ensure_indexes()
+        return await queue.collection.index_information()
+
+    ttl = [index for index in asyncio.run(scenario()).values() if "expireAfterSeconds" in index]
+    assert ttl == [{"key": [("finished_at", 1)], "expireAfterSeconds": 3600, "v": 2}]
+
+
+def test_pool_retries_a_failing_handler_and_completes_the_job():
+    calls = []
+
+    async def handler(job, queue):
+        calls.append(job["attempts"])
+        if job["attempts"] < 3:
+            raise RuntimeError("LLM unavailable")
+        await queue.save_progress(job, {"explanation": "done"})
+        return {"id": job["_id"], "explanation": "done"}
+
+    async def scenario():
+        queue = new_queue(max_attempts=3)
+        await queue.enqueue({}, {}, job_id="ok")
+        pool = JobWorkerPool(queue, handler, concurrency=2, poll_interval=0.01)
+        pool.start()
+        while (await queue.get("ok"))["status"] != COMPLETED:
+            await asyncio.sleep(0.01)
+        await pool.stop(grace_seconds=1)
+        return await queue.get("ok")
+
+    job = asyncio.run(scenario())
+    assert calls == [1, 2, 3]
+    assert (job["attempts"], job["error"], job["result"]) == (3, None, {"id": "ok", "explanation": "done"})
+
+
+def test_pool_gives_up_after_max_attempts():
+    async def handler(job, queue):
+        raise ValueError(f"bad payload {job['attempts']}")
+
+    async def scenario():
+        queue = new_queue(max_attempts=2)
+        await queue.enqueue({}, {}, job_id="bad")
+        pool = JobWorkerPool(queue, handler, concurrency=1, poll_interval=0.01)
+        pool.start()
+        while (await queue.get("bad"))["status"] != FAILED:
+            await asyncio.sleep(0.01)
+        await pool.stop(grace_seconds=1)
+        return await queue.get("bad")
+
+    job = asyncio.run(scenario())
+    assert (job["attempts"], job["attempts_left"], job["error"]) == (2, 0, "bad payload 2")
@@ -0,0 +1,95 @@
+"""CompactCodec round trips, unknown enum codes and shared-content copies (on mongomock)."""
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from compact_storage import STORAGE_FORMAT, CompactCodec, SharedContent, decode_questionnaire, encode_questionnaire
+
+RESOURCES = [{"name": "Helpline", "phone": "1800-599-0019"}, {"name": "Counselling", "url": "https://example.org"}]
+TIPS = ["Share your location", "Save emergency contacts"]
+
+
+def assessment(questionnaire, **fields):
+    return {
+        "id": "a1", "timestamp": "2026-01-01T00:00:00+00:00", "questionnaire": questionnaire,
+        "stress_score": 70, "stress_level": "high", "key_stressors": ["High workload"],
+        "explanation": "You are working long hours. " * 20, "daily_plan": ["Walk"] * 10,
+        "resources": RESOURCES, "safety_tips": list(TIPS), **fields,
+    }
+
+
+def new_codec(publish=True, **options):
+    shared = SharedContent(AsyncMongoMockClient().db.shared_content)
+    shared.register("resources", RESOURCES)
+    shared.register("safety_tips", TIPS)
+    if publish:
+        asyncio.run(shared.publish())
+    return CompactCodec(shared, **options)
+
+
+def test_round_trip_restores_the_document(questionnaire):
+    codec = new_codec()
+    doc = assessment(dict(questionnaire, physical_symptoms=["headache", "back_pain", "tinnitus"], age_group="60+"))
+    encoded = codec.encode(doc)
+
+    assert encoded["storage_format"] == STORAGE_FORMAT
+    assert encoded["resources"]["ref"].startswith("resources:") and encoded["safety_tips"]["ref"].startswith("safety_tips:")
+    assert "compressed" in encoded and "explanation" not in encoded and "daily_plan" not in encoded
+    assert encoded["questionnaire"]["anxiety_frequency"] == 2
+    assert encoded["questionnaire"]["physical_symptoms"] == [0, 3, "tinnitus"]
+    assert encoded["questionnaire"]["age_group"] == "60+"
+    assert encoded["stress_score"] == 70 and encoded["key_stressors"] == ["High workload"]
+
+    decoded = asyncio.run(codec.decode(encoded))
+    assert decoded == doc
+    assert list(decoded) == list(doc)
+
+
+def test_plain_and_small_documents(questionnaire):
+    codec = new_codec(publish=False, compress_min_bytes=10 ** 6)
+    doc = assessment(questionnaire)
+    encoded = codec.encode(doc)
+    # Unpublished content stays inline, short text isn't compressed
+    assert encoded["resources"] == RESOURCES and encoded["explanation"] == doc["explanation"]
+    assert asyncio.run(codec.decode(encoded)) == doc
+    assert asyncio.run(codec.decode(doc)) is doc
+    assert codec.encode(encoded) is encoded
+
+
+def test_unknown_enum_codes_are_kept_as_stored(questionnaire):
+    stored = dict(encode_questionnaire(questionnaire), anxiety_frequency=99, burnout_feeling=-1, physical_symptoms=[1, 42])
+    decoded = decode_questionnaire(stored)
+    assert (decoded["anxiety_frequency"], decoded["burnout_feeling"]) == (99, -1)
+    assert decoded["physical_symptoms"] == ["fatigue", 42]
+    assert decoded["family_responsibilities"] == "high"
+
+
+def test_decoded_shared_content_is_a_copy(questionnaire):
+    codec = new_codec()
+
+    async def scenario():
+        encoded = codec.encode(assessment(questionnaire))
+        first, second = await codec.decode_many([encoded, encoded])
+        first["resources"][0]["name"] = "changed"
+        first["safety_tips"].append("changed")
+        return second, await codec.decode(encoded)
+
+    second, again = asyncio.run(scenario())
+    assert second["resources"] == again["resources"] == RESOURCES
+    assert second["safety_tips"] == again["safety_tips"] == TIPS
+
+
+def test_content_missing_from_the_cache_is_fetched_once(questionnaire):
+    codec = new_codec()
+    encoded = codec.encode(assessment(questionnaire))
+    # Another process: same collection, nothing registered
+    reader = CompactCodec(SharedContent(codec.shared.collection))
+
+    async def scenario():
+        first = await reader.decode(encoded)
+        second = await reader.decode(encoded)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first["resources"] == second["resources"] == RESOURCES
+    assert reader.shared.stats()["fetched"] == 2
@@ -0,0 +1,177 @@
+"""Idempotency keys, claims and SingleFlight (on mongomock), and the /analyze duplicate handling."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import DuplicateKeyError
+
+import idempotency
+from idempotency import IdempotencyKeyReused, SingleFlight, SubmissionPending, canonical_hash, claim, find_stored, request_keys
+
+WINDOW = 600
+
+
+def collections():
+    db = AsyncMongoMockClient().db
+    return db.idempotency_keys, db.assessments
+
+
+def test_header_key_is_checked_and_does_not_expire():
+    keys = request_keys(" abc ", {"a": 1}, WINDOW)
+    assert (keys.key, keys.lookup, keys.window) == ("key:abc", ["key:abc"], None)
+    for header in ("   ", "x" * 256):
+        with pytest.raises(ValueError):
+            request_keys(header, {"a": 1}, WINDOW)
+
+
+def test_canonical_hash_ignores_key_order():
+    assert canonical_hash({"a": 1, "b": [1, 2]}) == canonical_hash({"b": [1, 2], "a": 1})
+    assert canonical_hash({"a": 1}) != canonical_hash({"a": 2})
+
+
+def test_derived_key_lookup_reaches_into_the_previous_window():
+    boundary = 100 * WINDOW
+    before = request_keys(None, {"a": 1}, WINDOW, now=boundary - 1)
+    after = request_keys(None, {"a": 1}, WINDOW, now=boundary + 1)
+    assert before.key != after.key
+    assert after.lookup == [after.key, before.key]
+    assert request_keys(None, {"a": 1}, WINDOW, now=boundary + WINDOW + 1).lookup[1] == after.key
+
+
+def test_derived_key_matches_only_submissions_less_than_a_window_ago():
+    async def stored_after(age):
+        claims, assessments = collections()
+        now = datetime.now(timezone.utc)
+        first = request_keys(None, {"a": 1}, WINDOW, now=(now - timedelta(seconds=age)).timestamp())
+        await claim(claims, assessments, first, "first", now - timedelta(seconds=age), pending_seconds=60)
+        await assessments.insert_one({"id": "first"})
+        retry = request_keys(None, {"a": 1}, WINDOW, now=now.timestamp())
+        return await find_stored(claims, assessments, retry, {"_id": 0}, pending_seconds=60)
+
+    # Across the window boundary or not, depending on the clock: both keys are looked up
+    assert asyncio.run(stored_after(WINDOW - 5)) == {"id": "first"}
+    assert asyncio.run(stored_after(WINDOW + 5)) is None
+
+
+def test_claim_is_taken_once_and_a_reused_header_key_is_rejected():
+    async def scenario():
+        claims, assessments = collections()
+        keys = request_keys("k", {"a": 1}, WINDOW)
+        await claim(claims, assessments, keys, "first", datetime.now(timezone.utc), pending_seconds=60)
+        with pytest.raises(DuplicateKeyError):
+            await claim(claims, assessments, keys, "second", datetime.now(timezone.utc), pending_seconds=60)
+        with pytest.raises(SubmissionPending):
+            await find_stored(claims, assessments, keys, {"_id": 0}, pending_seconds=60)
+        await assessments.insert_one({"id": "first"})
+        replay = await find_stored(claims, assessments, keys, {"_id": 0}, pending_seconds=60)
+        with pytest.raises(IdempotencyKeyReused):
+            await find_stored(claims, assessments, request_keys("k", {"a": 2}, WINDOW), {"_id": 0}, pending_seconds=60)
+        return replay
+
+    assert asyncio.run(scenario()) == {"id": "first"}
+
+
+def test_abandoned_claim_is_taken_over():
+    async def scenario():
+        claims, assessments = collections()
+        keys = request_keys("k", {"a": 1}, WINDOW)
+        long_ago = datetime.now(timezone.utc) - timedelta(seconds=120)
+        await claim(claims, assessments, keys, "crashed", long_ago, pending_seconds=60)
+        missing = await find_stored(claims, assessments, keys, {"_id": 0}, pending_seconds=60)
+        await claim(claims, assessments, keys, "retry", datetime.now(timezone.utc), pending_seconds=60)
+        return missing, (await claims.find_one({"_id": "key:k"}))["assessment_id"]
+
+    assert asyncio.run(scenario()) == (None, "retry")
+
+
+def test_released_claim_can_be_claimed_again():
+    async def scenario():
+        claims, assessments = collections()
+        keys = request_keys("k", {"a": 1}, WINDOW)
+        await claim(claims, assessments, keys, "failed", datetime.now(timezone.utc), pending_seconds=60)
+        await idempotency.release(claims, keys, "failed")
+        await claim(claims, assessments, keys, "retry", datetime.now(timezone.utc), pending_seconds=60)
+        return await claims.count_documents({})
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_single_flight_shares_one_execution_between_concurrent_callers():
+    runs = []
+
+    async def work(name):
+        runs.append(name)
+        await asyncio.sleep(0.01)
+        return name
+
+    async def scenario():
+        flights = SingleFlight()
+        results = await asyncio.gather(
+            flights.run("a", lambda: work("a1")), flights.run("a", lambda: work("a2")), flights.run("b", lambda: work("b"))
+        )
+        return results, flights.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == ["a1", "a1", "b"]
+    assert runs == ["a1", "b"]
+    assert stats == {"in_flight": 0, "executions": 2, "shared": 1}
+
+
+def test_single_flight_keeps_running_when_a_caller_goes_away():
+    async def scenario():
+        flights = SingleFlight()
+        done = asyncio.Event()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            done.set()
+            return "done"
+
+        leaving = asyncio.create_task(flights.run("a", work))
+        staying = asyncio.create_task(flights.run("a", work))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        return await staying, done.is_set()
+
+    assert asyncio.run(scenario()) == ("done", True)
+
+
+def test_analyze_collapses_duplicates_and_rejects_a_reused_key(call_api, server, questionnaire):
+    async def scenario(client):
+        headers = {"Idempotency-Key": "submit-1"}
+        first, second = await asyncio.gather(
+            client.post("/api/assessment/analyze", json=questionnaire, headers=headers),
+            client.post("/api/assessment/analyze", json=questionnaire, headers=headers),
+        )
+        retry = await client.post("/api/assessment/analyze", json=questionnaire, headers=headers)
+        reused = await client.post("/api/assessment/analyze", json=dict(questionnaire, city="Pune"), headers=headers)
+        stored = await server.db.assessments.count_documents({})
+        return first, second, retry, reused, stored
+
+    first, second, retry, reused, stored = call_api(scenario)
+    assert first.status_code == second.status_code == retry.status_code == 200
+    assert first.json()["id"] == second.json()["id"] == retry.json()["id"]
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert reused.status_code == 422
+    assert stored == 1
+
+
+def test_analyze_after_losing_the_claim_race(call_api, server, questionnaire, monkeypatch):
+    async def scenario(client):
+        headers = {"Idempotency-Key": "race"}
+        first = await client.post("/api/assessment/analyze", json=questionnaire, headers=headers)
+
+        async def missed(keys):
+            return None  # as if the other process claimed the key right after this lookup
+
+        monkeypatch.setattr(server, "find_idempotent_assessment", missed)
+        same = await client.post("/api/assessment/analyze", json=questionnaire, headers=headers)
+        different = await client.post("/api/assessment/analyze", json=dict(questionnaire, city="Pune"), headers=headers)
+        return first, same, different, await server.db.assessments.count_documents({})
+
+    first, same, different, stored = call_api(scenario)
+    assert same.status_code == 200 and same.json()["id"] == first.json()["id"]
+    assert same.headers["Idempotent-Replayed"] == "true"
+    assert different.status_code == 422
+    assert stored == 1
@@ -0,0 +1,154 @@
+"""LlmConcurrencyLimiter slots, queueing, rejection and weighted fair ordering, and the 429 it becomes in the API."""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from llm_limiter import LlmConcurrencyLimiter, LlmQueueFull, parse_weights  # noqa: E402
+
+
+async def hold(limiter, release, running, order, name, **slot):
+    async with limiter.slot(**slot):
+        order.append(name)
+        running.append(name)
+        await release.wait()
+        running.remove(name)
+
+
+def test_calls_beyond_max_concurrency_wait_for_a_slot():
+    async def scenario():
+        limiter = LlmConcurrencyLimiter(max_concurrency=2, max_queue=10)
+        release, running, order = asyncio.Event(), [], []
+        tasks = [asyncio.create_task(hold(limiter, release, running, order, n)) for n in range(5)]
+        await asyncio.sleep(0.01)
+        during = list(running), limiter.stats()
+        release.set()
+        await asyncio.gather(*tasks)
+        return during, order, limiter.stats()
+
+    (running, during), order, after = asyncio.run(scenario())
+    assert running == [0, 1]
+    assert (during["in_flight"], during["queue_depth"]) == (2, 3)
+    assert order == [0, 1, 2, 3, 4]
+    assert (after["in_flight"], after["queue_depth"], after["max_queue_depth"], after["admitted"]) == (0, 0, 3, 5)
+
+
+def test_full_queue_rejects_immediately():
+    async def scenario():
+        limiter = LlmConcurrencyLimiter(max_concurrency=1, max_queue=1)
+        release, running, order = asyncio.Event(), [], []
+        tasks = [asyncio.create_task(hold(limiter, release, running, order, n)) for n in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(LlmQueueFull) as rejected:
+            async with limiter.slot():
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return rejected.value, limiter.stats()
+
+    rejected, stats = asyncio.run(scenario())
+    assert rejected.retry_after >= 1
+    assert (stats["admitted"], stats["rejected"]) == (2, 1)
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        limiter = LlmConcurrencyLimiter(max_concurrency=1, max_queue=5)
+        release, running, order = asyncio.Event(), [], []
+        first = asyncio.create_task(hold(limiter, release, running, order, "first"))
+        await asyncio.sleep(0)
+        leaving = asyncio.create_task(hold(limiter, release, running, order, "leaving"))
+        staying = asyncio.create_task(hold(limiter, release, running, order, "staying"))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, staying)
+        return order, limiter.stats(), limiter._free
+
+    order, stats, free = asyncio.run(scenario())
+    assert order == ["first", "staying"]
+    assert (stats["in_flight"], stats["queue_depth"], free) == (0, 0, 1)
+
+
+def test_retry_after_grows_with_the_queue():
+    limiter = LlmConcurrencyLimiter(max_concurrency=2, max_queue=10)
+    limiter._durations.extend([2.0, 2.0])
+    assert limiter.retry_after() == 2
+    limiter.waiting = 4
+    assert limiter.retry_after() == 6
+
+
+def served_order(limiter, *calls, pause=0.0):
+    """Names of queued ``(name, priority, client)`` calls in the order they got the one busy slot"""
+    async def scenario():
+        release, running, order = asyncio.Event(), [], []
+        tasks = [asyncio.create_task(hold(limiter, release, running, order, "busy"))]
+        await asyncio.sleep(0)
+        for name, priority, client in calls:
+            tasks.append(asyncio.create_task(hold(limiter, release, running, order, name, priority=priority, client=client)))
+            if pause and name == calls[0][0]:
+                await asyncio.sleep(pause)
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*tasks)
+        return order[1:]
+    return asyncio.run(scenario())
+
+
+def test_high_priority_gets_weights_many_slots_per_low_one():
+    limiter = LlmConcurrencyLimiter(max_concurrency=1, max_queue=50, aging_seconds=0)
+    calls = [(f"low{n}", "low", "") for n in range(5)] + [(f"high{n}", "high", "") for n in range(10)]
+    order = served_order(limiter, *calls)
+    # Finish tags: high n/8, low n/1; the tie at 1.0 goes to the earlier low call
+    assert order == [f"high{n}" for n in range(7)] + ["low0"] + [f"high{n}" for n in range(7, 10)] + [f"low{n}" for n in range(1, 5)]
+
+
+def test_a_busy_client_does_not_hold_up_others_of_the_same_priority():
+    limiter = LlmConcurrencyLimiter(max_concurrency=1, max_queue=50, aging_seconds=0)
+    calls = [(f"a{n}", "normal", "a") for n in range(5)] + [(f"b{n}", "normal", "b") for n in range(2)]
+    assert served_order(limiter, *calls) == ["a0", "b0", "a1", "b1", "a2", "a3", "a4"]
+
+
+def test_unknown_priority_is_served_as_normal():
+    limiter = LlmConcurrencyLimiter(max_concurrency=1, max_queue=50, aging_seconds=0)
+    order = served_order(limiter, ("urgent", "urgent", "x"), ("normal", "normal", "y"), ("high", "high", "z"))
+    assert order == ["high", "urgent", "normal"]
+    assert limiter.stats()["priorities"]["normal"]["admitted"] == 3  # with the busy call
+
+
+def test_aging_lets_a_long_waiting_low_call_go_first():
+    calls = [("low", "low", "a")] + [(f"high{n}", "high", "b") for n in range(3)]
+    fresh = LlmConcurrencyLimiter(max_concurrency=1, max_queue=50, aging_seconds=0)
+    assert served_order(fresh, *calls, pause=0.05)[0] == "high0"
+    aged = LlmConcurrencyLimiter(max_concurrency=1, max_queue=50, aging_seconds=0.01)
+    assert served_order(aged, *calls, pause=0.05)[0] == "low"
+
+
+def test_parse_weights():
+    assert parse_weights("high=10, low=0.5") == {"high": 10.0, "normal": 3, "low": 0.5}
+    for spec in ("urgent=2", "high=0", "high=x"):
+        with pytest.raises(ValueError):
+            parse_weights(spec)
+
+
+def test_analyze_answers_429_when_the_llm_queue_is_full(call_api, server, questionnaire, monkeypatch):
+    limiter = LlmConcurrencyLimiter(max_concurrency=1, max_queue=1)
+    monkeypatch.setattr(server, "llm_limiter", limiter)
+
+    async def scenario(client):
+        release, running, order = asyncio.Event(), [], []
+        busy = [asyncio.create_task(hold(limiter, release, running, order, n)) for n in range(2)]
+        await asyncio.sleep(0.01)
+        response = await client.post("/api/assessment/analyze", json=questionnaire)
+        release.set()
+        await asyncio.gather(*busy)
+        return response, await server.db.assessments.count_documents({})
+
+    response, stored = call_api(scenario)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert stored == 0
@@ -0,0 +1,174 @@
+"""CircuitBreaker state transitions and HedgedCalls delay, winner and hedge budget."""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from llm_resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, HedgedCalls  # noqa: E402
+
+
+def new_breaker(**options):
+    transitions = []
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30, on_transition=transitions.append, **options)
+    return breaker, transitions
+
+
+def cool_down(breaker):
+    """As if the cooldown had passed since the breaker opened (or the probe started)"""
+    breaker.opened_at -= breaker.cooldown
+    if breaker.probe_started_at is not None:
+        breaker.probe_started_at -= breaker.cooldown
+
+
+def test_opens_after_consecutive_failures_only():
+    breaker, transitions = new_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # resets the count
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpen) as short_circuited:
+        breaker.check()
+    assert transitions == [OPEN]
+    assert 29 < short_circuited.value.retry_after <= 30
+    assert (breaker.stats()["opened"], breaker.stats()["short_circuited"]) == (1, 1)
+
+
+def test_half_open_lets_one_probe_through_and_closes_on_success():
+    breaker, transitions = new_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    cool_down(breaker)
+    breaker.check()  # the probe
+    with pytest.raises(CircuitOpen):
+        breaker.check()  # everyone else still gets default content
+    assert breaker.state == HALF_OPEN
+    breaker.record_success()
+    breaker.check()
+    assert transitions == [OPEN, HALF_OPEN, CLOSED]
+    assert breaker.consecutive_failures == 0
+
+
+def test_failed_probe_opens_the_breaker_again():
+    breaker, transitions = new_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    cool_down(breaker)
+    breaker.check()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    assert transitions == [OPEN, HALF_OPEN, OPEN]
+    assert breaker.stats()["opened"] == 2
+
+
+def test_abandoned_probe_is_replaced_after_a_cooldown():
+    breaker, _ = new_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    cool_down(breaker)
+    breaker.check()  # its caller is cancelled, nothing is recorded
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    cool_down(breaker)
+    breaker.check()
+    assert breaker.state == HALF_OPEN
+
+
+def test_recheck_catches_a_breaker_that_opened_meanwhile():
+    breaker, _ = new_breaker()
+    breaker.check()
+    breaker.recheck()
+    for _ in range(3):
+        breaker.record_failure()
+    with pytest.raises(CircuitOpen):
+        breaker.recheck()
+
+
+def test_disabled_breaker_never_opens():
+    breaker, transitions = new_breaker(enabled=False)
+    for _ in range(10):
+        breaker.record_failure()
+    breaker.check()
+    assert (breaker.state, transitions) == (CLOSED, [])
+
+
+def primed(max_ratio=1.0, latency=0.01):
+    hedging = HedgedCalls(enabled=True, min_delay=0.01, min_samples=5, max_ratio=max_ratio)
+    hedging._latencies["plan"].extend([latency] * 100)
+    return hedging
+
+
+def calls(*delays):
+    """A call whose n-th invocation takes delays[n] seconds and returns n"""
+    sent = []
+
+    async def call():
+        n = len(sent)
+        sent.append(n)
+        await asyncio.sleep(delays[n])
+        return n
+    return call, sent
+
+
+def test_no_hedge_until_enough_latencies_are_known():
+    hedging = HedgedCalls(enabled=True, min_samples=5)
+    call, sent = calls(0.03)
+    assert asyncio.run(hedging.run("plan", call)) == 0
+    assert (sent, hedging.delay("plan"), hedging.hedged) == ([0], None, 0)
+
+
+def test_slow_primary_is_hedged_and_the_hedge_wins():
+    winners = []
+    hedging = primed()
+    hedging.on_result = lambda stage, winner: winners.append((stage, winner))
+    call, sent = calls(1.0, 0.0)
+    assert asyncio.run(hedging.run("plan", call)) == 1
+    assert sent == [0, 1]
+    assert winners == [("plan", "hedge")]
+    assert hedging.stats()["hedge_win_rate"] == 1.0
+
+
+def test_fast_primary_is_not_hedged():
+    hedging = primed()
+    call, sent = calls(0.0)
+    assert asyncio.run(hedging.run("plan", call)) == 0
+    assert (sent, hedging.hedged) == ([0], 0)
+
+
+def test_hedges_are_capped_at_max_ratio_of_calls():
+    hedging = primed(max_ratio=0.5)
+
+    async def scenario():
+        for _ in range(4):
+            call, _ = calls(0.05, 0.05)
+            await hedging.run("plan", call)
+
+    asyncio.run(scenario())
+    assert (hedging.calls, hedging.hedged) == (4, 2)
+
+
+def test_no_hedge_without_spare_capacity():
+    hedging = primed()
+    call, sent = calls(0.05, 0.0)
+    assert asyncio.run(hedging.run("plan", call, can_hedge=lambda: False)) == 0
+    assert sent == [0]
+
+
+def test_error_is_raised_when_both_calls_fail():
+    winners = []
+    hedging = primed()
+    hedging.on_result = lambda stage, winner: winners.append(winner)
+
+    async def failing():
+        await asyncio.sleep(0.03)
+        raise RuntimeError("upstream error")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(hedging.run("plan", failing))
+    assert (hedging.hedged, winners) == (1, ["none"])
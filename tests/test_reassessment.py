@@ -0,0 +1,121 @@
+"""Section input diffing, and which sections POST /assessments/{id}/reassess reuses (on mongomock)."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from reassessment import AssessmentInputs, SectionInputs, changed_fields, changed_inputs, input_values  # noqa: E402
+
+PLAN = SectionInputs(prediction=("stress_level",), stressors=2, questionnaire=("sleep_hours",))
+BEFORE = AssessmentInputs({"stress_level": "high", "stress_score": 80}, ["Long work hours", "High workload", "Night shift work"], {"sleep_hours": 5, "city": "Pune"})
+
+
+def test_changed_fields_in_the_order_of_the_retake():
+    assert changed_fields({"a": 1, "b": 2, "c": 3}, {"c": 4, "a": 1, "b": 5, "d": None}) == ["c", "b"]
+
+
+def test_input_values_take_only_the_declared_inputs():
+    assert input_values(PLAN, BEFORE) == {
+        "prediction.stress_level": "high",
+        "stressors": ["Long work hours", "High workload"],
+        "questionnaire.sleep_hours": 5,
+    }
+    assert "stressors" not in input_values(SectionInputs(stressors=0), BEFORE)
+    assert len(input_values(SectionInputs(), BEFORE)["stressors"]) == 3
+
+
+def test_only_changes_to_a_sections_inputs_count():
+    unrelated = BEFORE._replace(
+        prediction={**BEFORE.prediction, "stress_score": 85},
+        stressors=BEFORE.stressors[:2] + ["Long commute"],
+        questionnaire={**BEFORE.questionnaire, "city": "Chennai"},
+    )
+    assert changed_inputs(PLAN, BEFORE, unrelated) == []
+
+    changed = BEFORE._replace(stressors=["High workload", "Long work hours"], questionnaire={**BEFORE.questionnaire, "sleep_hours": 7})
+    assert changed_inputs(PLAN, BEFORE, changed) == ["stressors", "questionnaire.sleep_hours"]
+
+
+async def written_assessment(server, client, questionnaire):
+    """An assessment whose sections look LLM-written (the LLM isn't reachable in tests, so defaults are stored)"""
+    first = (await client.post("/api/assessment/analyze", json=questionnaire)).json()
+    await server.assessment_writer.flush()
+    doc = await server.assessment_codec.decode(await server.db.assessments.find_one({"id": first["id"]}))
+    doc.update(
+        explanation="Written for you.",
+        daily_plan=[{**day, "message": f"Day {day['day']}, written for you."} for day in doc["daily_plan"]],
+        flex_suggestions=["Ask for a written for you schedule"],
+        email_to_manager="Dear manager, written for you.",
+        email_to_hr="Dear HR, written for you.",
+    )
+    await server.db.assessments.replace_one({"id": first["id"]}, doc)
+    return doc
+
+
+def outcomes(report):
+    return {stage: (section["outcome"], section["changed_inputs"]) for stage, section in report["sections"].items()}
+
+
+def test_retake_reuses_the_sections_whose_inputs_did_not_change(call_api, server, questionnaire):
+    async def scenario(client):
+        previous = await written_assessment(server, client, questionnaire)
+        retake = dict(questionnaire, flexible_hours=False, city="Pune")
+        response = await client.post(f"/api/assessments/{previous['id']}/reassess", json=retake)
+        return previous, response
+
+    previous, response = call_api(scenario)
+    assert response.status_code == 200
+    result = response.json()
+    report = result["reassessment"]
+    assert (report["previous_id"], report["changed_fields"]) == (previous["id"], ["flexible_hours", "city"])
+    assert report["reused"] == ["empathy", "daily_plan"]
+    assert outcomes(report) == {
+        "empathy": ("reused", []),
+        "daily_plan": ("reused", []),
+        "workplace": ("inputs_changed", ["questionnaire.flexible_hours"]),
+    }
+    assert result["id"] != previous["id"]
+    assert result["explanation"] == "Written for you."
+    assert result["daily_plan"] == previous["daily_plan"]
+    assert result["email_to_manager"] != previous["email_to_manager"]
+
+
+def test_changed_answers_and_scores_regenerate_their_sections(call_api, server, questionnaire):
+    async def scenario(client):
+        previous = await written_assessment(server, client, questionnaire)
+        retake = dict(questionnaire, sleep_hours=4.5, work_hours_per_day=8)
+        return (await client.post(f"/api/assessments/{previous['id']}/reassess", json=retake)).json()
+
+    sections = outcomes(call_api(scenario)["reassessment"])
+    assert sections["daily_plan"][0] == "inputs_changed"
+    assert {"stressors", "questionnaire.sleep_hours", "questionnaire.work_hours_per_day"} <= set(sections["daily_plan"][1])
+    assert sections["workplace"] == ("inputs_changed", ["stressors", "questionnaire.work_hours_per_day"])
+
+
+def test_default_content_is_not_reused(call_api, server, questionnaire):
+    async def scenario(client):
+        first = (await client.post("/api/assessment/analyze", json=questionnaire)).json()
+        await server.assessment_writer.flush()
+        return (await client.post(f"/api/assessments/{first['id']}/reassess", json=questionnaire)).json()
+
+    report = call_api(scenario)["reassessment"]
+    assert report["changed_fields"] == [] and report["reused"] == []
+    assert {outcome for outcome, _ in outcomes(report).values()} == {"fallback"}
+
+
+def test_previous_answers_that_no_longer_validate(call_api, server, questionnaire):
+    async def scenario(client):
+        previous = await written_assessment(server, client, questionnaire)
+        await server.db.assessments.update_one({"id": previous["id"]}, {"$unset": {"questionnaire.sleep_hours": ""}})
+        return (await client.post(f"/api/assessments/{previous['id']}/reassess", json=questionnaire)).json()
+
+    report = call_api(scenario)["reassessment"]
+    assert (report["changed_fields"], report["reused"]) == (None, [])
+    assert {outcome for outcome, _ in outcomes(report).values()} == {"no_previous_answers"}
+
+
+def test_unknown_assessment(call_api, questionnaire):
+    async def scenario(client):
+        return await client.post("/api/assessments/missing/reassess", json=questionnaire)
+
+    assert call_api(scenario).status_code == 404
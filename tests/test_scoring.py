@@ -0,0 +1,162 @@
+"""The compiled heuristic-v1 scoring model against the hand-written formulas it replaced.
+
+``legacy_*`` are the original simulate_prediction / extract_key_stressors,
+verbatim. Every questionnaire of a grid over each rule's threshold (and past
+the form's ranges, so clamping is hit) must get the same scores, bands and
+stressors from the generated single-questionnaire functions and from the
+NumPy batch path.
+"""
+import itertools
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from scoring import columns_from_questionnaires, load_model
+
+MODEL_PATH = Path(__file__).resolve().parent.parent / "backend" / "scoring_models" / "heuristic-v1.json"
+
+ANXIETY_POINTS = {"always": 25, "often": 15, "sometimes": 8, "rarely": 2}
+BURNOUT_FEELING_POINTS = {"severe": 30, "moderate": 20, "mild": 10, "none": 0}
+FAMILY_POINTS = {"high": 15, "medium": 8, "low": 3}
+SAFETY_CONCERN_POINTS = {"major": 25, "moderate": 15, "minor": 8, "none": 0}
+SYMPTOMS = ["headache", "fatigue", "insomnia", "back pain", "anxiety"]
+
+
+def legacy_simulate_prediction(questionnaire):
+    stress_factors = [
+        (questionnaire.work_hours_per_day - 8) * 5,
+        (8 - questionnaire.sleep_hours) * 8,
+        questionnaire.commute_time_minutes / 3,
+        questionnaire.workload_level * 5,
+        questionnaire.deadline_pressure * 4,
+        (10 - questionnaire.manager_support) * 3,
+        (10 - questionnaire.work_life_balance) * 4,
+        questionnaire.stress_level * 4
+    ]
+    stress_score = min(100, max(0, int(sum(stress_factors))))
+    burnout_factors = [
+        stress_score * 0.3,
+        (10 - questionnaire.career_growth) * 3,
+        (10 - questionnaire.team_support) * 2,
+        ANXIETY_POINTS.get(questionnaire.anxiety_frequency, 0),
+        BURNOUT_FEELING_POINTS.get(questionnaire.burnout_feeling, 0),
+        len(questionnaire.physical_symptoms) * 5,
+        FAMILY_POINTS.get(questionnaire.family_responsibilities, 0)
+    ]
+    burnout_score = min(100, max(0, int(sum(burnout_factors))))
+    safety_factors = [
+        20 if questionnaire.night_shifts else 0,
+        min(15, questionnaire.commute_time_minutes / 4),
+        SAFETY_CONCERN_POINTS.get(questionnaire.safety_concerns, 0),
+        10 if questionnaire.workplace_bias_experienced else 0
+    ]
+    safety_score = min(100, max(0, int(sum(safety_factors))))
+    return {
+        "stress_score": stress_score,
+        "stress_level": "high" if stress_score > 65 else "medium" if stress_score > 35 else "low",
+        "burnout_score": burnout_score,
+        "burnout_risk": "high" if burnout_score > 65 else "medium" if burnout_score > 35 else "low",
+        "safety_score": safety_score,
+        "safety_risk": "high" if safety_score > 50 else "medium" if safety_score > 25 else "low"
+    }
+
+
+def legacy_extract_key_stressors(questionnaire):
+    stressors = []
+    if questionnaire.work_hours_per_day > 9:
+        stressors.append(f"Long work hours ({questionnaire.work_hours_per_day}h/day)")
+    if questionnaire.sleep_hours < 6:
+        stressors.append(f"Insufficient sleep ({questionnaire.sleep_hours}h)")
+    if questionnaire.workload_level >= 7:
+        stressors.append("High workload")
+    if questionnaire.deadline_pressure >= 7:
+        stressors.append("High deadline pressure")
+    if questionnaire.manager_support <= 4:
+        stressors.append("Low manager support")
+    if questionnaire.work_life_balance <= 4:
+        stressors.append("Poor work-life balance")
+    if questionnaire.commute_time_minutes > 60:
+        stressors.append(f"Long commute ({questionnaire.commute_time_minutes} min)")
+    if questionnaire.night_shifts:
+        stressors.append("Night shift work")
+    if questionnaire.workplace_bias_experienced:
+        stressors.append("Workplace bias/discrimination")
+    if questionnaire.family_responsibilities == "high":
+        stressors.append("High family responsibilities")
+    if len(questionnaire.physical_symptoms) > 2:
+        stressors.append(f"Multiple physical symptoms ({', '.join(questionnaire.physical_symptoms[:3])})")
+    return stressors[:7]
+
+
+# Values on both sides of every threshold; the grid covers the numeric ones, the rest cycle
+NUMERIC = {
+    "work_hours_per_day": [0, 8, 9, 10, 24],
+    "sleep_hours": [0.0, 5.5, 6.0, 8.0, 12.5],
+    "commute_time_minutes": [0, 60, 61, 240],
+    "workload_level": [1, 6, 7, 10],
+    "manager_support": [1, 4, 5, 10],
+    "work_life_balance": [1, 4, 5, 10],
+    "physical_symptoms": [SYMPTOMS[:n] for n in (0, 2, 3, 5)],
+}
+CYCLED = {
+    "deadline_pressure": [1, 6, 7, 10],
+    "team_support": [1, 5, 10],
+    "career_growth": [1, 5, 10],
+    "stress_level": [1, 5, 10],
+    "night_shifts": [False, True],
+    "workplace_bias_experienced": [True, False, False],
+    "anxiety_frequency": ["rarely", "sometimes", "often", "always", "unknown"],
+    "burnout_feeling": ["none", "mild", "moderate", "severe"],
+    "family_responsibilities": ["low", "medium", "high"],
+    "safety_concerns": ["none", "minor", "moderate", "major"],
+}
+
+
+def grid():
+    rows = []
+    for i, values in enumerate(itertools.product(*NUMERIC.values())):
+        answers = dict(zip(NUMERIC, values))
+        answers.update((field, options[i % len(options)]) for field, options in CYCLED.items())
+        rows.append(SimpleNamespace(**answers))
+    return rows
+
+
+@pytest.fixture(scope="module")
+def model():
+    return load_model(MODEL_PATH)
+
+
+@pytest.fixture(scope="module")
+def questionnaires():
+    return grid()
+
+
+def expected(model, q):
+    return {**legacy_simulate_prediction(q), "model_version": model.version}
+
+
+def test_grid_reaches_every_band(questionnaires):
+    predictions = [legacy_simulate_prediction(q) for q in questionnaires]
+    for band in ("stress_level", "burnout_risk", "safety_risk"):
+        assert {p[band] for p in predictions} == {"low", "medium", "high"}
+    assert {p["stress_score"] for p in predictions} >= {0, 100}
+    assert max(len(legacy_extract_key_stressors(q)) for q in questionnaires) == 7
+
+
+def test_compiled_functions_match_the_formulas(model, questionnaires):
+    for q in questionnaires:
+        prediction = model.predict(q)
+        keys = prediction.pop("stressor_keys")
+        assert prediction == expected(model, q), vars(q)
+        assert model.stressors(q) == legacy_extract_key_stressors(q), vars(q)
+        assert len(keys) == len(legacy_extract_key_stressors(q))
+
+
+def test_batch_path_matches_the_formulas(model, questionnaires):
+    rows = model.score_rows(columns_from_questionnaires(questionnaires, model.fields))
+    assert len(rows) == len(questionnaires)
+    for q, row in zip(questionnaires, rows):
+        keys = row.pop("stressor_keys")
+        assert row == {**expected(model, q), "key_stressors": legacy_extract_key_stressors(q)}, vars(q)
+        assert keys == model.predict(q)["stressor_keys"]
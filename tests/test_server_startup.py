@@ -0,0 +1,74 @@
+"""Startup against an unavailable MongoDB: the lifespan keeps serving and leaves setup to the background retry."""
+import asyncio
+
+from pymongo.errors import ServerSelectionTimeoutError
+
+
+def unavailable(*args):
+    raise ServerSelectionTimeoutError("no servers")
+
+
+def recorded_setup(server, monkeypatch, fail=()):
+    """Replace INDEX_SETUP and publishing with calls that are recorded (and fail for the names in ``fail``)"""
+    calls = []
+
+    def setup(name):
+        async def create():
+            calls.append(name)
+            if name in fail:
+                raise ServerSelectionTimeoutError("no servers")
+        return create
+
+    async def publish():
+        calls.append("publish")
+
+    monkeypatch.setattr(server, "INDEX_SETUP", {name: setup(name) for name in ("a", "b", "c")})
+    monkeypatch.setattr(server, "failed_indexes", {})
+    monkeypatch.setattr(server, "publish_shared_content", publish)
+    return calls
+
+
+def test_unavailable_database_skips_index_creation_and_publishing(call_api, server, monkeypatch):
+    calls = recorded_setup(server, monkeypatch)
+    monkeypatch.setattr(server.mongo, "warm_up", lambda connections: unavailable())
+
+    async def scenario(client):
+        return await client.get("/api/")
+
+    assert call_api(scenario).status_code == 200
+    assert calls == []
+    assert list(server.failed_indexes) == ["a", "b", "c"]
+    assert server.failed_indexes["a"] == "MongoDB unavailable at startup: no servers"
+
+
+def test_failed_connect_is_caught(call_api, server, monkeypatch):
+    calls = recorded_setup(server, monkeypatch)
+    monkeypatch.setattr(server.mongo, "connect", unavailable)
+
+    async def scenario(client):
+        return await client.get("/api/")
+
+    assert call_api(scenario).status_code == 200
+    assert calls == [] and len(server.failed_indexes) == 3
+
+
+def test_index_creation_stops_at_the_first_connection_failure(server, monkeypatch):
+    calls = recorded_setup(server, monkeypatch, fail={"b"})
+    asyncio.run(server.ensure_indexes(server.INDEX_SETUP))
+    assert calls == ["a", "b"]
+    assert server.failed_indexes == {"b": "no servers", "c": "no servers"}
+
+
+def test_background_retry_finishes_the_setup(server, monkeypatch):
+    calls = recorded_setup(server, monkeypatch)
+    server.failed_indexes.update(b="no servers", c="no servers")
+    monkeypatch.setattr(server.shared_content, "published", False)
+
+    async def scenario():
+        retrier = asyncio.create_task(server.retry_startup_setup(0.01))
+        await asyncio.sleep(0.05)
+        retrier.cancel()
+
+    asyncio.run(scenario())
+    assert calls[:3] == ["b", "c", "publish"]
+    assert server.failed_indexes == {}
@@ -0,0 +1,64 @@
+"""extract_json / parse_structured_response on the ways models mangle a JSON reply."""
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from structured_output import extract_json, parse_structured_response  # noqa: E402
+
+DOCUMENT = {"explanation": "Too many hours, {not} much sleep.", "daily_plan": ["Walk", "Sleep by 11"], "score": 7}
+
+
+def test_plain_json():
+    assert extract_json('{"a": 1, "b": [1, 2]}') == {"a": 1, "b": [1, 2]}
+
+
+def test_prose_around_the_object():
+    assert extract_json('Here is the result:\n{"a": 1}\nHope that helps!') == {"a": 1}
+
+
+def test_trailing_commas_and_raw_newlines_in_strings():
+    text = '{"email": "Dear manager,\nI need help.", "plan": ["a", "b",],}'
+    assert extract_json(text) == {"email": "Dear manager,\nI need help.", "plan": ["a", "b"]}
+
+
+def test_escaped_quotes_and_brackets_inside_strings():
+    text = r'{"a": "say \"}\" then ]", "b": 1}'
+    assert extract_json(text) == {"a": 'say "}" then ]', "b": 1}
+
+
+def test_fenced_block_wins_over_braces_in_the_prose():
+    text = 'Fill in {name} and {role}:\n```json\n{"a": 1}\n```\nThe {braces} above are placeholders.'
+    assert extract_json(text) == {"a": 1}
+
+
+def test_unusable_fenced_block_falls_back_to_the_text():
+    text = '```json\nnot json at all\n```\nAnyway: {"a": 1}'
+    assert extract_json(text) == {"a": 1}
+
+
+def test_later_brace_is_tried_when_an_earlier_one_is_not_json():
+    assert extract_json('Use {curly} braces. {"a": {"b": 2}}') == {"a": {"b": 2}}
+    assert extract_json("a } b { c ] {\"ok\": true}") == {"ok": True}
+
+
+def test_truncated_document_keeps_the_complete_sections():
+    text = '```json\n{"explanation": "Done.", "daily_plan": ["Walk", "Sleep by 11"], "email_to_hr": "Dear H'
+    assert extract_json(text) == {"explanation": "Done.", "daily_plan": ["Walk", "Sleep by 11"]}
+
+
+def test_truncated_inside_a_nested_list():
+    assert extract_json('{"a": 1, "plan": [{"step": 1}, {"step": 2}, {"st') == {"a": 1, "plan": [{"step": 1}, {"step": 2}]}
+
+
+@pytest.mark.parametrize("text", ["", "no json here", "{", '{"a": ', "[1, 2, 3]"])
+def test_nothing_usable(text):
+    assert parse_structured_response(text) == {}
+
+
+def test_parse_structured_response():
+    assert parse_structured_response("```json\n" + json.dumps(DOCUMENT, indent=2) + "\n```") == DOCUMENT
+    assert parse_structured_response(None) == {}
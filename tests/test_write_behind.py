@@ -0,0 +1,216 @@
+"""WriteBehindWriter journal replay, segment locking, spill, bounded buffer and dead-lettering (on mongomock)."""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from bson import json_util
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from write_behind import DEAD_LETTER_DIR, WriteBehindFull, WriteBehindWriter  # noqa: E402
+
+VALIDATION_FAILED = 121
+
+
+class FlakyCollection:
+    """A mongomock collection that can be unavailable, and that rejects documents marked ``bad``"""
+
+    def __init__(self):
+        self.collection = AsyncMongoMockClient().db.assessments
+        self.down = False
+
+    async def insert_many(self, docs, ordered=True):
+        if self.down:
+            raise ServerSelectionTimeoutError("no servers")
+        errors, inserted = [], 0
+        for index, doc in enumerate(docs):
+            if doc.get("bad"):
+                errors.append({"index": index, "code": VALIDATION_FAILED, "errmsg": "Document failed validation"})
+                continue
+            try:
+                await self.collection.insert_one(dict(doc))
+                inserted += 1
+            except Exception:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key"})
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": inserted})
+
+    async def ids(self):
+        return sorted(doc["n"] for doc in await self.collection.find({}).to_list(None))
+
+
+def writer(collection, journal=None, **options):
+    options = {"batch_size": 1000, "flush_interval": 60, **options}
+    return WriteBehindWriter(collection, journal_dir=str(journal) if journal else None, **options)
+
+
+def segments(journal):
+    return sorted(path.name for path in Path(journal).glob("segment-*.ndjson"))
+
+
+def crash(w):
+    """Stop a writer the way a killed process does: nothing flushed, its journal lock released"""
+    w._task.cancel()
+    w._segment.file.close()
+
+
+def test_crashed_writers_journal_is_replayed_on_start(tmp_path):
+    async def scenario():
+        collection = FlakyCollection()
+        crashed = writer(collection, tmp_path)
+        await crashed.start()
+        for n in range(3):
+            await crashed.submit({"n": n})
+        crash(crashed)
+        assert await collection.ids() == [] and len(segments(tmp_path)) == 1
+
+        restarted = writer(collection, tmp_path)
+        await restarted.start()
+        ids = await collection.ids()
+        await restarted.close()
+        return ids
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+    assert segments(tmp_path) == []
+
+
+def test_live_writers_segment_is_not_replayed(tmp_path):
+    async def scenario():
+        collection = FlakyCollection()
+        live = writer(collection, tmp_path)
+        await live.start()
+        await live.submit({"n": 1})
+        other = writer(collection, tmp_path)
+        await other.start()  # can't lock the live writer's segment
+        before = await collection.ids()
+        await other.close()
+        await live.close()
+        return before, await collection.ids()
+
+    assert asyncio.run(scenario()) == ([], [1])
+    assert segments(tmp_path) == []
+
+
+def test_replay_ignores_documents_already_written(tmp_path):
+    async def scenario():
+        collection = FlakyCollection()
+        crashed = writer(collection, tmp_path)
+        await crashed.start()
+        await crashed.submit({"n": 1})
+        await crashed.submit({"n": 2})
+        # Crashed after the insert but before deleting the segment
+        await collection.collection.insert_one(dict(crashed._buffer[0]))
+        crash(crashed)
+
+        restarted = writer(collection, tmp_path)
+        await restarted.start()
+        stats = restarted.stats()
+        await restarted.close()
+        return stats, await collection.ids()
+
+    stats, ids = asyncio.run(scenario())
+    assert ids == [1, 2]
+    assert (stats["documents_written"], stats["failed_flushes"], stats["unwritten_segments"]) == (1, 0, 0)
+    assert segments(tmp_path) == []
+
+
+def test_documents_past_max_buffer_spill_to_the_journal(tmp_path):
+    async def scenario():
+        collection = FlakyCollection()
+        w = writer(collection, tmp_path, max_buffer=2)
+        await w.start()
+        for n in range(5):
+            await w.submit({"n": n})
+        stats = w.stats()
+        await w.flush()
+        ids = await collection.ids()
+        await w.close()
+        return stats, ids
+
+    stats, ids = asyncio.run(scenario())
+    assert (stats["pending"], stats["buffered"], stats["spilled_to_journal"]) == (5, 2, 3)
+    assert ids == [0, 1, 2, 3, 4]
+
+
+def test_failed_flush_keeps_the_segment_until_the_database_is_back(tmp_path):
+    async def scenario():
+        collection = FlakyCollection()
+        w = writer(collection, tmp_path, max_attempts=2)
+        await w.start()
+        await w.submit({"n": 1})
+        collection.down = True
+        for _ in range(3):  # unavailability never dead-letters
+            await w.flush()
+        unwritten = w.stats()["unwritten_segments"]
+        collection.down = False
+        await w.flush()
+        ids = await collection.ids()
+        await w.close()
+        return unwritten, ids
+
+    assert asyncio.run(scenario()) == (1, [1])
+    assert not (tmp_path / DEAD_LETTER_DIR).exists()
+
+
+def test_rejected_documents_are_dead_lettered_after_max_attempts(tmp_path):
+    async def scenario():
+        collection = FlakyCollection()
+        w = writer(collection, tmp_path, max_attempts=2)
+        await w.start()
+        await w.submit({"n": 1})
+        await w.submit({"n": 2, "bad": True})
+        await w.flush()
+        first = w.stats()["unwritten_segments"], await collection.ids()
+        await w.flush()
+        stats = w.stats()
+        await w.close()
+        return first, stats
+
+    first, stats = asyncio.run(scenario())
+    assert first == (1, [1])  # the valid document is written, the segment kept for a retry
+    assert (stats["unwritten_segments"], stats["dead_lettered"]) == (0, 1)
+    assert segments(tmp_path) == []
+    [dead] = (tmp_path / DEAD_LETTER_DIR).iterdir()
+    assert [json_util.loads(line)["n"] for line in dead.read_text().splitlines()] == [2]
+
+
+def test_without_a_journal_rejected_documents_are_dropped_after_max_attempts():
+    async def scenario():
+        collection = FlakyCollection()
+        w = writer(collection, max_attempts=2)
+        await w.submit({"n": 1})
+        await w.submit({"n": 2, "bad": True})
+        await w.flush()
+        pending = w.pending
+        await w.flush()
+        return pending, w.stats(), await collection.ids()
+
+    pending, stats, ids = asyncio.run(scenario())
+    assert pending == 1
+    assert (stats["pending"], stats["dead_lettered"]) == (0, 1)
+    assert ids == [1]
+
+
+def test_without_a_journal_a_full_buffer_rejects_new_documents():
+    async def scenario():
+        collection = FlakyCollection()
+        w = writer(collection, max_buffer=2)
+        collection.down = True
+        await w.submit({"n": 1})
+        await w.submit({"n": 2})
+        with pytest.raises(WriteBehindFull):
+            await w.submit({"n": 3})
+        await w.flush()  # fails, the documents stay buffered
+        with pytest.raises(WriteBehindFull):
+            await w.submit({"n": 3})
+        pending = w.pending
+        collection.down = False
+        await w.flush()
+        await w.submit({"n": 3})
+        await w.flush()
+        return pending, await collection.ids()
+
+    assert asyncio.run(scenario()) == (2, [1, 2, 3])